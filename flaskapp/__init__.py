@@ -28,7 +28,9 @@ Copyright (c) 2021
 from flask import Flask
 from flaskapp.routes.ivr_url import IVRFlowBlueprint, MobileBluprint
 from flaskapp.routes.auth import AuthBlueprint
+from flaskapp.routes.monitoring import MonitoringBlueprint
 from flaskapp.routes.error_handlers import error_handler_factory
+from flaskapp.tools import tracing, profiler, querystats
 from flaskapp import settings
 
 
@@ -63,6 +65,17 @@ def create_app():
             )
         )
 
+    ###############################
+    ##### Request tracing ######### noqa: E266
+
+    tracing.init_app(app)
+
+    # on-demand (X-Profile header) and sampled profiling of requests
+    profiler.init_app(app)
+
+    # per-request query budget and N+1 detection
+    querystats.init_app(app)
+
     ###############################
     ##### Register blueprients ##### noqa: E266
 
@@ -70,5 +83,6 @@ def create_app():
     app.register_blueprint(IVRFlowBlueprint)
     app.register_blueprint(MobileBluprint)
     app.register_blueprint(AuthBlueprint, url_prefix='/authenticate')
+    app.register_blueprint(MonitoringBlueprint)
 
     return app
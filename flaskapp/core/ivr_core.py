@@ -27,22 +27,26 @@ Copyright (c) 2021
 
 from supermemo2 import SMTwo
 import numpy as np
+import pandas as pd
 import time
 import datetime
 import json
-from twilio.rest import Client
 import logging
 from googleapiclient.discovery import build
 from flaskapp.models.storages import (gs_users_existing, gs_users_calls,
                                       gs_health_metric_data)
-from flaskapp.tools.utils import cleanup_phone_number, send_mail
+from flaskapp.tools.utils import (cleanup_phone_number, send_mail,
+                                  get_twilio_client)
+from flaskapp.tools.metrics import timed
+from flaskapp.tools.phones import normalize_phones
+from flaskapp.models.bases import db_proxy
 from flaskapp.models.ivr_models import (User, PhoneNumber, HealthMetric,
                                         SmartReminder)
+from flaskapp.models.routing import storage_router
 from flaskapp.settings import (GOOGLE_API_KEY, GOOGLE_CSE_ID,
                                GOOGLE_CSE_MAX_NUM,
-                               TWILIO_MAIN_PHONE_NUMBER,
-                               TWILIO_ACCOUNT_SID,
-                               TWILIO_AUTH_TOKEN)
+                               GOOGLE_SHEETS_DUAL_WRITE,
+                               TWILIO_MAIN_PHONE_NUMBER)
 
 
 logger = logging.getLogger(__name__)
@@ -55,7 +59,7 @@ def out_bound_call(phone_number=''):
     :type phone_number: str
     """
 
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    client = get_twilio_client()
 
     # FIXME: I don't like hardcoded twilio flow ids; we need to
     # handle this somehow
@@ -89,7 +93,7 @@ def call_flow(flow_sid, phone_number=''):
     :type phone_number: str, optional
     """
 
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    client = get_twilio_client()
 
     if phone_number:
         if not is_user_new(phone_number):
@@ -122,8 +126,14 @@ def call_flow(flow_sid, phone_number=''):
                        I am silent, but you should discover why...")
 
 
-def profile_detail():
+def profile_detail(checkpoint=None):
     """Function for gathering profile information from the Client
+
+    :param checkpoint: progress of the run: rows are processed in order
+                       of their phone numbers, the saved one is the last
+                       processed (rows up to it are skipped), defaults
+                       to None (all rows)
+    :type checkpoint: flaskapp.models.beats.Checkpoint, optional
     """
 
     def logged_call_flow(flow_sid, phone_number, what):
@@ -148,7 +158,17 @@ def profile_detail():
         'emergency name':  "FW21a0b56a4c5d0d9635f9f86616036b9c"
     }
 
-    for row in gs_users_existing.get_all_records():
+    rows = gs_users_existing.get_all_records()
+    # phone numbers are stable keys of users, unlike row numbers
+    # (rows may be inserted, deleted or sorted before a run is resumed)
+    keys = normalize_phones(pd.Series(
+        [row.get('Phone Number', '') for row in rows], dtype=object
+    )).sort_values(kind='stable')
+    last = checkpoint.position if checkpoint else None
+    if last is not None:
+        keys = keys[keys > last]
+    for index, key in keys.items():
+        row = rows[index]
         phone_number = row.get('Phone Number')
 
         for feature_name, value in row.items():
@@ -159,6 +179,11 @@ def profile_detail():
             else:
                 logger.info(f'Value of {feature_name} for {phone_number}:\
                     {value},  is already defined')
+        if checkpoint:
+            checkpoint.save(key)
+
+    if checkpoint:
+        checkpoint.finish()
 
 
 # FIXME: highly desirable to rename this function to something meaning...
@@ -168,7 +193,7 @@ def call_to_check_bld():
     google spreadsheet
     """
 
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    client = get_twilio_client()
 
     # FIXME: All hardcoded flow ids should be placed to settings
     # (or somewhere else) and called by human-readable names,
@@ -237,12 +262,9 @@ def is_user_new(phone_number=''):
     :rtype: True or False
     """
 
-    all_sheets = gs_users_existing.get_all_values()
+    # source of truth is configured by STORAGE_ROUTES setting
     cleaned_phone_number = cleanup_phone_number(phone_number)
-    return not any([True for a in all_sheets if cleaned_phone_number == a[0]])\
-        or not PhoneNumber.select().where(
-            PhoneNumber.number == cleaned_phone_number
-        ).exists()
+    return not storage_router.read('user_exists', cleaned_phone_number)
 
 
 def save_new_user(phone_number='', tab=''):
@@ -253,36 +275,45 @@ def save_new_user(phone_number='', tab=''):
 
     :param phone_number: phone number, defaults to ''
     :type phone_number: str, optional
-    :param tab: sheet name for google docs, defaults to ''
+    :param tab: sheet name for google docs, defaults to ''; a user is
+                created for 'Existing' (joined) only, a caller from
+                'Calls' is stored as a phone number without a user
     :type tab: str, optional
     """
 
     cleaned_phone_number = cleanup_phone_number(phone_number)
 
     # --- store data to google spreadsheet ( TODO: drop gs support)
-    gs_proxy_sheet = gs_users_existing if tab.lower() == 'existing'\
-        else gs_users_calls
-
-    # FIXME: Awkward and hardcoded values in new_row variable (changes needed)
-    new_row = [
-        cleaned_phone_number, '', '', '', '', '', '', '', '', '', '', '',
-        json.dumps(datetime.datetime.now(), indent=4, sort_keys=True,
-                   default=str), '19258609793', '19258609793'
-    ]
-
-    gs_proxy_sheet.append_row_to_sheet(new_row)
-    logger.info("Informational row about new user"
-                f"added to gspread: sheetname=({tab})")
+    # (otherwise the row is appended by sheets-mirror beat: a user
+    # to Existing tab, a caller who hasn't joined yet to Calls tab)
+    if GOOGLE_SHEETS_DUAL_WRITE:
+        gs_proxy_sheet = gs_users_existing if tab.lower() == 'existing'\
+            else gs_users_calls
+
+        # FIXME: Awkward and hardcoded values in new_row variable
+        new_row = [
+            cleaned_phone_number, '', '', '', '', '', '', '', '', '', '', '',
+            json.dumps(datetime.datetime.now(), indent=4, sort_keys=True,
+                       default=str), '19258609793', '19258609793'
+        ]
+
+        gs_proxy_sheet.append_row_to_sheet(new_row)
+        logger.info("Informational row about new user"
+                    f"added to gspread: sheetname=({tab})")
 
     # --- store new user and related call
+    # (users are mirrored to Existing tab by sheets-mirror beat)
     try:
-        phone_obj = PhoneNumber.get_or_create(
-            number=cleaned_phone_number
-        )
-        user_obj = User.get_or_create(phone_number=phone_obj)
-        logger.info(f"User object ({user_obj.id}) and "
-                    f"corresponding phone object ({phone_obj.id})"
-                    f"are created (phone: {phone_number}).")
+        with db_proxy.atomic():
+            phone_obj, _ = PhoneNumber.get_or_create(
+                number=cleaned_phone_number
+            )
+            if tab.lower() == 'existing' and phone_obj.user is None:
+                phone_obj.user = User.create()
+                phone_obj.save()
+                logger.info(f"User object ({phone_obj.user.id}) is created "
+                            f"for phone object ({phone_obj.id}) "
+                            f"(phone: {phone_number}).")
     except Exception as e:
         logger.error(f"Exception raised during DB operation: {e}")
     logger.info(f"Sending notification email for phone num.={phone_number}.")
@@ -371,12 +402,17 @@ def save_data(col_name, value, phone_number, date=None):
     phone_number = cleanup_phone_number(phone_number)
 
     # TODO: gs-support should be dropped
-    all_data = gs_users_existing.get_all_records()
+    # (otherwise the cell is updated by sheets-mirror beat)
+    all_data = gs_users_existing.get_all_value() \
+        if GOOGLE_SHEETS_DUAL_WRITE else None
     if all_data:
         all_data = np.array(all_data)
-        phone_num_index = np.argmax(all_data[:, 0] == phone_number)
-        col_name_index = np.argmax(all_data[0, :] == col_name)
-        gs_users_existing.update_cell(phone_num_index, col_name_index, value)
+        phone_num_index = np.flatnonzero(all_data[:, 0] == phone_number)
+        col_name_index = np.flatnonzero(all_data[0, :] == col_name)
+        if phone_num_index.size and col_name_index.size:
+            # worksheet rows and columns are numbered from 1
+            gs_users_existing.update_cell(int(phone_num_index[0]) + 1,
+                                          int(col_name_index[0]) + 1, value)
 
     save_data_to_postgres(
         col_name,
@@ -386,6 +422,7 @@ def save_data(col_name, value, phone_number, date=None):
     )
 
 
+@timed('google_search')
 def google_search(search_term):
     """ Search a term using Google Custom Search Engine
 
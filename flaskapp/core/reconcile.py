@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 9:02:15 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+import logging
+import datetime
+import numpy as np
+import pandas as pd
+from peewee import Case, Value, chunked
+from flaskapp.models.bases import db_proxy
+from flaskapp.models.ivr_models import User
+from flaskapp.core.sheets_mirror import (PHONE_COLUMN, USER_COLUMNS,
+                                         SheetsMirror, load_rows, cell_value)
+from flaskapp.core.user_import import (phone_numbers, parse_field,
+                                       create_users)
+from flaskapp.tools.phones import normalize_phones
+from flaskapp.tools.utils import get_gspread_client
+from flaskapp.settings import RECONCILE_REPAIR, RECONCILE_CHUNK_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+
+RECONCILE_BEAT = 'users-reconcile'
+
+SHEETS, POSTGRES = 'sheets', 'postgres'
+
+# kinds of differences, see `diff_users`
+ONLY_IN_SHEET = 'only_in_sheet'
+ONLY_IN_POSTGRES = 'only_in_postgres'
+MISMATCH = 'mismatch'
+DUPLICATE = 'duplicate'
+
+DIFF_COLUMNS = ['kind', PHONE_COLUMN, 'column', SHEETS, POSTGRES]
+
+
+def load_sheet(spreadsheet, sheet_name):
+    """Rows of the Users sheet (one values:get request)
+
+    :return: stripped strings indexed by normalized phone number (the
+             last row of a duplicated number wins) and duplicated numbers
+    :rtype: Tuple[pandas.DataFrame, List[str]]
+    :raises LookupError: if the sheet has no phone number column
+    """
+
+    title = "'{}'".format(sheet_name.replace("'", "''"))
+    values = spreadsheet.values_get(title).get('values', [])
+    header = values[0] if values else []
+    if PHONE_COLUMN not in header:
+        raise LookupError(f'{sheet_name} has no {PHONE_COLUMN} column')
+    # unnamed and repeated columns are skipped
+    keep = [it for it, name in enumerate(header)
+            if name and name not in header[:it]]
+    table = pd.DataFrame(values[1:], dtype=object) \
+        .reindex(columns=range(len(header))).iloc[:, keep].fillna('')
+    table.columns = [header[it] for it in keep]
+    table = table.apply(lambda column: column.astype(str).str.strip())
+
+    phones = normalize_phones(table.pop(PHONE_COLUMN))
+    table.index = pd.Index(phones.values, name=PHONE_COLUMN)
+    table = table[table.index != '']
+    duplicated = table.index.duplicated(keep='last')
+    duplicates = sorted(set(table.index[duplicated]))
+    return table[~duplicated], duplicates
+
+
+def as_cells(rows):
+    """Rows of `load_rows` as stripped strings of sheet cells
+    ('' - unknown value)"""
+
+    return rows.applymap(lambda value: str(cell_value(value)).strip())
+
+
+def diff_users(sheet, postgres, duplicates=()):
+    """Differences between the sheet and postgres rows; both are
+    indexed by normalized phone number, only their common columns
+    are compared
+
+    :param sheet: see `load_sheet`
+    :type sheet: pandas.DataFrame
+    :param postgres: see `flaskapp.core.sheets_mirror.load_rows`
+    :type postgres: pandas.DataFrame
+    :return: one row per difference: its kind, phone number and, for
+             mismatches, the column and both values
+    :rtype: pandas.DataFrame
+    """
+
+    columns = [name for name in sheet.columns if name in postgres.columns]
+    merged = sheet[columns].merge(
+        as_cells(postgres[columns]), how='outer', indicator=True,
+        left_index=True, right_index=True, suffixes=('@sheet', '@postgres'))
+    side = merged.pop('_merge')
+
+    both = merged[(side == 'both').values]
+    left = both[[f'{name}@sheet' for name in columns]].to_numpy()
+    right = both[[f'{name}@postgres' for name in columns]].to_numpy()
+    rows, cols = np.nonzero(left != right)
+    mismatches = pd.DataFrame({
+        'kind': MISMATCH,
+        PHONE_COLUMN: both.index[rows],
+        'column': np.array(columns, dtype=object)[cols],
+        SHEETS: left[rows, cols],
+        POSTGRES: right[rows, cols],
+    })
+
+    def missing(kind, phones):
+        return pd.DataFrame({'kind': kind, PHONE_COLUMN: phones})
+
+    diff = pd.concat([
+        missing(ONLY_IN_SHEET, merged.index[(side == 'left_only').values]),
+        missing(ONLY_IN_POSTGRES,
+                merged.index[(side == 'right_only').values]),
+        mismatches,
+        missing(DUPLICATE, list(duplicates)),
+    ], ignore_index=True)
+    return diff.reindex(columns=DIFF_COLUMNS).fillna('')
+
+
+def summarize(diff):
+    """Counts of differences by kind (and mismatches by column)
+
+    :rtype: dict
+    """
+
+    kinds = diff['kind'].value_counts()
+    mismatches = diff[diff['kind'] == MISMATCH]
+    return {
+        ONLY_IN_SHEET: int(kinds.get(ONLY_IN_SHEET, 0)),
+        ONLY_IN_POSTGRES: int(kinds.get(ONLY_IN_POSTGRES, 0)),
+        'mismatched_users': int(mismatches[PHONE_COLUMN].nunique()),
+        'mismatched_cells': len(mismatches),
+        'mismatches_by_column': {
+            column: int(count) for column, count
+            in mismatches['column'].value_counts().items()},
+        'duplicates': int(kinds.get(DUPLICATE, 0)),
+    }
+
+
+def repair_sheets(diff, postgres, mirror):
+    """Writes postgres rows of users missing in the sheet or
+    mismatched there (cells unknown to postgres are left as is)
+
+    :type mirror: flaskapp.core.sheets_mirror.SheetsMirror
+    :return: see `SheetsMirror.write`
+    :rtype: dict
+    """
+
+    phones = diff.loc[diff['kind'].isin([ONLY_IN_POSTGRES, MISMATCH]),
+                      PHONE_COLUMN].unique()
+    if not len(phones):
+        return {'updated': 0, 'appended': 0}
+    report = mirror.write(postgres.loc[phones])
+    return {'updated': report['updated'], 'appended': report['appended']}
+
+
+def user_fields(sheet):
+    """Values of `User` fields in the sheet rows
+    (None - blank cell or a value the field can't keep)
+
+    :rtype: pandas.DataFrame
+    """
+
+    fields = pd.DataFrame(index=sheet.index)
+    for column, name in USER_COLUMNS.items():
+        values = sheet[column] if column in sheet \
+            else pd.Series('', index=sheet.index)
+        fields[name], _ = parse_field(name, values)
+    return fields
+
+
+def repair_postgres(sheet, diff, chunk_size=RECONCILE_CHUNK_SIZE):
+    """Creates users missing in postgres and updates mismatched fields
+    of users from the sheet, `chunk_size` users per query, in one
+    transaction (health metrics are not repaired, blank cells and
+    values not fitting fields are skipped)
+
+    :return: the number of created and updated users
+    :rtype: dict
+    """
+
+    fields = user_fields(sheet)
+    now = datetime.datetime.now()
+
+    new = fields.loc[diff.loc[diff['kind'] == ONLY_IN_SHEET,
+                              PHONE_COLUMN].unique()]
+    mismatches = diff[(diff['kind'] == MISMATCH) &
+                      diff['column'].isin(list(USER_COLUMNS))]
+    # the sheet value of every mismatched cell (None - skipped)
+    mismatches = mismatches.assign(value=fields.stack(dropna=False).reindex(
+        pd.MultiIndex.from_arrays([
+            mismatches[PHONE_COLUMN],
+            mismatches['column'].map(USER_COLUMNS)])).values)
+    mismatches = mismatches[mismatches['value'].notna()]
+    numbers = phone_numbers()
+    orphans = numbers.loc[numbers['user'].isna(), 'id']
+
+    with db_proxy.atomic():
+        for start in range(0, len(new), chunk_size):
+            create_users(new.iloc[start:start + chunk_size], orphans, now)
+
+        mismatches = mismatches.assign(
+            user=numbers['user'].reindex(mismatches[PHONE_COLUMN]).values)
+        for column, cells in mismatches.groupby('column'):
+            field = getattr(User, USER_COLUMNS[column])
+            for chunk in chunked(zip(cells['user'], cells['value']),
+                                 chunk_size):
+                User.update({
+                    field: Case(User.id, [
+                        (int(user_id), Value(value, converter=field.db_value))
+                        for user_id, value in chunk]),
+                    User.updated: now,
+                }).where(User.id.in_([int(it) for it, _ in chunk])).execute()
+
+    return {'created': len(new),
+            'updated': int(mismatches[PHONE_COLUMN].nunique())}
+
+
+def reconcile_users(client=None, repair=RECONCILE_REPAIR, report_path=None):
+    """Compares the Users sheet with users in postgres and optionally
+    repairs one of them (body of `users-reconcile` beat)
+
+    :param client: gspread client, defaults to `get_gspread_client()`
+    :type client: gspread.Client, optional
+    :param repair: side to repair: 'sheets', 'postgres' or '' (none)
+    :type repair: str
+    :param report_path: CSV file to write all differences to
+    :type report_path: str, optional
+    :return: counts of differences (see `summarize`) and repairs
+    :rtype: dict
+    """
+
+    if repair not in ('', None, SHEETS, POSTGRES):
+        raise ValueError(f"Invalid repair: {repair}; it should be "
+                         f"'{SHEETS}', '{POSTGRES}' or ''")
+    mirror = SheetsMirror(client or get_gspread_client())
+    spreadsheet = mirror.client.open_by_key(mirror.spreadsheet_id)
+    sheet, duplicates = load_sheet(spreadsheet, mirror.sheet_name)
+    postgres = load_rows()
+
+    diff = diff_users(sheet, postgres, duplicates)
+    report = dict(summarize(diff),
+                  sheet_rows=len(sheet), postgres_rows=len(postgres))
+    if report_path:
+        diff.to_csv(report_path, index=False)
+    if repair == SHEETS:
+        report['repaired'] = repair_sheets(diff, postgres, mirror)
+    elif repair == POSTGRES:
+        report['repaired'] = repair_postgres(sheet, diff)
+    report['api_calls'] = mirror.api_calls
+    logger.info(f'Users are reconciled: {report}')
+    return report
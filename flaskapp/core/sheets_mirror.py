@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 7:12:40 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import logging
+import datetime
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+from flaskapp.models.ivr_models import User, PhoneNumber, HealthMetric
+from flaskapp.models.beats import Watermark
+from flaskapp.tools.utils import get_gspread_client
+from flaskapp.tools.phones import normalize_phones
+from flaskapp.settings import (GOOGLE_USERS_SPREADSHEET_ID,
+                               GOOGLE_USERS_SHEET_NAME_EXISTING,
+                               GOOGLE_USERS_SHEET_NAME_CALLS,
+                               SHEETS_MIRROR_BATCH_RANGES,
+                               SHEETS_MIRROR_OVERLAP)
+
+
+logger = logging.getLogger(__name__)
+
+
+MIRROR_BEAT = 'sheets-mirror'
+
+PHONE_COLUMN = 'Phone Number'
+
+# sheet column -> field of User model; other columns of the sheet
+# are taken from health metrics (`save_data` stores them there)
+USER_COLUMNS = {
+    'username': 'username',
+    'type': 'type',
+    'gender': 'gender',
+    'time zone': 'timezone',
+    'call time': 'call_window_start',
+}
+
+# values of appended rows which postgres doesn't have (see save_new_user)
+NEW_ROW_DEFAULTS = {'friend': '19258609793', 'operator': '19258609793'}
+
+
+class CountingRequests:
+    """Replacement of `gspread.Client.request` counting API calls"""
+
+    def __init__(self, request):
+        self.request = request
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.request(*args, **kwargs)
+
+
+def changed_users(since=None):
+    """Query of ids of users changed after `since`: their own fields,
+    phone numbers or health metrics (all users if `since` is None)
+
+    :param since: watermark, see `flaskapp.models.beats.Watermark`
+    :type since: datetime.datetime, optional
+    :rtype: peewee.SelectQuery
+    """
+
+    if since is None:
+        return User.select(User.id)
+    return (
+        User.select(User.id).where(User.updated > since) |
+        PhoneNumber.select(PhoneNumber.user).where(
+            (PhoneNumber.updated > since) & PhoneNumber.user.is_null(False)) |
+        HealthMetric.select(HealthMetric.user).where(
+            HealthMetric.updated > since)
+    )
+
+
+def load_rows(since=None):
+    """Sheet rows of users changed after `since`, one per phone number
+    (3 queries: phone numbers, users, health metrics)
+
+    :param since: watermark, defaults to None (all users)
+    :type since: datetime.datetime, optional
+    :return: DataFrame indexed by phone number, columns are named
+             after sheet columns (NaN - unknown value)
+    :rtype: pandas.DataFrame
+    """
+
+    ids = changed_users(since)
+    phones = pd.DataFrame(
+        list(PhoneNumber.select(PhoneNumber.number, PhoneNumber.user)
+             .where(PhoneNumber.user.in_(ids)).tuples()),
+        columns=[PHONE_COLUMN, 'user'])
+    if phones.empty:
+        return pd.DataFrame(columns=list(USER_COLUMNS),
+                            index=pd.Index([], name=PHONE_COLUMN))
+
+    fields = [getattr(User, name) for name in USER_COLUMNS.values()]
+    users = pd.DataFrame(
+        list(User.select(User.id, *fields).where(User.id.in_(ids)).tuples()),
+        columns=['user', *USER_COLUMNS])
+
+    metrics = list(HealthMetric.select(HealthMetric.user, HealthMetric.data)
+                   .where(HealthMetric.user.in_(ids))
+                   .order_by(HealthMetric.created, HealthMetric.id).tuples())
+    # object dtype keeps integers as they are (no NaN upcasting)
+    data = pd.DataFrame([data or {} for _, data in metrics], dtype=object)
+    data = data.drop(columns=[name for name in data.columns
+                              if name in USER_COLUMNS or name == 'user'])
+    data['user'] = [user for user, _ in metrics]
+    # the latest known value of every feature
+    latest = data.groupby('user').last().astype(object)
+
+    rows = phones.merge(users, on='user', how='left') \
+        .merge(latest, left_on='user', right_index=True, how='left')
+    rows[PHONE_COLUMN] = normalize_phones(rows[PHONE_COLUMN])
+    rows = rows[rows[PHONE_COLUMN] != '']
+    return rows.drop(columns='user').drop_duplicates(PHONE_COLUMN) \
+        .set_index(PHONE_COLUMN)
+
+
+def load_callers(since=None):
+    """Rows of Calls tab: phone numbers of callers who haven't joined
+    yet (without a user, see `save_new_user`) changed after `since`
+
+    :param since: watermark, defaults to None (all callers)
+    :type since: datetime.datetime, optional
+    :return: DataFrame indexed by phone number, without columns
+             (appended rows get `NEW_ROW_DEFAULTS` only)
+    :rtype: pandas.DataFrame
+    """
+
+    query = PhoneNumber.select(PhoneNumber.number) \
+        .where(PhoneNumber.user.is_null())
+    if since is not None:
+        query = query.where(PhoneNumber.updated > since)
+    phones = normalize_phones(pd.Series([number for number, in query.tuples()],
+                                        dtype=object))
+    phones = phones[phones != ''].drop_duplicates()
+    return pd.DataFrame(index=pd.Index(phones.values, name=PHONE_COLUMN))
+
+
+def cell_value(value):
+    """Value of a sheet cell ('' if unknown)"""
+
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return ''
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M')
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat(sep=' ') \
+            if isinstance(value, datetime.datetime) else value.isoformat()
+    if isinstance(value, (dict, list)):
+        return str(value)
+    return value.item() if hasattr(value, 'item') else value
+
+
+class SheetsMirror:
+    """Writes rows to the Users sheet in batches: cells of rows already
+    in the sheet are updated by values:batchUpdate requests (at most
+    `batch_ranges` ranges each), new rows are appended by one request;
+    cells unknown to postgres (and columns the sheet doesn't have)
+    are left as is
+
+    :param client: gspread client, defaults to `get_gspread_client()`
+    :type client: gspread.Client, optional
+    """
+
+    def __init__(self, client=None,
+                 spreadsheet_id=GOOGLE_USERS_SPREADSHEET_ID,
+                 sheet_name=GOOGLE_USERS_SHEET_NAME_EXISTING,
+                 batch_ranges=SHEETS_MIRROR_BATCH_RANGES):
+        self.client = client or get_gspread_client()
+        self.requests = CountingRequests(self.client.request)
+        self.client.request = self.requests
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.batch_ranges = batch_ranges
+        self.title = "'{}'".format(sheet_name.replace("'", "''"))
+
+    @property
+    def api_calls(self):
+        return self.requests.calls
+
+    def read_index(self, spreadsheet):
+        """Header and row number of every phone number of the sheet
+        (one values:batchGet request)"""
+
+        value_ranges = spreadsheet.values_batch_get(
+            [f'{self.title}!1:1', f'{self.title}!A:A']
+        ).get('valueRanges', [])
+        header = (value_ranges[0].get('values') or [[]])[0]
+        column = [row[0] if row else ''
+                  for row in value_ranges[1].get('values', [])]
+        phones = normalize_phones(pd.Series(column, dtype=object))
+        phones.index += 1  # rows are numbered from 1
+        phones = phones.iloc[1:]  # header
+        phones = phones[phones != ''].drop_duplicates()
+        return header, pd.Series(phones.index, index=phones.values)
+
+    def ranges(self, row_number, values):
+        """Ranges of consecutive known cells of the row
+
+        :param values: cells of the row from column A ('' - unknown)
+        """
+
+        ranges, start = [], None
+        for col, value in enumerate(values + [''], 1):
+            if value != '' and start is None:
+                start = col
+            elif value == '' and start is not None:
+                ranges.append({
+                    'range': f'{self.title}!{rowcol_to_a1(row_number, start)}'
+                             f':{rowcol_to_a1(row_number, col - 1)}',
+                    'values': [values[start - 1:col - 1]]
+                })
+                start = None
+        return ranges
+
+    def write(self, rows):
+        """Mirrors rows to the sheet
+
+        :param rows: rows indexed by phone number, see `load_rows`
+        :type rows: pandas.DataFrame
+        :return: the number of updated and appended rows, written
+                 ranges and API calls
+        :rtype: dict
+        """
+
+        spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+        header, row_numbers = self.read_index(spreadsheet)
+        if not header:
+            raise LookupError(f'{self.sheet_name} has no header')
+        ignored = set(rows.columns) - set(header)
+        if ignored:
+            logger.debug(f'Columns {sorted(ignored)} are not in the sheet')
+        table = rows.reindex(columns=header[1:]).astype(object)
+
+        existing = table.index.isin(row_numbers.index)
+        updates = []
+        for phone, row in table[existing].iterrows():
+            # phone number cell is not written again
+            values = [''] + [cell_value(value) for value in row]
+            updates.extend(self.ranges(int(row_numbers[phone]), values))
+        for start in range(0, len(updates), self.batch_ranges):
+            spreadsheet.values_batch_update(body={
+                'valueInputOption': 'RAW',
+                'data': updates[start:start + self.batch_ranges]
+            })
+
+        new = table[~existing]
+        if len(new):
+            defaults = {name: value for name, value in
+                        NEW_ROW_DEFAULTS.items() if name in header}
+            new = new.fillna(value=defaults)
+            spreadsheet.values_append(
+                f'{self.title}!A1',
+                params={'valueInputOption': 'RAW',
+                        'insertDataOption': 'INSERT_ROWS'},
+                body={'values': [[phone] + [cell_value(value)
+                                            for value in row]
+                                 for phone, row in new.iterrows()]})
+
+        return {'updated': int(existing.sum()), 'appended': len(new),
+                'ranges': len(updates), 'api_calls': self.api_calls}
+
+
+def mirror_users(client=None, full=False):
+    """Mirrors users changed since the previous run to Existing tab
+    of the Users sheet and new callers to Calls tab (body of
+    `sheets-mirror` beat)
+
+    :param client: gspread client, defaults to `get_gspread_client()`
+    :type client: gspread.Client, optional
+    :param full: mirror all users, not only changed ones
+    :type full: bool
+    :return: report of the run, see `SheetsMirror.write`; `callers` -
+             the number of rows appended to Calls tab
+    :rtype: dict
+    """
+
+    watermark = Watermark(MIRROR_BEAT)
+    started = datetime.datetime.now()
+    since = None if full else watermark.value
+    rows = load_rows(since)
+    callers = load_callers(since)
+    report = {'users': len(rows), 'updated': 0, 'appended': 0,
+              'ranges': 0, 'callers': 0, 'api_calls': 0}
+    if len(rows) or len(callers):
+        mirror = SheetsMirror(client)  # counts API calls of both tabs
+        if len(rows):
+            report.update(mirror.write(rows))
+        if len(callers):
+            report['callers'] = SheetsMirror(
+                mirror.client, sheet_name=GOOGLE_USERS_SHEET_NAME_CALLS
+            ).write(callers)['appended']
+        report['api_calls'] = mirror.api_calls
+    # rows are updated in place and appended once, so mirroring them
+    # again is harmless, while a late commit would be missed forever
+    watermark.advance(
+        started - datetime.timedelta(seconds=SHEETS_MIRROR_OVERLAP))
+    logger.info(f'Users sheet is mirrored: {report}')
+    return report
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 10:04:33 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+import io
+import sys
+import json
+import logging
+import argparse
+import datetime
+import pandas as pd
+from peewee import Case, TimeField
+from flaskapp.models.bases import db_proxy
+from flaskapp.models.ivr_models import User, PhoneNumber
+from flaskapp.tools.phones import normalize_phones
+from flaskapp.settings import USERS_IMPORT_CHUNK_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+
+CSV, NDJSON = 'csv', 'ndjson'
+
+PHONE = 'phone'
+
+# columns of imported files besides `phone` (User fields)
+IMPORT_FIELDS = ('username', 'type', 'gender', 'timezone',
+                 'call_window_start', 'call_window_end')
+
+# statuses of imported rows
+NEW = 'new'  # valid, not inserted yet (dry run)
+CREATED = 'created'
+EXISTS = 'exists'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+FAILED = 'failed'
+
+REPORT_COLUMNS = ['row', PHONE, 'status', 'user_id', 'error']
+
+
+def phone_numbers():
+    """Ids and users of all phone numbers (one query)
+
+    :return: `id` and `user` (NaN if none) columns indexed by normalized
+             phone number (the first of numbers normalized the same,
+             invalid ones are skipped)
+    :rtype: pandas.DataFrame
+    """
+
+    numbers = pd.DataFrame(
+        list(PhoneNumber.select(PhoneNumber.id, PhoneNumber.number,
+                                PhoneNumber.user_id).tuples()),
+        columns=['id', 'number', 'user'])
+    numbers.index = pd.Index(normalize_phones(numbers.pop('number')).values)
+    return numbers[~numbers.index.duplicated() & (numbers.index != '')]
+
+
+def parse_field(name, values):
+    """Values of `User` field from strings
+
+    :param name: field name
+    :type name: str
+    :param values: column of strings ('' - blank)
+    :type values: pandas.Series
+    :return: values (None - blank or invalid) and the mask of values
+             the field can't keep
+    :rtype: Tuple[pandas.Series, pandas.Series]
+    """
+
+    values = values.astype(str).str.strip()
+    field = getattr(User, name)
+    if isinstance(field, TimeField):
+        times = pd.to_datetime(values, format='%H:%M', errors='coerce') \
+            .fillna(pd.to_datetime(values, format='%H:%M:%S',
+                                   errors='coerce'))
+        valid = times.notna()
+        values = times.dt.time.astype(object)
+    elif field.choices:
+        valid = values.isin([key for key, _ in field.choices])
+    elif getattr(field, 'max_length', None):
+        valid = values.str.len() <= field.max_length
+    else:
+        valid = pd.Series(True, index=values.index)
+    blank = values.astype(str).isin(['', 'NaT'])
+    return (values.astype(object).where(valid & ~blank, None),
+            ~valid & ~blank)
+
+
+def create_users(fields, orphans=None, now=None):
+    """Inserts users (one query) and their phone numbers: new ones
+    by one query, numbers without a user (`orphans`) get it by another;
+    `updated` is set, so `sheets-mirror` beat picks the users up
+
+    :param fields: `User` field values indexed by normalized phone number
+    :type fields: pandas.DataFrame
+    :param orphans: ids of phone numbers without a user,
+                    indexed by normalized phone number
+    :type orphans: pandas.Series, optional
+    :return: ids of the new users, in order of `fields` rows
+    :rtype: List[int]
+    """
+
+    if not len(fields):
+        return []
+    now = now or datetime.datetime.now()
+    inserted = User.insert_many([
+        dict(row, created=now, updated=now)
+        for row in fields.to_dict('records')
+    ]).returning(User.id).tuples().execute()
+    # ids follow the order of inserted rows
+    user_ids = pd.Series(sorted(user_id for user_id, in inserted),
+                         index=fields.index)
+
+    orphans = pd.Series(dtype=object) if orphans is None else orphans
+    attached = user_ids.index.isin(orphans.index)
+    if attached.any():
+        pairs = list(zip(orphans[user_ids.index[attached]].tolist(),
+                         user_ids[attached].tolist()))
+        PhoneNumber.update({
+            PhoneNumber.user: Case(PhoneNumber.id, pairs),
+            PhoneNumber.updated: now,
+        }).where(PhoneNumber.id.in_([it for it, _ in pairs])).execute()
+    if not attached.all():
+        PhoneNumber.insert_many([
+            {'number': phone, 'user': user_id,
+             'created': now, 'updated': now}
+            for phone, user_id in user_ids[~attached].items()
+        ]).execute()
+    return user_ids.tolist()
+
+
+def read_users(data, fmt=CSV):
+    """Rows of CSV (with header) or NDJSON (an object per line) file
+
+    :param data: content of the file
+    :type data: Union[str, bytes]
+    :param fmt: 'csv' or 'ndjson'
+    :type fmt: str
+    :return: DataFrame of strings ('' - blank)
+    :rtype: pandas.DataFrame
+    :raises ValueError: if the file can't be parsed or has no
+                        `phone` column
+    """
+
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if fmt == CSV:
+        rows = pd.read_csv(io.StringIO(data), dtype=str,
+                           keep_default_na=False, skip_blank_lines=True)
+    elif fmt == NDJSON:
+        rows = pd.DataFrame([json.loads(line) for line in data.splitlines()
+                             if line.strip()], dtype=object)
+        rows = rows.where(rows.notna(), '').astype(str)
+    else:
+        raise ValueError(f"Unknown format: {fmt}; it should be "
+                         f"'{CSV}' or '{NDJSON}'")
+    if PHONE not in rows.columns:
+        raise ValueError(f'Users have no {PHONE} column')
+    return rows
+
+
+def import_users(rows, chunk_size=USERS_IMPORT_CHUNK_SIZE, dry_run=False):
+    """Creates users of the rows: phone numbers are normalized and
+    compared with existing ones at once, new users and their phone
+    numbers are inserted in chunks of `chunk_size` rows, a transaction
+    per chunk (rows of a failed chunk are `failed`)
+
+    :param rows: `phone` and `IMPORT_FIELDS` columns of strings, see
+                 `read_users` (other columns are ignored)
+    :type rows: pandas.DataFrame
+    :param dry_run: validate rows only (valid new ones are `new`)
+    :type dry_run: bool
+    :return: row number (from 1), normalized phone number, status,
+             id of the user and error of every row
+    :rtype: pandas.DataFrame
+    """
+
+    phones = normalize_phones(rows[PHONE].fillna(''))
+    invalid = (phones == '').values
+    report = pd.DataFrame({
+        'row': range(1, len(rows) + 1),
+        # invalid phone numbers are reported as they are
+        PHONE: phones.where(~invalid, rows[PHONE]).values,
+        'status': NEW,
+        'user_id': None,
+        'error': '',
+    }, columns=REPORT_COLUMNS)
+    ignored = set(rows.columns) - {PHONE, *IMPORT_FIELDS}
+    if ignored:
+        logger.warning(f'Columns {sorted(ignored)} are not imported')
+
+    report.loc[invalid, 'error'] = 'invalid phone; '
+    fields = pd.DataFrame(index=rows.index)
+    for name in IMPORT_FIELDS:
+        if name in rows.columns:
+            fields[name], wrong = parse_field(name, rows[name].fillna(''))
+            report.loc[wrong.values, 'error'] += f'invalid {name}; '
+            invalid |= wrong.values
+    report['error'] = report['error'].str.rstrip('; ')
+    report.loc[invalid, 'status'] = INVALID
+
+    numbers = phone_numbers()
+    pending = report['status'] == NEW
+    existing = pending & report[PHONE].isin(numbers.index)
+    users = numbers['user'].reindex(report[PHONE]).values
+    existing &= pd.notna(users)
+    report.loc[existing, 'status'] = EXISTS
+    report.loc[existing, 'user_id'] = users[existing]
+    pending &= ~existing
+    duplicate = pending & report[PHONE].where(pending).duplicated()
+    report.loc[duplicate, 'status'] = DUPLICATE
+    pending &= ~duplicate
+
+    if not dry_run:
+        orphans = numbers.loc[numbers['user'].isna(), 'id']
+        fields.index = report[PHONE].values
+        positions = pending.to_numpy().nonzero()[0]
+        for start in range(0, len(positions), chunk_size):
+            chunk = positions[start:start + chunk_size]
+            try:
+                with db_proxy.atomic():
+                    user_ids = create_users(fields.iloc[chunk], orphans)
+            except Exception as e:
+                logger.error(f'Rows {chunk[0] + 1}-{chunk[-1] + 1} '
+                             f'are not imported: {e}')
+                report.loc[chunk, ['status', 'error']] = [FAILED, str(e)]
+            else:
+                report.loc[chunk, 'status'] = CREATED
+                report.loc[chunk, 'user_id'] = user_ids
+
+    report['user_id'] = report['user_id'].astype('Int64')
+    return report
+
+
+def summarize(report):
+    """The number of rows of every status
+
+    :rtype: dict
+    """
+
+    counts = report['status'].value_counts()
+    return {'rows': len(report),
+            **{status: int(counts.get(status, 0)) for status in
+               (NEW, CREATED, EXISTS, DUPLICATE, INVALID, FAILED)}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Create users from CSV or NDJSON file')
+    parser.add_argument('path', help="file with 'phone' and "
+                                     f"{', '.join(IMPORT_FIELDS)} columns")
+    parser.add_argument('--format', choices=[CSV, NDJSON],
+                        help='format of the file (by its extension '
+                             'by default)')
+    parser.add_argument('--report', help='CSV file to write the result '
+                                         'of every row to')
+    parser.add_argument('--chunk-size', type=int,
+                        default=USERS_IMPORT_CHUNK_SIZE)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="validate the file, don't create users")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or (NDJSON if args.path.endswith(('.ndjson', '.jsonl'))
+                          else CSV)
+    with open(args.path, 'rb') as file:
+        rows = read_users(file.read(), fmt)
+    report = import_users(rows, args.chunk_size, args.dry_run)
+    if args.report:
+        report.to_csv(args.report, index=False)
+    summary = summarize(report)
+    print(json.dumps(summary))
+    return 1 if summary[FAILED] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -25,9 +25,11 @@ Copyright (c) 2021
 """
 
 
+import json
 import datetime
-from peewee import Proxy, Model, DateTimeField
-from flaskapp.models.storages import postgres_db
+from peewee import Proxy, Model, DateTimeField, SqliteDatabase, SQL
+from playhouse.postgres_ext import BinaryJSONField
+from flaskapp.models.storages import database
 
 db_proxy = Proxy()
 
@@ -50,6 +52,41 @@ class DatesMixin(BaseModel):
         super().save(*args, **kwargs)
         
 
+class JSONField(BinaryJSONField):
+    """JSONB field on postgres; on sqlite (see DATABASE_BACKEND setting)
+    values are stored as json text, without index
+    """
+
+    def _on_sqlite(self):
+        model = getattr(self, 'model', None)  # None until bound to model
+        db = model._meta.database if model else None
+        return isinstance(getattr(db, 'obj', db), SqliteDatabase)
+
+    @property
+    def index(self):
+        # sqlite has no GIN indexes
+        return self._index and not self._on_sqlite()
+
+    @index.setter
+    def index(self, value):
+        self._index = value
+
+    def ddl_datatype(self, ctx):
+        if self._on_sqlite():
+            return SQL('TEXT')
+        return super().ddl_datatype(ctx)
+
+    def db_value(self, value):
+        if self._on_sqlite():
+            return value if value is None else json.dumps(value)
+        return super().db_value(value)
+
+    def python_value(self, value):
+        if self._on_sqlite() and isinstance(value, str):
+            return json.loads(value)
+        return super().python_value(value)
+
+
 # NOTE:  Dynamic db-switching is absolutely unnecessary
 # However, this construction will be useful when testing
-db_proxy.initialize(postgres_db)
+db_proxy.initialize(database)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 7:05:43 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import os
+import fcntl
+import hashlib
+import logging
+import datetime
+import tempfile
+from peewee import AutoField, CharField, DateTimeField, SqliteDatabase
+from flaskapp.models.bases import BaseModel, DatesMixin, db_proxy
+
+
+logger = logging.getLogger(__name__)
+
+
+class BeatCheckpoint(DatesMixin, BaseModel):
+    """ Progress of long-running beats (see `Checkpoint`) """
+
+    id       = AutoField()                                  # noqa: E221
+    name     = CharField(max_length=100, unique=True)       # noqa: E221
+    position = CharField(max_length=100, null=True)         # noqa: E221
+    started  = DateTimeField(null=True)                     # noqa: E221
+    finished = DateTimeField(null=True)                     # noqa: E221
+
+    class Meta:
+        table_name = 'beat_checkpoints'
+
+
+class BeatWatermark(DatesMixin, BaseModel):
+    """ Time up to which changes are processed by a beat (see `Watermark`) """
+
+    id    = AutoField()                                     # noqa: E221
+    name  = CharField(max_length=100, unique=True)          # noqa: E221
+    value = DateTimeField(null=True)                        # noqa: E221
+
+    class Meta:
+        table_name = 'beat_watermarks'
+
+
+def lock_key(name):
+    """Advisory lock key (signed 64-bit integer) of the name
+
+    :param name: lock name, e.g. beat name
+    :type name: str
+    :rtype: int
+    """
+
+    digest = hashlib.sha1(name.encode()).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+class AdvisoryLock:
+    """Cluster-wide non-blocking lock
+
+    On postgres it's session-level advisory lock taken by a dedicated
+    connection (not the pooled one), so it is released by postgres
+    if the process holding it dies. On sqlite (local runs) it is a file
+    lock shared by processes of the same machine.
+
+    >>> with AdvisoryLock('gspread_to_postgres') as acquired:
+    ...     if acquired:
+    ...         sync()
+
+    :param name: lock name
+    :type name: str
+    :param database: defaults to the database models are bound to
+    :type database: peewee.Database, optional
+    """
+
+    def __init__(self, name, database=None):
+        self.name = name
+        self.key = lock_key(name)
+        self.database = database
+        self._connection = None
+        self._file = None
+
+    def acquire(self):
+        """Take the lock if it is free
+
+        :return: True if the lock is taken
+        :rtype: bool
+        """
+
+        database = self.database or db_proxy.obj
+        if isinstance(database, SqliteDatabase):
+            return self._acquire_file()
+
+        import psycopg2
+        connection = psycopg2.connect(database=database.database,
+                                      **database.connect_params)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', (self.key,))
+            acquired = cursor.fetchone()[0]
+        if acquired:
+            self._connection = connection
+        else:
+            connection.close()
+        return acquired
+
+    def _acquire_file(self):
+        path = os.path.join(tempfile.gettempdir(),
+                            f'buzznet-lock-{self.key & 0xffffffffffffffff:x}')
+        fd = open(path, 'a')
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fd.close()
+            return False
+        self._file = fd
+        return True
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                with self._connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)',
+                                   (self.key,))
+            finally:
+                # closing the session releases the lock anyway
+                self._connection.close()
+                self._connection = None
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Checkpoint:
+    """Position (a stable key, e.g. phone number of the last processed
+    user) of a long-running beat; it is saved while the beat runs and
+    dropped when it finishes, so a crashed (or killed) run is resumed
+    by the next one
+
+    >>> checkpoint = Checkpoint('get-profile-details-weekly')
+    >>> for user in users_after(checkpoint.position):
+    ...     process(user)
+    ...     checkpoint.save(user.phone)
+    >>> checkpoint.finish()
+
+    :param name: beat name
+    :type name: str
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.record, _ = BeatCheckpoint.get_or_create(name=name)
+        self.resumed = self.record.position is not None
+        if self.resumed:
+            logger.info(f'{name} is resumed after {self.record.position}')
+        self.record.started = datetime.datetime.now()
+        self.record.finished = None
+        self.record.save()
+
+    @property
+    def position(self):
+        """ Saved position, None if the previous run has finished """
+        return self.record.position
+
+    def save(self, position):
+        self.record.position = position
+        BeatCheckpoint.update(
+            position=position,
+            updated=datetime.datetime.now()
+        ).where(BeatCheckpoint.id == self.record.id).execute()
+
+    def finish(self):
+        self.record.position = None
+        self.record.finished = datetime.datetime.now()
+        self.record.save()
+
+
+class Watermark:
+    """Time up to which rows changed (see `DatesMixin.updated`) are
+    processed by a beat; the beat reads rows changed after `value`
+    and advances it to the time it has started at, so rows changed
+    while it runs are processed by the next run again
+
+    >>> watermark = Watermark('sheets-mirror')
+    >>> started = datetime.datetime.now()
+    >>> mirror(User.select().where(User.updated > watermark.value))
+    >>> watermark.advance(started)
+
+    :param name: beat name
+    :type name: str
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.record, _ = BeatWatermark.get_or_create(name=name)
+
+    @property
+    def value(self):
+        """ None if the beat hasn't finished yet (all rows are changed) """
+        return self.record.value
+
+    def advance(self, value):
+        self.record.value = value
+        self.record.save()
+
+    def reset(self):
+        self.advance(None)
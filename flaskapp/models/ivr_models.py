@@ -28,12 +28,11 @@ Copyright (c) 2021
 import uuid
 from peewee import (AutoField, TextField, DateTimeField,
                     CharField, ForeignKeyField, FloatField,
-                    IntegerField)
+                    IntegerField, TimeField)
 
 from flaskapp.settings import OTP_PASSWORD_LENGTH
-from flaskapp.models.bases import BaseModel, DatesMixin
+from flaskapp.models.bases import BaseModel, DatesMixin, JSONField
 from flaskapp.tools.authtools.authgen import generate_otp
-from playhouse.postgres_ext import BinaryJSONField
 
 
 USER_STATUSES = (
@@ -59,6 +58,9 @@ class User(DatesMixin, BaseModel):
         choices=GENDER_CHOICES
     )
     timezone  = CharField(max_length=50, null=True)     # noqa: E221
+    # preferred local time of calls (CALL_WINDOW_* settings if null)
+    call_window_start = TimeField(null=True)
+    call_window_end   = TimeField(null=True)            # noqa: E221
     type      = CharField(max_length=1, null=True)      # noqa: E221
     status    = CharField(max_length=1,                 # noqa: E221
                           default='A',
@@ -97,7 +99,7 @@ class Call(DatesMixin, BaseModel):
 
 class HealthMetric(DatesMixin, BaseModel):
     id         = AutoField()                 # noqa: E221
-    data       = BinaryJSONField(null=True)  # noqa: E221
+    data       = JSONField(null=True)        # noqa: E221
     user       = ForeignKeyField(            # noqa: E221
         User,
         backref='health_metrics',
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 8:05:51 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import re
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flaskapp.models.bases import db_proxy
+from flaskapp.models.ivr_models import User, PhoneNumber
+from flaskapp.models.storages import gs_users_existing
+from flaskapp.tools.metrics import registry, SHADOW_READ_METRIC
+from flaskapp.tools.phones import find_phone_row, mask_phone
+from flaskapp.settings import STORAGE_ROUTES, SHADOW_READS_MAX_PENDING
+
+
+__all__ = ('storage_router', 'StorageRouter', 'parse_route')
+
+
+logger = logging.getLogger(__name__)
+
+
+SHEETS, POSTGRES = 'sheets', 'postgres'
+
+ROUTE_RE = re.compile(r'^(sheets|postgres)(?:\+shadow\((\d+(?:\.\d+)?)%\))?$')
+
+
+def parse_route(route):
+    """Parse storage route, e.g. 'postgres+shadow(5%)'
+
+    :return: primary storage, secondary one and the share (0..1) of reads
+             the secondary storage is read (in background) as well
+    :rtype: Tuple[str, str, float]
+    """
+
+    match = ROUTE_RE.match(route.replace(' ', ''))
+    if not match:
+        raise ValueError(f"Invalid storage route: {route}; it should be "
+                         "'sheets', 'postgres' or 'postgres+shadow(N%)'")
+    primary, percent = match.groups()
+    secondary = SHEETS if primary == POSTGRES else POSTGRES
+    rate = float(percent or 0) / 100
+    if rate > 1:
+        raise ValueError(f"Invalid storage route: {route}; N should be "
+                         "from 0 to 100")
+    return primary, secondary, rate
+
+
+# --- readers: function(cleaned phone number) -> value (None if unknown)
+
+def sheet_row(phone_number):
+    """Row of the Users sheet with the phone number (None if not found)
+
+    :raises LookupError: if the sheet can't be read
+    """
+
+    rows = gs_users_existing.get_all_records()
+    if not isinstance(rows, list):  # see ensure_gc_opened
+        raise LookupError("Users sheet is unavailable")
+    return find_phone_row(rows, phone_number)
+
+
+def _sheet_value(column):
+    def read(phone_number):
+        row = sheet_row(phone_number)
+        return (row.get(column) or None) if row else None
+    return read
+
+
+def _user_field(field):
+    def read(phone_number):
+        return User.select(field).join(PhoneNumber).where(
+            PhoneNumber.number == phone_number
+        ).scalar()
+    return read
+
+
+def _user_exists_in_sheet(phone_number):
+    return sheet_row(phone_number) is not None
+
+
+def _user_exists_in_postgres(phone_number):
+    # a caller who hasn't joined yet has a phone number without a user
+    # (as Calls tab of the sheet, which isn't read either)
+    return PhoneNumber.select().where(
+        (PhoneNumber.number == phone_number) &
+        PhoneNumber.user.is_null(False)
+    ).exists()
+
+
+READERS = {
+    'username': {SHEETS: _sheet_value('username'),
+                 POSTGRES: _user_field(User.username)},
+    'client_type': {SHEETS: _sheet_value('type'),
+                    POSTGRES: _user_field(User.type)},
+    'user_exists': {SHEETS: _user_exists_in_sheet,
+                    POSTGRES: _user_exists_in_postgres},
+}
+
+
+class StorageRouter:
+    """Reads users' data from the storage configured per entity
+    (`STORAGE_ROUTES` setting); in shadow mode a sample of reads is
+    repeated against the secondary storage in a background thread
+    and the results are compared, so the request waits only for the
+    primary storage. Duration of shadow reads is recorded with
+    `result` label: match, mismatch or error.
+
+    :param routes: entity -> route, see `parse_route`
+    :type routes: dict
+    :param readers: entity -> {storage: function(phone number)}
+    :type readers: dict
+    :param max_pending: shadow reads skipped when that many are waiting
+    :type max_pending: int
+    """
+
+    def __init__(self, routes=STORAGE_ROUTES, readers=READERS,
+                 max_pending=SHADOW_READS_MAX_PENDING):
+        self.routes = {entity: parse_route(route)
+                       for entity, route in routes.items()}
+        self.readers = readers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        # threads are started on the first shadow read (after forking)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix='shadow-read')
+        return self._executor
+
+    def read(self, entity, phone_number):
+        """Value of the entity for the (cleaned) phone number
+        from its primary storage"""
+
+        primary, secondary, rate = self.routes[entity]
+        value = self.readers[entity][primary](phone_number)
+        if rate and random.random() < rate:
+            self.shadow_read(entity, secondary, phone_number, value)
+        return value
+
+    def shadow_read(self, entity, storage, phone_number, expected):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                logger.debug(f"Shadow read of {entity} is skipped")
+                return None
+            self._pending += 1
+        return self.executor.submit(self._compare, entity, storage,
+                                    phone_number, expected)
+
+    def _compare(self, entity, storage, phone_number, expected):
+        start = time.perf_counter()
+        try:
+            if storage == POSTGRES:
+                with db_proxy.obj.connection_context():
+                    actual = self.readers[entity][storage](phone_number)
+            else:
+                actual = self.readers[entity][storage](phone_number)
+            result = 'match' if actual == expected else 'mismatch'
+            if result == 'mismatch':
+                logger.warning(f"Shadow read mismatch: {entity} of "
+                               f"{mask_phone(phone_number)} is "
+                               f"{expected!r}, {storage} has {actual!r}")
+        except Exception as e:
+            result = 'error'
+            logger.error(f"Shadow read of {entity} from {storage} "
+                         f"failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+        registry.observe(SHADOW_READ_METRIC, time.perf_counter() - start,
+                         entity=entity, storage=storage, result=result)
+        return result
+
+
+storage_router = StorageRouter()
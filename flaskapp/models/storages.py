@@ -25,12 +25,17 @@ Copyright (c) 2021
 """
 
 
+import time
 import gspread
 import logging
 from functools import wraps
+import sqlite3
 from playhouse.pool import PooledPostgresqlExtDatabase
+from playhouse.sqlite_ext import SqliteExtDatabase
+from flaskapp.tools.metrics import timed, timer
+from flaskapp.tools.querystats import record_query
+from flaskapp.tools.utils import get_gspread_client
 from flaskapp.settings import (
-    GOOGLE_SA_JSON_PATH,
     GOOGLE_USERS_SHEET_NAME_EXISTING,
     GOOGLE_USERS_SHEET_NAME_CALLS,
     GOOGLE_USERS_SPREADSHEET_ID,
@@ -44,26 +49,88 @@ from flaskapp.settings import (
     POSTGRESQL_TEST_DB_NAME,
     POSTGRES_MAX_CONNECTIONS,
     POSTGRES_STALE_TIMEOUT,
+    DATABASE_BACKEND,
+    SQLITE_DATABASE,
     TEST_ENVIRONMENT
 )
 
 
-__all__ = ('gs_users_existing', 'gs_users_calls', 'postgres_db')
+__all__ = ('gs_users_existing', 'gs_users_calls', 'database', 'postgres_db',
+           'create_database')
 
 
 logger = logging.getLogger(__name__)
 
 
-postgres_db = PooledPostgresqlExtDatabase(
-    database=POSTGRESQL_TEST_DB_NAME if
-    TEST_ENVIRONMENT else POSTGRESQL_DB_NAME,
-    user=POSTGRESQL_USER,
-    password=POSTGRESQL_PASSWORD,
-    host=POSTGRESQL_HOST,
-    port=POSTGRESQL_PORT,
-    max_connections=POSTGRES_MAX_CONNECTIONS,
-    stale_timeout=POSTGRES_STALE_TIMEOUT
-)
+class InstrumentedDatabaseMixin:
+    """Records latency of every statement executed through the database
+    (see `flaskapp.tools.metrics`) and accounts it to the query budget
+    of the current request (see `flaskapp.tools.querystats`)
+    """
+
+    def execute_sql(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with timer('postgres', 'execute_sql'):
+                return super().execute_sql(sql, *args, **kwargs)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+
+class InstrumentedPooledPostgresqlExtDatabase(InstrumentedDatabaseMixin,
+                                              PooledPostgresqlExtDatabase):
+    ...
+
+
+class InstrumentedSqliteExtDatabase(InstrumentedDatabaseMixin,
+                                    SqliteExtDatabase):
+    """sqlite database; shared-memory one (uri with `mode=memory`)
+    is kept alive by a dedicated connection, so its content survives
+    closing of any (e.g. per-request) connection
+    """
+
+    def __init__(self, database, *args, **kwargs):
+        kwargs.setdefault('pragmas', {'foreign_keys': 1})
+        is_uri = database.startswith('file:')
+        if is_uri:
+            kwargs['uri'] = True
+        super().__init__(database, *args, **kwargs)
+        self.keeper = sqlite3.connect(database, uri=True) \
+            if is_uri and 'mode=memory' in database else None
+
+
+def create_database(backend=DATABASE_BACKEND,
+                    sqlite_database=SQLITE_DATABASE):
+    """Create database models are bound to (through `db_proxy`)
+
+    :param backend: 'postgres' or 'sqlite', defaults to DATABASE_BACKEND
+    :type backend: str
+    :param sqlite_database: sqlite file name or uri
+    :type sqlite_database: str
+    :rtype: peewee.Database
+    """
+
+    if backend == 'sqlite':
+        return InstrumentedSqliteExtDatabase(sqlite_database)
+    if backend != 'postgres':
+        raise ValueError(f"Unknown database backend: {backend}")
+    return InstrumentedPooledPostgresqlExtDatabase(
+        database=POSTGRESQL_TEST_DB_NAME if
+        TEST_ENVIRONMENT else POSTGRESQL_DB_NAME,
+        user=POSTGRESQL_USER,
+        password=POSTGRESQL_PASSWORD,
+        host=POSTGRESQL_HOST,
+        port=POSTGRESQL_PORT,
+        max_connections=POSTGRES_MAX_CONNECTIONS,
+        stale_timeout=POSTGRES_STALE_TIMEOUT
+    )
+
+
+database = create_database()
+
+# NOTE: kept for backward compatibility; it's sqlite database
+# if DATABASE_BACKEND is 'sqlite'
+postgres_db = database
 
 
 def ensure_gc_opened(method):
@@ -95,7 +162,7 @@ def ensure_gc_opened(method):
 class GoogleSpreadSheet:
     """Helper class to interact with Google Spreadsheets via API"""
 
-    gc = gspread.service_account(filename=GOOGLE_SA_JSON_PATH)
+    gc = get_gspread_client()
 
     def __init__(self, document_id='', sheet_name=''):
         self.document_id = document_id
@@ -107,18 +174,22 @@ class GoogleSpreadSheet:
         self.spreadsheet = self.gc.open_by_key(self.document_id)
         self.worksheet = self.spreadsheet.worksheet(self.sheet_name)
 
+    @timed('gspread')
     @ensure_gc_opened
     def get_all_value(self):
         return self.worksheet.get_all_values()
 
+    @timed('gspread')
     @ensure_gc_opened
     def get_all_records(self):
         return self.worksheet.get_all_records()
 
+    @timed('gspread')
     @ensure_gc_opened
     def update_cell(self, rown, coln, value):
         self.worksheet.update_cell(rown, coln, value)
 
+    @timed('gspread')
     @ensure_gc_opened
     def append_row_to_sheet(self, row):
         """Tries to append a row to the corresponding spreadsheet/sheet_name
@@ -25,10 +25,21 @@ Copyright (c) 2021
 """
 
 
-from flaskapp.models.storages import postgres_db
+import os
+import sqlite3
+import hashlib
+from peewee import SqliteDatabase, sort_models
+from flaskapp.settings import SQLITE_SCHEMA_TEMPLATE
+from flaskapp.models.bases import db_proxy
 from flaskapp.models.ivr_models import (User, UserToken, HealthMetric,
                                         Call, SmartReminder, Reminder,
                                         OTPPassword, PhoneNumber)
+from flaskapp.models.beats import BeatCheckpoint, BeatWatermark
+
+
+ALL_TABLES = [User, UserToken, HealthMetric, Call, Reminder,
+              SmartReminder, OTPPassword, PhoneNumber, BeatCheckpoint,
+              BeatWatermark]
 
 
 def create_tables(tables=None):
@@ -40,21 +51,78 @@ def create_tables(tables=None):
     """
 
     if tables:
-        with postgres_db:
-            postgres_db.create_tables(tables)
+        with db_proxy.obj as database:
+            database.create_tables(tables)
+
+
+def schema_hash(tables):
+    """Hash of DDL statements creating tables (and their indexes)
+    in the current database
+
+    :param tables: a list of tables (subclasses of peewee.Model)
+    :type tables: List[peewee.Model]
+    :rtype: str
+    """
+
+    digest = hashlib.sha1()
+    for model in sort_models(tables):
+        schema = model._schema
+        for ctx in [schema._create_table()] + schema._create_indexes():
+            digest.update(ctx.query()[0].encode())
+    return digest.hexdigest()[:12]
+
+
+def restore_schema(tables, template=SQLITE_SCHEMA_TEMPLATE):
+    """Replace content of the current (sqlite) database with empty tables
+    copied from schema template file
+
+    The template file name contains schema hash, so it is created
+    (once) again if any model changes.
+
+    :param tables: a list of tables (subclasses of peewee.Model)
+    :type tables: List[peewee.Model]
+    :param template: template file name (hash is added to it)
+    :type template: str
+    """
+
+    database = db_proxy.obj
+    root, ext = os.path.splitext(template)
+    path = f'{root}-{schema_hash(tables)}{ext}'
+
+    if os.path.exists(path):
+        source = sqlite3.connect(path)
+        try:
+            source.backup(database.connection())
+        finally:
+            source.close()
+        return
+
+    database.drop_tables(tables)
+    database.create_tables(tables)
+    temp_path = f'{path}.{os.getpid()}'
+    target = sqlite3.connect(temp_path)
+    try:
+        database.connection().backup(target)
+    finally:
+        target.close()
+    os.replace(temp_path, path)
 
 
 def init_db():
     """Create all necessary tables for the project
+
+    On sqlite all tables are copied from schema template
+    (see `restore_schema`), i.e. existing data is dropped.
     """
 
-    create_tables([User, UserToken, HealthMetric, Call, Reminder,
-                   SmartReminder, OTPPassword, PhoneNumber])
+    if isinstance(db_proxy.obj, SqliteDatabase):
+        restore_schema(ALL_TABLES)
+    else:
+        create_tables(ALL_TABLES)
 
 
 def drop_all_tables():
     """Drop all tables related to the project
     """
 
-    postgres_db.drop_tables([User, UserToken, HealthMetric, Call, Reminder,
-                             SmartReminder, OTPPassword, PhoneNumber])
+    db_proxy.obj.drop_tables(ALL_TABLES)
@@ -26,6 +26,7 @@ Copyright (c) 2021
 
 
 from flask import Blueprint
+from flaskapp.tools.metrics import timed_view
 
 
 class BaseBlueprint(Blueprint):
@@ -58,6 +59,10 @@ class BaseBlueprint(Blueprint):
         Note: all views registered by `bulk_register` method by default have
         have GET and POST methods as allowed.
 
+        Each registered view is wrapped by `timed_view`, so its latency
+        is recorded (see `flaskapp.tools.metrics`) under the
+        `<blueprint name>.<view name>` label.
+
         :param route_urls: customize view url , defaults to dict()
         :type route_urls: dict, optional
         :param route_methods: per-view customization of allowed http-methods,
@@ -71,7 +76,9 @@ class BaseBlueprint(Blueprint):
                 methods = route_methods.get(view.__name__, default_methods)
                 url = route_urls.get(view.__name__, f"{view.__name__}")
                 url = '/' + url if not url.startswith('/') else url
-                self.route(url, methods=methods)(view)
+                self.route(url, methods=methods)(
+                    timed_view(view, f"{self.name}.{view.__name__}")
+                )
 
 
 class TwilioBluprint(BaseBlueprint):
@@ -25,6 +25,7 @@ Copyright (c) 2021
 
 from flaskapp.routes.bluprints import TwilioBluprint, MobileAPIBluprint
 from flaskapp.tools.utils import ensure_twilio_voice_response
+from flaskapp.tools import recorder
 from flaskapp.views.ivrflow import (
     get_username,
     get_client_type,
@@ -47,6 +48,7 @@ from flaskapp.views.ivrflow import (
     new_user,
     unsubscribe
 )
+from flaskapp.views.provisioning import import_users_view
 
 
 IVRFlowBlueprint = TwilioBluprint('IVRFlowBlueprint', __name__)
@@ -55,6 +57,11 @@ MobileBluprint = MobileAPIBluprint('MobileAPIBluprint', __name__)
 
 IVRFlowBlueprint.after_request(ensure_twilio_voice_response)
 
+# Opt-in recording of incoming traffic for replaying it in load tests
+# (see TRAFFIC_RECORDER_DIR setting)
+recorder.init_blueprint(IVRFlowBlueprint)
+recorder.init_blueprint(MobileBluprint)
+
 
 # Bulk registration of views is essintialy
 # possbile because in our case the url-enpoints have
@@ -106,4 +113,10 @@ MobileBluprint.bulk_register(
             'get_privacy': 'privacy',
             'get_profile': 'authenticate/get_profile'
         }
-)
\ No newline at end of file
+)
+
+MobileBluprint.bulk_register(
+        import_users_view,
+        route_urls={'import_users_view': 'users/import'},
+        route_methods={'import_users_view': ['POST']}
+)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 10:33:47 am
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+from flaskapp.routes.bluprints import BaseBlueprint
+from flaskapp.views.monitoring import get_metrics
+
+
+MonitoringBlueprint = BaseBlueprint('MonitoringBlueprint', __name__)
+
+
+MonitoringBlueprint.bulk_register(
+        get_metrics,
+        route_urls={'get_metrics': 'metrics'},
+        route_methods={'get_metrics': ['GET']}
+)
@@ -26,6 +26,7 @@ Copyright (c) 2021
 
 
 import os
+import tempfile
 import flaskapp.setenvs
 # ---------- Twilio configuration ------------------
 
@@ -36,6 +37,10 @@ TWILIO_MAIN_PHONE_NUMBER = os.environ.get("TWILIO_MAIN_PHONE_NUMBER", "")
 # Optional phone number
 TWILIO_OPT_PHONE_NUMBER = os.environ.get("TWILIO_OPT_PHONE_NUMBER", "")
 
+# Base URL of local Twilio REST API stand-in (see loadtest/README.md);
+# if set, all Twilio API requests are sent there instead of *.twilio.com
+TWILIO_API_URL = os.environ.get("TWILIO_API_URL", "")
+
 
 # ---------- Google API Configs --------------------
 
@@ -50,6 +55,10 @@ GOOGLE_CSE_MAX_NUM = 3
 # Path to the json file with Google service account credentials
 GOOGLE_SA_JSON_PATH = os.environ.get("GOOGLE_SA_JSON_PATH", "")
 
+# Base URL of local Google Sheets API stand-in (see loadtest/README.md);
+# if set, spreadsheets are read/written there instead of Google
+GOOGLE_SHEETS_API_URL = os.environ.get("GOOGLE_SHEETS_API_URL", "")
+
 
 # ---------- Google docs IDs -----------------------
 
@@ -67,6 +76,69 @@ GOOGLE_HEALTH_DB_SPREADSHEET_ID = ""
 GOOGLE_HEALTH_DB_SHEET_NAME = "blood_pressure"
 
 
+# ---------- Users sheet mirror --------------------
+
+# Webhooks write users' data to postgres only; the Users sheet is
+# a read-only mirror updated by `sheets-mirror` beat (see
+# flaskapp/core/sheets_mirror.py). Set GOOGLE_SHEETS_DUAL_WRITE to
+# write the sheet synchronously from webhooks as well (legacy mode)
+GOOGLE_SHEETS_DUAL_WRITE = "GOOGLE_SHEETS_DUAL_WRITE" in os.environ
+
+# How often (minutes) changed rows are mirrored to the sheet
+SHEETS_MIRROR_INTERVAL = int(os.environ.get("SHEETS_MIRROR_INTERVAL", 10))
+
+# Max number of ranges (rows) written by one values:batchUpdate request
+SHEETS_MIRROR_BATCH_RANGES = 500
+
+# Rows updated up to that many seconds before a run has started are
+# mirrored by the next run again: a transaction may commit after the run
+# has read the tables (writes of the mirror are idempotent)
+SHEETS_MIRROR_OVERLAP = int(os.environ.get("SHEETS_MIRROR_OVERLAP", 60))
+
+
+# ---------- Storage routing -----------------------
+
+# Source of truth of users' data read by webhooks (see
+# flaskapp/models/routing.py), per entity: 'sheets', 'postgres' or
+# 'postgres+shadow(N%)' - postgres is returned, and for N% of reads
+# the sheet is read in background and compared with it (mismatches
+# are counted by buzznet_shadow_read_seconds metric); the sheet is
+# read by default, routing to postgres is opt-in,
+# e.g. STORAGE_ROUTE_USERNAME=postgres+shadow(5%)
+STORAGE_ROUTE_DEFAULT = os.environ.get("STORAGE_ROUTE_DEFAULT", "sheets")
+STORAGE_ROUTES = {
+    entity: os.environ.get(f"STORAGE_ROUTE_{entity.upper()}",
+                           STORAGE_ROUTE_DEFAULT)
+    for entity in ('username', 'client_type', 'user_exists')
+}
+
+# Max number of shadow reads waiting for a thread; extra ones are skipped
+SHADOW_READS_MAX_PENDING = 20
+
+
+# ---------- Users reconciliation ------------------
+
+# `users-reconcile` beat compares the Users sheet with users in postgres
+# (see flaskapp/core/reconcile.py) and repairs the given side:
+# '' - report only, 'sheets' - write postgres values to the sheet,
+# 'postgres' - create/update users from the sheet
+RECONCILE_REPAIR = os.environ.get("RECONCILE_REPAIR", "")
+
+# Max number of users inserted/updated by one query while repairing postgres
+RECONCILE_CHUNK_SIZE = 1000
+
+
+# ---------- Users import --------------------------
+
+# Requests to /users/import should have `X-Admin-Token: <USERS_IMPORT_TOKEN>`
+# header (the endpoint is off if the token is empty); see
+# flaskapp/core/user_import.py
+USERS_IMPORT_TOKEN = os.environ.get("USERS_IMPORT_TOKEN", "")
+
+# Max number of users inserted by one query (and one transaction)
+USERS_IMPORT_CHUNK_SIZE = 1000
+
+
 # ------------ DATABASE CONFIGURATION --------------
 POSTGRESQL_DB_NAME = 'goanddo'
 POSTGRESQL_USER = 'postgres'
@@ -81,6 +153,38 @@ POSTGRES_MAX_CONNECTIONS = 32
 # The number of seconds allowed to any of connections to postgres
 POSTGRES_STALE_TIMEOUT = 300
 
+# Warn if a request (or celery task) executes more queries than that
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", 30))
+
+# The same for celery beats/tasks; they normally process many users,
+# so there is no budget by default (0)
+QUERY_TASK_BUDGET = int(os.environ.get("QUERY_TASK_BUDGET", 0))
+
+# Warn if the same statement is repeated that many times
+# within a request (probably N+1 queries); 0 turns it off
+QUERY_DUPLICATE_THRESHOLD = int(
+    os.environ.get("QUERY_DUPLICATE_THRESHOLD", 5)
+)
+
+
+# Database backend: 'postgres' (production) or 'sqlite'
+# (in-memory database for benchmarks, tests and fast local runs)
+DATABASE_BACKEND = os.environ.get("DATABASE_BACKEND", "postgres")
+
+# sqlite database: file name, ':memory:' (private to a connection)
+# or uri; shared-memory database lives as long as the process
+SQLITE_DATABASE = os.environ.get(
+    "SQLITE_DATABASE",
+    "file:buzznet?mode=memory&cache=shared"
+)
+
+# Empty sqlite database with all tables created; it is copied
+# to SQLITE_DATABASE instead of creating tables one by one
+# (re-created automatically whenever models change)
+SQLITE_SCHEMA_TEMPLATE = os.environ.get(
+    "SQLITE_SCHEMA_TEMPLATE",
+    os.path.join(tempfile.gettempdir(), "buzznet_schema.sqlite")
+)
 
 # Heroku specific settings
 POSTGRESQL_URL = os.environ.get("POSTGRESQL_URL", "")
@@ -93,6 +197,96 @@ OTP_DURATION = os.environ.get('OTP_DURATION', 60)
 OTP_PASSWORD_LENGTH = 6
 
 
+# ------------- Monitoring configuration -----------
+
+METRICS_ENABLED = "METRICS_DISABLED" not in os.environ
+
+# Directory shared by all worker processes (gunicorn, celery);
+# each process dumps its metrics there, `/metrics` endpoint merges them.
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), "buzznet_metrics")
+)
+
+# The number of seconds between dumps of per-process metrics
+METRICS_FLUSH_INTERVAL = 5
+
+# Dumps not updated for that many seconds are left by dead processes
+# (killed workers don't remove them), they are deleted by `/metrics`
+METRICS_EXPIRE_AFTER = 60
+
+# Upper bounds (seconds) of latency histogram buckets
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Where to send finished tracing spans: '' (tracing is off),
+# 'file' (json lines appended to TRACING_FILE)
+# or 'otlp' (OTLP/HTTP json collector at TRACING_OTLP_ENDPOINT)
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "")
+TRACING_FILE = os.environ.get(
+    "TRACING_FILE",
+    os.path.join(tempfile.gettempdir(), "buzznet_spans.ndjson")
+)
+TRACING_OTLP_ENDPOINT = os.environ.get(
+    "TRACING_OTLP_ENDPOINT",
+    "http://127.0.0.1:4318/v1/traces"
+)
+TRACING_SERVICE_NAME = "buzznet"
+
+# Fraction of traces (started by webhooks or beats) to be exported
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 0.1))
+
+# The number of seconds between exports of finished spans
+TRACING_FLUSH_INTERVAL = 2
+
+# Requests with `X-Profile: <PROFILER_ADMIN_TOKEN>` header are profiled
+# (profiling on demand is off if the token is empty)
+PROFILER_ADMIN_TOKEN = os.environ.get("PROFILER_ADMIN_TOKEN", "")
+
+# Fraction of requests / celery tasks to be profiled without asking
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", 0))
+PROFILER_TASK_SAMPLE_RATE = float(
+    os.environ.get("PROFILER_TASK_SAMPLE_RATE", 0)
+)
+
+# Where collapsed-stack profiles are written and how many to keep
+PROFILER_DIR = os.environ.get(
+    "PROFILER_DIR",
+    os.path.join(tempfile.gettempdir(), "buzznet_profiles")
+)
+PROFILER_MAX_PROFILES = 50
+
+# The number of seconds between stack samples of profiled thread
+PROFILER_INTERVAL = 0.005
+
+# Webhook/mobile API traffic is recorded (gzipped json lines) to that
+# directory for replaying it later (see loadtest/README.md);
+# recording is off if it is empty
+TRAFFIC_RECORDER_DIR = os.environ.get("TRAFFIC_RECORDER_DIR", "")
+
+# Secret used for hashing phone numbers in recorded traffic
+# (required: traffic isn't recorded if it is empty)
+TRAFFIC_RECORDER_SALT = os.environ.get("TRAFFIC_RECORDER_SALT", "")
+
+# The number of seconds between writes of recorded requests
+TRAFFIC_RECORDER_FLUSH_INTERVAL = 2
+
+
+# ------------- Call scheduling --------------------
+
+# Local time window users are called in, unless their own window
+# (`User.call_window_start`/`call_window_end`) is set
+CALL_WINDOW_START = os.environ.get("CALL_WINDOW_START", "10:00")
+CALL_WINDOW_END = os.environ.get("CALL_WINDOW_END", "12:00")
+
+# Time zone of users without (valid) `User.timezone`
+DEFAULT_TIMEZONE = os.environ.get("DEFAULT_TIMEZONE", "US/Eastern")
+
+# Max number of calls scheduled for the same minute; extra calls
+# are moved to the next minutes (smoothing out morning peaks)
+CALLS_PER_MINUTE_MAX = int(os.environ.get("CALLS_PER_MINUTE_MAX", 60))
+
+
 # -----------  Helper constants --------------------
 # True if we run the script on Heroku, otherwise False.
 ON_HEROKU = 'HEROKU' in os.environ
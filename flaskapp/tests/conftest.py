@@ -26,8 +26,14 @@ Copyright (c) 2021
 
 
 import pytest
+import threading
+from contextlib import contextmanager
+from werkzeug.serving import make_server
+from loadtest.sheets_server import (SheetsStore, generate_users_spreadsheet,
+                                    create_app as create_sheets_api)
 from flaskapp import create_app
 from flaskapp.models.utils import init_db, drop_all_tables
+from flaskapp.tools.querystats import track_queries
 
 
 @pytest.fixture(scope='module')
@@ -53,3 +59,38 @@ def client():
         # Establish an application context
         with flask_app.app_context():
             yield testing_client  # this is where the testing happens!
+
+
+@pytest.fixture
+def query_budget():
+    """Fails the test if the block executes more queries than allowed
+
+    >>> def test_voice(client, query_budget):
+    ...     with query_budget(3):
+    ...         client.post(url_for('IVRFlowBlueprint.voice'), data=...)
+    """
+
+    @contextmanager
+    def assert_max_queries(max_queries):
+        with track_queries('query_budget', budget=0,
+                           duplicate_threshold=0) as stats:
+            yield stats
+        assert stats.count <= max_queries, stats.report()
+
+    return assert_max_queries
+
+
+@pytest.fixture
+def sheets_api():
+    """Sheets API stand-in (loadtest/sheets_server.py) with the Users
+    spreadsheet of 20 users, served on a free local port (`url`)
+    """
+    store = SheetsStore()
+    generate_users_spreadsheet(store, users=20)
+    app = create_sheets_api(store)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    app.url = f'http://127.0.0.1:{server.server_port}'
+    yield app
+    server.shutdown()
@@ -28,7 +28,9 @@ Copyright (c) 2021
 import pytest
 import time
 from flaskapp.views.ivrflow import get_term_cond, get_privacy, unsubscribe
-from flaskapp.models.ivr_models import User, PhoneNumber
+from flaskapp.models.ivr_models import (User, PhoneNumber, Reminder,
+                                       SmartReminder)
+from flaskapp.models.routing import storage_router, parse_route
 from flask import Response, url_for
 
 
@@ -90,3 +92,61 @@ def test_save_client_type(monkeypatch):
 
     #     with app.test_client() as api_client:
     #         ...
+
+
+@pytest.fixture
+def postgres_routes(monkeypatch):
+    # webhooks read users from postgres only (no shadow reads)
+    for entity in storage_router.routes:
+        monkeypatch.setitem(storage_router.routes, entity,
+                            parse_route('postgres'))
+    monkeypatch.setattr('flaskapp.core.ivr_core.send_mail',
+                        lambda *args, **kwargs: True)
+
+
+@pytest.mark.usefixtures("init_test_db", "postgres_routes")
+def test_get_next_reminder(client, query_budget):
+    user = User.create()
+    PhoneNumber.create(number='15550001001', user=user)
+    for text in ('first', 'second', 'third'):
+        SmartReminder.create(user=user, reminder=Reminder.create(text=text))
+
+    # one query for the reminder, two for its next repetition
+    with query_budget(3):
+        result = client.post(
+            url_for('MobileAPIBluprint.get_next_reminder'),
+            data={'phone': '+15550001001'}
+        )
+    assert result.status_code == 200
+    assert 'fact of the day...' in result.get_json()['text']
+
+    with query_budget(1):
+        result = client.post(
+            url_for('MobileAPIBluprint.get_next_reminder'),
+            data={'phone': '+15550001002'}
+        )
+    assert result.status_code == 200
+
+
+@pytest.mark.usefixtures("init_test_db", "postgres_routes")
+def test_voice_webhook_queries(client, query_budget):
+    PhoneNumber.create(number='15550002001', user=User.create())
+
+    # a known user is dialed to the operator
+    with query_budget(1):
+        result = client.post(url_for('IVRFlowBlueprint.voice'),
+                             data={'From': '+15550002001'})
+    assert '<Dial' in result.get_data(as_text=True)
+
+    # a new caller is stored as a phone number
+    # (get_or_create: a select, an insert in a savepoint)
+    with query_budget(6):
+        result = client.post(url_for('IVRFlowBlueprint.voice'),
+                             data={'From': '+15550002002'})
+    assert '<Gather' in result.get_data(as_text=True)
+
+    # and becomes a user on joining
+    with query_budget(4):
+        client.post(url_for('IVRFlowBlueprint.voice_joined'),
+                    data={'From': '+15550002002', 'SpeechResult': 'Yes'})
+    assert PhoneNumber.get(number='15550002002').user is not None
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 6:48:20 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import os
+import random
+import datetime
+import itertools
+import pytest
+import pandas as pd
+from flask import url_for
+from peewee import chunked
+from twilio.twiml.voice_response import VoiceResponse, Gather
+from flaskapp import create_app
+from flaskapp.core import ivr_core
+from flaskapp.core.reconcile import load_sheet, diff_users, summarize
+from flaskapp.core.sheets_mirror import load_rows
+from flaskapp.core.ivr_core import (is_user_new, save_data,
+                                    save_data_to_postgres, update_reminder)
+from flaskapp.dialogs import WELCOME_GREETING
+from flaskapp.models import storages, routing
+from flaskapp.models.bases import db_proxy
+from flaskapp.models.utils import init_db
+from flaskapp.models.ivr_models import (User, PhoneNumber, Reminder,
+                                        SmartReminder)
+from flaskapp.tools.phones import normalize_phones
+from flaskapp.tools.utils import (cleanup_phone_number, matchFromDf,
+                                  TimeZoneHelper)
+from taskscheduler.planner import load_users, plan_calls
+
+
+pytest.importorskip('pytest_benchmark')
+
+
+# Dataset sizes (the number of users); BENCHMARK_SIZES=1000 for a quick run
+SIZES = [int(size) for size in
+         os.environ.get('BENCHMARK_SIZES', '1000,10000,100000').split(',')]
+
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), '..', 'tools')
+
+SHEET_HEADER = ['Phone Number', 'username', 'type', 'dob', 'gender',
+                'weight', 'height', 'activity', 'hobby', 'time zone',
+                'call time', 'emergency phone', 'emergency name',
+                'friend', 'operator']
+
+TIME_ZONES = ['US/Pacific', 'US/Mountain', 'US/Central', 'US/Eastern']
+
+
+class FakeSpreadSheet:
+    """In-memory stand-in of `GoogleSpreadSheet` proxy"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_all_value(self):
+        return self.rows
+
+    def get_all_records(self):
+        return [dict(zip(self.rows[0], row)) for row in self.rows[1:]]
+
+    def update_cell(self, rown, coln, value):
+        self.rows[rown - 1][coln - 1] = value
+
+    def append_row_to_sheet(self, row):
+        self.rows.append(row)
+
+
+def phone(it):
+    return str(12000000000 + it)
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: f'{size}')
+def dataset(request):
+    """`size` users in the (stand-in) database and spreadsheet"""
+
+    size = request.param
+    # sqlite stands in for postgres
+    database = storages.create_database(
+        'sqlite', f'file:benchmarks{size}?mode=memory&cache=shared'
+    )
+    db_proxy.initialize(database)
+    init_db()
+
+    with database.atomic():
+        for batch in chunked(range(size), 5000):
+            User.insert_many(
+                [{'username': f'user{it}', 'type': 'C'} for it in batch]
+            ).execute()
+            PhoneNumber.insert_many(
+                [{'number': phone(it), 'user': it + 1} for it in batch]
+            ).execute()
+
+    rnd = random.Random(size)
+    rows = [SHEET_HEADER] + [
+        [phone(it), f'user{it}', 'C'] + [''] * 6 +
+        [rnd.choice(TIME_ZONES)] + [''] * 3 + [phone(it + 1), '19258609793']
+        for it in range(size)
+    ]
+
+    now = datetime.datetime.utcnow()
+    starts = [now + datetime.timedelta(hours=rnd.randint(-12, 12))
+              for _ in range(size)]
+    friends = pd.DataFrame({
+        'Number': [int(phone(it)) for it in range(size)],
+        'time zone': [row[9] for row in rows[1:]],
+        'UTC start': [f'{start:%Y-%m-%d %H:%M:%S}' for start in starts],
+        'UTC end': [f'{start + datetime.timedelta(hours=3):%Y-%m-%d %H:%M:%S}'
+                    for start in starts]
+    })
+
+    yield {'size': size, 'rows': rows, 'friends': friends}
+
+    database.close()
+    database.keeper.close()
+    db_proxy.initialize(storages.database)
+
+
+@pytest.fixture
+def spreadsheet(dataset, monkeypatch):
+    sheet = FakeSpreadSheet([list(row) for row in dataset['rows']])
+    monkeypatch.setattr(ivr_core, 'gs_users_existing', sheet)
+    monkeypatch.setattr(routing, 'gs_users_existing', sheet)
+    return sheet
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app()
+
+
+def last_phone(dataset):
+    # the worst case for linear scans
+    return phone(dataset['size'] - 1)
+
+
+@pytest.mark.benchmark(group='cleanup_phone_number')
+def test_cleanup_phone_number(benchmark, dataset):
+    phones = [f'+1 200-000-{it:04d}' for it in range(dataset['size'])]
+    benchmark(lambda: [cleanup_phone_number(number) for number in phones])
+
+
+@pytest.mark.benchmark(group='cleanup_phone_number')
+def test_normalize_phones(benchmark, dataset):
+    phones = pd.Series([f'+1 200-000-{it:04d}'
+                        for it in range(dataset['size'])])
+    assert benchmark(normalize_phones, phones, errors='raise')[0] == \
+        '12000000000'
+
+
+@pytest.mark.benchmark(group='is_user_new')
+def test_is_user_new(benchmark, dataset, spreadsheet):
+    assert benchmark(is_user_new, '+' + last_phone(dataset)) is False
+
+
+@pytest.mark.benchmark(group='save_data')
+def test_save_data(benchmark, dataset, spreadsheet, monkeypatch):
+    # the legacy path: the sheet is written by webhooks as well
+    monkeypatch.setattr(ivr_core, 'GOOGLE_SHEETS_DUAL_WRITE', True)
+    dates = (datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=it)
+             for it in itertools.count())
+    benchmark(lambda: save_data('weight', '70', last_phone(dataset),
+                                date=next(dates)))
+    assert spreadsheet.rows[-1][5] == '70'
+
+
+@pytest.mark.benchmark(group='save_data_to_postgres')
+def test_save_data_to_postgres(benchmark, dataset):
+    dates = (datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=it)
+             for it in itertools.count())
+    benchmark(lambda: save_data_to_postgres('sbp', 120, last_phone(dataset),
+                                            date=next(dates)))
+
+
+@pytest.mark.benchmark(group='update_reminder')
+def test_update_reminder(benchmark, dataset):
+    reminder = Reminder.create(text='Take your pills')
+
+    def new_smart_reminder():
+        smart_reminder = SmartReminder.create(user=dataset['size'],
+                                              reminder=reminder)
+        return (smart_reminder.id,), {}
+
+    benchmark.pedantic(update_reminder, setup=new_smart_reminder,
+                       rounds=200)
+
+
+@pytest.mark.benchmark(group='matchFromDf')
+def test_match_from_df(benchmark, dataset, monkeypatch):
+    monkeypatch.chdir(TOOLS_DIR)
+    tz_from = TimeZoneHelper('16505550100')  # California, US/Pacific
+    friends = dataset['friends'].copy()
+    now = datetime.datetime.utcnow()
+    friends.loc[0, ['time zone', 'UTC start', 'UTC end']] = [
+        tz_from.user_zone,
+        f'{now - datetime.timedelta(hours=1):%Y-%m-%d %H:%M:%S}',
+        f'{now + datetime.timedelta(days=1):%Y-%m-%d %H:%M:%S}'
+    ]
+    assert benchmark(matchFromDf, friends, tz_from) == int(phone(0))
+
+
+@pytest.mark.benchmark(group='TimeZoneHelper')
+def test_time_zone_helper(benchmark, monkeypatch):
+    monkeypatch.chdir(TOOLS_DIR)
+    helper = benchmark(TimeZoneHelper, '16505550100')
+    assert helper.user_zone == 'US/Pacific'
+
+
+@pytest.mark.benchmark(group='plan_calls')
+def test_plan_calls(benchmark, dataset):
+    plan = benchmark(lambda: plan_calls(load_users()))
+    assert len(plan) == dataset['size']
+
+
+@pytest.mark.benchmark(group='reconcile')
+def test_reconcile_users(benchmark, dataset):
+    class Values:
+        def values_get(self, range):
+            return {'values': dataset['rows']}
+
+    def reconcile():
+        sheet, duplicates = load_sheet(Values(), 'Existing')
+        return summarize(diff_users(sheet, load_rows(), duplicates))
+
+    report = benchmark(reconcile)
+    assert report['only_in_sheet'] == report['only_in_postgres'] == 0
+    # time zones are not in postgres (other benchmarks save some metrics)
+    assert report['mismatches_by_column']['time zone'] == dataset['size']
+
+
+@pytest.mark.benchmark(group='twiml')
+def test_twiml_rendering(benchmark):
+    def render():
+        voice_response = VoiceResponse()
+        gather = Gather(input='speech dtmf',
+                        action='/voice_joined', timeout=3, num_digits=1)
+        gather.say(WELCOME_GREETING)
+        voice_response.append(gather)
+        return str(voice_response)
+
+    assert '<Gather' in benchmark(render)
+
+
+@pytest.mark.benchmark(group='route /voice')
+def test_voice_route(benchmark, app, dataset, spreadsheet):
+    client = app.test_client()
+    with app.test_request_context():
+        url = url_for('IVRFlowBlueprint.voice')
+    response = benchmark(client.post, url,
+                         data={'From': '+' + last_phone(dataset)})
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group='route /after_call')
+def test_after_call_route(benchmark, app, dataset, spreadsheet):
+    client = app.test_client()
+    with app.test_request_context():
+        url = url_for('IVRFlowBlueprint.after_call')
+    response = benchmark(client.post, url, data={
+        'phone': '+' + last_phone(dataset), 'UP': '120', 'DOWN': '80'
+    })
+    assert response.status_code == 200
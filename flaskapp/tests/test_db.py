@@ -31,8 +31,10 @@ from flaskapp.models.ivr_models import (HealthMetric, User,
                                         SmartReminder,
                                         Call,
                                         PhoneNumber)
-from flaskapp.models.utils import create_tables, init_db, drop_all_tables
-from flaskapp.models.storages import postgres_db
+from flaskapp.models.utils import (create_tables, init_db, drop_all_tables,
+                                   restore_schema, ALL_TABLES)
+from flaskapp.models.storages import postgres_db, create_database
+from flaskapp.models.bases import db_proxy
 
 
 def test_create_and_drop_tables():
@@ -48,3 +50,31 @@ def test_create_and_drop_tables():
     assert 'phone_numbers' in tables_created
     assert 'health_metrics' in tables_created
     assert 'smart_reminders' in tables_created
+
+
+@pytest.fixture
+def sqlite_db():
+    database = create_database('sqlite',
+                               'file:test_db?mode=memory&cache=shared')
+    db_proxy.initialize(database)
+    yield database
+    database.close()
+    database.keeper.close()
+    db_proxy.initialize(postgres_db)
+
+
+def test_sqlite_backend(sqlite_db, tmpdir):
+    template = str(tmpdir.join('schema.sqlite'))
+    restore_schema(ALL_TABLES, template=template)
+    assert len(tmpdir.listdir()) == 1  # template is created once
+    assert 'health_metrics' in sqlite_db.get_tables()
+
+    user = User.create()
+    HealthMetric.create(user=user, data={'sbp': 120, 'notes': ['ok']})
+    sqlite_db.close()  # shared-memory database survives closing
+    assert HealthMetric.get().data == {'sbp': 120, 'notes': ['ok']}
+
+    restore_schema(ALL_TABLES, template=template)
+    assert len(tmpdir.listdir()) == 1
+    assert User.select().count() == 0
+
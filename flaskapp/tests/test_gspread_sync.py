@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 6:40:05 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+import gc
+import struct
+import types
+import tracemalloc
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from gspread_to_postgres.src.copy_loader import (CopyStream, encode_csv,
+                                                 BINARY_HEADER,
+                                                 BINARY_TRAILER)
+from gspread_to_postgres.src.streaming import iter_chunks
+from gspread_to_postgres.src.swap import load_and_swap
+from loadtest.sheets_server import (SheetsStore, generate_users_spreadsheet,
+                                    USERS_SPREADSHEET_ID)
+from gspread_to_postgres.src.incremental import (sync_dataframe,
+                                                 sync_worksheet, SyncReport,
+                                                 ROW_KEY, metadata)
+from gspread_to_postgres.src.schema import Schema, infer_type, convert
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return sa.create_engine(f'sqlite:///{tmp_path}/sheets.sqlite')
+
+
+@pytest.fixture
+def sync_state(engine):
+    metadata.create_all(engine)  # as execute() does before any worksheet
+
+
+def users(count=100):
+    return pd.DataFrame({'phone': [f'1200000{it:04d}' for it in range(count)],
+                         'username': [f'user{it}' for it in range(count)],
+                         'weight': list(range(count))})
+
+
+def read_table(engine, name):
+    with engine.connect() as conn:
+        return pd.read_sql_query(sa.text(f'SELECT * FROM "{name}"'), conn)
+
+
+def test_incremental_sync(engine, sync_state):
+    df = users()
+
+    def schema():  # as execute() loads it with settings of the worksheet
+        return Schema.load(engine, 'Existing', {'phone': 'text'}, ['phone'])
+
+    first = sync_dataframe(engine, 'Existing', df, schema=schema())
+    assert first.rebuilt and first.written == 100
+
+    again = sync_dataframe(engine, 'Existing', df, schema=schema())
+    assert again.skipped and again.scanned == 100 and again.written == 0
+
+    changed = df.copy()
+    changed.loc[3, 'username'] = 'alice'
+    changed = changed.drop(index=[5, 6])
+    changed.loc[100] = ['12000009999', 'bob', 70]
+    report = sync_dataframe(engine, 'Existing', changed, schema=schema())
+    assert (report.inserted, report.updated, report.deleted) == (1, 1, 2)
+    assert report.written == 4 and report.scanned == 99
+    assert not report.rebuilt
+
+    table = read_table(engine, 'Existing')
+    assert len(table) == 99
+    assert table.set_index('phone').loc['12000000003', 'username'] == 'alice'
+    assert '12000000005' not in set(table['phone'])
+
+    total = SyncReport.total([first, again, report])
+    assert total.written == 104 and total.skipped == 1
+
+
+def test_rows_without_key(engine, sync_state):
+    df = pd.DataFrame({'a': [1, 1, 2], 'b': ['x', 'x', 'y']})
+    sync_dataframe(engine, 'Calls', df)
+    report = sync_dataframe(engine, 'Calls', df.iloc[[0, 2]])
+    assert (report.inserted, report.updated, report.deleted) == (0, 0, 1)
+    assert read_table(engine, 'Calls')['a'].tolist() == [1, 2]
+
+
+def test_header_change_rebuilds_table(engine, sync_state):
+    sync_dataframe(engine, 'Existing', users(10), ['phone'])
+    report = sync_dataframe(engine, 'Existing',
+                            users(10).assign(height=180), ['phone'])
+    assert report.rebuilt and report.written == 10
+    table = read_table(engine, 'Existing')
+    assert (table['height'] == 180).all()
+    assert table[ROW_KEY].is_unique
+
+
+def test_column_types_are_inferred():
+    columns = {
+        'int': ['1', '', '-20'], 'float': ['1', '2.5', ''],
+        'bool': ['TRUE', 'false', ''], 'date': ['2021-10-08', '', '2021-1-2'],
+        'timestamp': ['2021-10-08 10:35:34', '2021-10-09', ''],
+        'phone': ['+15550001', '15550002', ''], 'text': ['1', 'x', ''],
+        'blank': ['', '', ''],
+    }
+    inferred = {name: infer_type(pd.Series(values, name=name))
+                for name, values in columns.items()}
+    assert inferred == {'int': 'int', 'float': 'float', 'bool': 'bool',
+                        'date': 'date', 'timestamp': 'timestamp',
+                        'phone': 'text', 'text': 'text', 'blank': 'text'}
+    assert convert(pd.Series(['1', '']), 'int').tolist() == [1, pd.NA]
+    assert convert(pd.Series(['1', 'x']), 'int') is None
+    assert convert(pd.Series(['1', 'x']), 'int', coerce=True).isna() \
+        .tolist() == [False, True]
+
+
+def test_schema_is_persisted_and_widened(engine, sync_state):
+    df = pd.DataFrame({'id': ['1', '2'], 'joined': ['2021-10-08', ''],
+                       'score': ['1', '2']})
+    sync_dataframe(engine, 'Scores', df,
+                   schema=Schema.load(engine, 'Scores', {'score': 'float'},
+                                      ['id']))
+    schema = Schema.load(engine, 'Scores')
+    assert schema.columns == {'id': 'int', 'joined': 'date', 'score': 'float'}
+    assert schema.primary_key == ['id']
+    columns = {column['name']: column
+               for column in sa.inspect(engine).get_columns('Scores')}
+    assert isinstance(columns['joined']['type'], sa.Date)
+    assert columns['id']['primary_key']
+
+    # a persisted type is kept, a misfit widens the column to text
+    report = sync_dataframe(engine, 'Scores', df.assign(id=['1', 'a']),
+                            schema=Schema.load(engine, 'Scores'))
+    assert report.rebuilt
+    assert Schema.load(engine, 'Scores').columns['id'] == 'text'
+    assert read_table(engine, 'Scores')['id'].tolist() == ['1', 'a']
+
+    # values which don't fit a pinned type are NULL
+    sync_dataframe(engine, 'Scores', df.assign(score=['1', 'n/a']),
+                   schema=Schema.load(engine, 'Scores', {'score': 'float'}))
+    assert read_table(engine, 'Scores')['score'].isna().tolist() == \
+        [False, True]
+
+
+def decode_binary(data):
+    """ Fields of COPY binary rows (bytes or None) """
+    rows, pos = [], 0
+    while pos < len(data):
+        count, = struct.unpack_from('>h', data, pos)
+        pos += 2
+        row = []
+        for _ in range(count):
+            length, = struct.unpack_from('>i', data, pos)
+            pos += 4
+            row.append(None if length < 0 else data[pos:pos + length])
+            pos += max(length, 0)
+        rows.append(row)
+    return rows
+
+
+def test_copy_binary_stream():
+    df = pd.DataFrame({'id': [1, 2, None], 'name': ['x', None, 'héllo'],
+                       'active': [True, False, None],
+                       'at': pd.to_datetime(['2000-01-01 00:00:01', None,
+                                             '1999-12-31'])})
+    types = {'id': sa.BigInteger(), 'name': sa.Text(),
+             'active': sa.Boolean(), 'at': sa.DateTime()}
+    stream = CopyStream(df, types, chunk_rows=2)
+    data = b''.join(iter(lambda: stream.read(5), b''))
+    assert data.startswith(BINARY_HEADER) and data.endswith(BINARY_TRAILER)
+
+    rows = decode_binary(data[len(BINARY_HEADER):-len(BINARY_TRAILER)])
+    assert rows[0] == [struct.pack('>q', 1), b'x', b'\x01',
+                       struct.pack('>q', 1000000)]
+    assert rows[1] == [struct.pack('>q', 2), None, b'\x00', None]
+    assert rows[2] == [None, 'héllo'.encode(), None,
+                       struct.pack('>q', -86400 * 1000000)]
+
+
+def test_copy_csv_nulls():
+    df = pd.DataFrame({'a': ['', None, 'x,y'], 'b': [1.5, None, 2.0]})
+    assert encode_csv(df) == b',1.5\n\\N,\\N\n"x,y",2.0\n'
+
+
+def test_swap_keeps_snapshots_and_rolls_back(engine):
+    from gspread_to_postgres.src.swap import (load_and_swap, rollback,
+                                              snapshots, collector)
+    from gspread_to_postgres.src.copy_loader import table_for
+
+    for count in (10, 20, 30):
+        df = users(count)
+        load_and_swap(engine, table_for('Existing', df), df,
+                      indexes=[(['phone'], True)], snapshots_to_keep=1)
+        collector.join()
+        assert len(read_table(engine, 'Existing')) == count
+
+    with engine.connect() as conn:
+        kept = snapshots(conn, 'Existing')
+        names = sa.inspect(conn).get_table_names()
+        indexes = sa.inspect(conn).get_indexes('Existing')
+    assert len(kept) == 1 and set(names) == {'Existing', kept[0]}
+    assert indexes[0]['column_names'] == ['phone'] and indexes[0]['unique']
+
+    assert rollback(engine, 'Existing') == kept[0]
+    collector.join()
+    assert len(read_table(engine, 'Existing')) == 20
+    with engine.connect() as conn:
+        assert sa.inspect(conn).get_table_names() == ['Existing']
+
+
+def test_incremental_rebuild_resyncs_after_rollback(engine, sync_state):
+    from gspread_to_postgres.src.swap import rollback, collector
+    sync_dataframe(engine, 'Existing', users(10), ['phone'])
+    sync_dataframe(engine, 'Existing', users(10).assign(height=1), ['phone'])
+    rollback(engine, 'Existing')
+    collector.join()
+    report = sync_dataframe(engine, 'Existing', users(10), ['phone'])
+    assert not report.skipped and report.changed == 0
+
+
+class StoreSpreadsheet:
+    """ gspread Spreadsheet reading values from SheetsStore directly """
+
+    def __init__(self, store, spreadsheet_id=USERS_SPREADSHEET_ID):
+        self.store = store
+        self.id = spreadsheet_id
+
+    def worksheet(self, title):
+        rows = self.store.spreadsheets[self.id]['sheets'][title]
+        return types.SimpleNamespace(row_count=len(rows))
+
+    def values_get(self, range_name):
+        return {'values': self.store.read(self.id, range_name)[1]}
+
+
+def test_streaming_pages_are_typed(engine):
+    store = SheetsStore()
+    store.add_spreadsheet('sheet', 'Sheet', {'Data': [
+        ['phone', 'count', 'score', 'code', 'name'],
+        ['+15550001', '1', '1.5', '1', 'a'],
+        ['15550002', '', '2', '2', ''],
+        ['', '', '', '', ''],
+        ['015550003', '3', '', 'x', 'c'],
+    ]})
+    chunks = list(iter_chunks(StoreSpreadsheet(store, 'sheet'), 'Data',
+                              page_rows=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]  # blank row skipped
+    assert chunks[0]['count'].dtype == 'Int64'
+    assert chunks[0]['score'].dtype == 'float64'
+    assert chunks[0]['phone'].tolist() == ['+15550001', '15550002']
+    assert chunks[1]['code'].tolist() == ['x']  # widened to text
+
+    load_and_swap(engine, 'Data', iter(chunks))
+    table = read_table(engine, 'Data')
+    assert table['count'].isna().tolist() == [False, True, False]
+    # sqlite keeps the declared type, postgres column is altered to text
+    assert table['code'].astype(str).tolist() == ['1', '2', 'x']
+    assert table['phone'].tolist()[2] == '015550003'
+
+
+def peak_memory(function):
+    gc.collect()  # garbage of previous tests doesn't count
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_memory_is_bounded(engine):
+    peaks = {}
+    for users_count in (1000, 8000):
+        store = SheetsStore()
+        generate_users_spreadsheet(store, users=users_count)
+        spreadsheet = StoreSpreadsheet(store)
+        peaks[users_count] = peak_memory(lambda: load_and_swap(
+            engine, 'Existing', iter_chunks(spreadsheet, 'Existing',
+                                            page_rows=250)))
+    assert len(read_table(engine, 'Existing')) == 8000
+
+    def read_all():
+        _, values = store.read(USERS_SPREADSHEET_ID, 'Existing')
+        records = [dict(zip(values[0], row)) for row in values[1:]]
+        load_and_swap(engine, 'Existing', pd.DataFrame(records))
+
+    full = peak_memory(read_all)
+    # the peak depends on the page size, not on the worksheet size
+    assert peaks[8000] < 1.5 * peaks[1000]
+    assert peaks[8000] < full / 3
+
+
+def paged_sheet(store, reads):
+    """ GoogleSheetHelper reading pages from SheetsStore directly """
+    def iter_dataframes(worksheet, page_rows, schema=None):
+        reads.append(worksheet)
+        return iter_chunks(StoreSpreadsheet(store, 'sheet'), worksheet,
+                           page_rows, schema=schema)
+    return types.SimpleNamespace(iterDataframes=iter_dataframes)
+
+
+def test_incremental_sync_by_pages(engine, sync_state):
+    rows = [['phone', 'name', 'score']] + \
+        [[f'+1555000{it}', f'user{it}', str(it)] for it in range(5)]
+    store = SheetsStore()
+    store.add_spreadsheet('sheet', 'Sheet', {'Data': rows})
+    rows = store.spreadsheets['sheet']['sheets']['Data']  # edited below
+    reads = []
+    sheet = paged_sheet(store, reads)
+
+    first = sync_worksheet(engine, sheet, 'Data', ['phone'], page_rows=2)
+    assert first.rebuilt and first.written == 5
+    again = sync_worksheet(engine, sheet, 'Data', ['phone'], page_rows=2)
+    assert again.skipped and again.scanned == 5
+
+    rows[1][1] = 'alice'   # page 1
+    del rows[4]            # page 2
+    rows.append(['+15550009', 'bob', '9'])  # page 3, the same row twice
+    rows.append(['+15550009', 'bob', '9'])
+    report = sync_worksheet(engine, sheet, 'Data', ['phone'], page_rows=2)
+    assert (report.inserted, report.updated, report.deleted) == (1, 1, 1)
+    assert report.scanned == 5 and not report.rebuilt
+    table = read_table(engine, 'Data').set_index('phone')
+    assert table['name'].to_dict() == {
+        '+15550000': 'alice', '+15550001': 'user1', '+15550002': 'user2',
+        '+15550004': 'user4', '+15550009': 'bob'}
+
+    # the last page doesn't fit the types: changes of previous pages
+    # are rolled back, the worksheet is read again and rebuilt
+    reads.clear()
+    rows[1][1], rows[-1][2] = 'carol', 'n/a'
+    report = sync_worksheet(engine, sheet, 'Data', page_rows=2)
+    assert report.rebuilt and reads == ['Data', 'Data']
+    table = read_table(engine, 'Data')
+    assert table['name'].tolist()[0] == 'carol'
+    assert table['score'].astype(str).tolist()[-1] == 'n/a'
+
+
+def test_whole_row_keys_across_pages(engine, sync_state):
+    rows = [['a', 'b']] + [['1', 'x']] * 3 + [['2', 'y']]
+    store = SheetsStore()
+    store.add_spreadsheet('sheet', 'Sheet', {'Calls': rows})
+    rows = store.spreadsheets['sheet']['sheets']['Calls']  # edited below
+    sheet = paged_sheet(store, [])
+
+    sync_worksheet(engine, sheet, 'Calls', page_rows=2)
+    assert read_table(engine, 'Calls')[ROW_KEY].is_unique
+    del rows[2]
+    report = sync_worksheet(engine, sheet, 'Calls', page_rows=2)
+    assert (report.inserted, report.updated, report.deleted) == (0, 0, 1)
+    assert read_table(engine, 'Calls')['a'].tolist() == [1, 1, 2]
+
+
+class FakeClock:
+    """ Clock and `stopped` event of TokenBucket: waits move time """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, delay):
+        self.now += delay
+        return False
+
+
+def test_token_bucket():
+    from gspread_to_postgres.src.executor import TokenBucket
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, stopped=clock)
+    assert [bucket.acquire() for _ in range(4)] == [0.0, 0.0, 0.5, 0.5]
+    assert clock.now == 1.0
+    clock.now += 10  # no more than capacity is saved up
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_requests_are_retried(sheets_api):
+    import gspread
+    import requests
+    from gspread_to_postgres.src.executor import (RetryingRequests,
+                                                  TokenBucket)
+
+    def failing(statuses):
+        def request():
+            status = statuses.pop(0)
+            if status == 200:
+                return 'ok'
+            response = requests.Response()
+            response.status_code, response._content = status, b'{}'
+            raise gspread.exceptions.APIError(response)
+        return request
+
+    bucket = TokenBucket(rate=1000.0)
+    retrying = RetryingRequests(failing([429, 503, 200]), bucket,
+                                backoff=0.001)
+    assert retrying() == 'ok'
+    assert (retrying.stats.calls, retrying.stats.retries) == (3, 2)
+
+    retrying = RetryingRequests(failing([404]), bucket, backoff=0.001)
+    with pytest.raises(gspread.exceptions.APIError):
+        retrying()
+    retrying = RetryingRequests(failing([500, 500]), bucket, retries=1,
+                                backoff=0.001)
+    with pytest.raises(gspread.exceptions.APIError):
+        retrying()
+
+
+def test_executor_with_quota(sheets_api):
+    from gspread_to_postgres.src.google_sheets_to_postgres import (
+        GoogleSheetHelper)
+    from gspread_to_postgres.src.executor import SheetExecutor, SyncError
+
+    # the stand-in rejects more than 4 requests per 0.2s (20/s) with 429;
+    # 10 requests/s of the bucket are below it, but its first burst isn't
+    sheets_api.faults.configure(quota=4, quota_window=0.2)
+
+    def job(helper, worksheet):
+        if worksheet == 'Missing':
+            raise LookupError(worksheet)
+        return sum(len(chunk)
+                   for chunk in helper.iterDataframes(worksheet, 5))
+
+    executor = SheetExecutor(
+        lambda wrapper: GoogleSheetHelper('', 'Users', sheets_api.url,
+                                          wrapper),
+        job, max_workers=2, requests_per_minute=600, backoff=0.05)
+    with pytest.raises(SyncError) as e:
+        executor.run(['Existing', 'Calls', 'Missing'])
+    assert list(e.value.errors) == ['Missing']
+
+    report = executor.run(['Existing', 'Calls'])
+    assert report['Existing']['status'] == 'done'
+    assert report['Existing']['result'] == 20
+    assert all(item['requests'] > 0 for item in report.values())
+    assert all(item['seconds'] > 0 for item in report.values())
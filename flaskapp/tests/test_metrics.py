@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 11:02:18 am
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import os
+import time
+import pytest
+from flask import url_for
+from flaskapp.tools.metrics import (MetricsRegistry, VIEW_METRIC,
+                                    DEPENDENCY_METRIC, TASK_QUEUE_METRIC)
+
+
+def test_histogram_buckets(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path), bounds=(0.1, 1.0),
+                               enabled=True)
+    registry.observe(VIEW_METRIC, 0.05, view='voice')
+    registry.observe(VIEW_METRIC, 0.5, view='voice')
+    registry.observe(VIEW_METRIC, 5, view='voice')
+
+    counts, total, count = registry.snapshot()[
+        (VIEW_METRIC, (('view', 'voice'),))
+    ]
+    assert counts == [1, 1, 1]
+    assert total == pytest.approx(5.55)
+    assert count == 3
+
+
+def test_disabled_metrics(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path), enabled=False)
+    registry.observe(VIEW_METRIC, 0.5, view='voice')
+    assert registry.snapshot() == {}
+    assert list(tmp_path.iterdir()) == []
+    # the supervisor and storage routing depend on these
+    registry.observe(TASK_QUEUE_METRIC, 0.5, queue='celery')
+    assert list(registry.snapshot()) == \
+        [(TASK_QUEUE_METRIC, (('queue', 'celery'),))]
+
+
+def test_metrics_are_shared_between_processes(tmp_path):
+    # two registries with different names emulate two worker processes
+    worker1 = MetricsRegistry(directory=str(tmp_path), name='worker1',
+                              enabled=True)
+    worker2 = MetricsRegistry(directory=str(tmp_path), name='worker2',
+                              enabled=True)
+
+    worker1.observe(DEPENDENCY_METRIC, 0.2, dependency='gspread')
+    worker1.flush()
+    worker2.observe(DEPENDENCY_METRIC, 0.3, dependency='gspread')
+
+    _, total, count = worker2.collect()[
+        (DEPENDENCY_METRIC, (('dependency', 'gspread'),))
+    ]
+    assert count == 2
+    assert total == pytest.approx(0.5)
+
+
+def test_metrics_are_dumped_in_background(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path), flush_interval=0.05,
+                               enabled=True)
+    assert os.path.basename(registry.filename).startswith(f'{os.getpid()}-')
+    registry.observe(VIEW_METRIC, 0.5, view='voice')
+    # the request thread doesn't write the file
+    assert not os.path.exists(registry.filename)
+    for _ in range(100):
+        if os.path.exists(registry.filename):
+            break
+        time.sleep(0.05)
+    assert os.path.exists(registry.filename)
+    registry.remove()
+    assert not os.path.exists(registry.filename)
+
+
+def test_files_of_dead_processes_expire(tmp_path):
+    dead = MetricsRegistry(directory=str(tmp_path), name='dead',
+                           enabled=True)
+    dead.observe(DEPENDENCY_METRIC, 0.2, dependency='gspread')
+    dead.flush()
+    stale = time.time() - 120
+    os.utime(dead.filename, (stale, stale))
+
+    alive = MetricsRegistry(directory=str(tmp_path), name='alive',
+                            expire_after=60, enabled=True)
+    assert alive.collect() == {}
+    assert not os.path.exists(dead.filename)
+
+
+def test_render_prometheus_format(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path), bounds=(0.1, 1.0),
+                               enabled=True)
+    registry.observe(VIEW_METRIC, 0.5, view='voice')
+
+    text = registry.render()
+    assert f'# TYPE {VIEW_METRIC} histogram' in text
+    assert f'{VIEW_METRIC}_bucket{{view="voice",le="0.1"}} 0' in text
+    assert f'{VIEW_METRIC}_bucket{{view="voice",le="1.0"}} 1' in text
+    assert f'{VIEW_METRIC}_bucket{{view="voice",le="+Inf"}} 1' in text
+    assert f'{VIEW_METRIC}_count{{view="voice"}} 1' in text
+
+
+def test_metrics_endpoint(client):
+    # the first request records latency of the endpoint itself
+    client.get(url_for('MonitoringBlueprint.get_metrics'))
+    result = client.get(url_for('MonitoringBlueprint.get_metrics'))
+    assert result.status_code == 200
+    assert result.content_type.startswith('text/plain')
+    assert 'view="MonitoringBlueprint.get_metrics"' in \
+        result.get_data(as_text=True)
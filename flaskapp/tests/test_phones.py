@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 11:24:40 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+
+import pandas as pd
+import pytest
+from flaskapp.tools.phones import (normalize_phone, e164, normalize_phones,
+                                   phones_equal, find_phone_row, mask_phone)
+
+
+def test_normalize_phone():
+    assert normalize_phone('+1 (650) 555-0100') == '16505550100'
+    assert normalize_phone(16505550100) == '16505550100'
+    assert e164('1.650.555.0100') == '+16505550100'
+    assert normalize_phone(16505550100.0) == '16505550100'
+    for number in ('+1fsdr2135323423', '', None, '1' * 16, 1.5,
+                   float('nan')):
+        with pytest.raises(ValueError):
+            normalize_phone(number)
+
+    normalize_phone.cache_clear()
+    for _ in range(3):
+        normalize_phone('+16505550100')
+    assert normalize_phone.cache_info().hits == 2
+
+
+def test_normalize_phones():
+    numbers = pd.Series(['+1 650-555-0100', 16505550101, 'n/a', None])
+    assert normalize_phones(numbers).tolist() == \
+        ['16505550100', '16505550101', '', '']
+    assert normalize_phones(numbers, errors='ignore')[2] == 'n/a'
+    with pytest.raises(ValueError, match='n/a'):
+        normalize_phones(numbers, errors='raise')
+
+    # a numeric column with blanks is float
+    floats = pd.Series([16505550100.0, None, 12000000001, 1.5])
+    assert normalize_phones(floats).tolist() == \
+        ['16505550100', '', '12000000001', '']
+    mixed = pd.Series(['+1 650-555-0100', 16505550101.0, float('nan')])
+    assert normalize_phones(mixed).tolist() == \
+        ['16505550100', '16505550101', '']
+
+    assert phones_equal(numbers, '+1 650 555 0101').tolist() == \
+        [False, True, False, False]
+    assert not phones_equal(numbers, 'n/a').any()
+
+
+def test_find_phone_row():
+    records = [{'Phone Number': '+1 650-555-0100', 'username': 'alice'},
+               {'Phone Number': 16505550101, 'username': 'bob'},
+               {'Phone Number': '16505550100', 'username': 'carol'}]
+    assert find_phone_row(records, '16505550100')['username'] == 'carol'
+    assert find_phone_row(records, '+1 650 555 0101')['username'] == 'bob'
+    assert find_phone_row(records, '16505550102') is None
+    assert find_phone_row([], '16505550100') is None
+
+
+def test_mask_phone():
+    assert mask_phone('16505550100') == '*******0100'
+    assert mask_phone(16505550100.0) == '*******0100'
+    assert mask_phone('1201') == '**01'
+    assert mask_phone('') == ''
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 4:02:33 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import os
+import time
+from flaskapp.tools.profiler import (SamplingProfiler, ProfileStore,
+                                     should_profile)
+
+
+def busy_loop(seconds):
+    finish = time.perf_counter() + seconds
+    while time.perf_counter() < finish:
+        pass
+
+
+def test_sampling_profiler_collects_stacks():
+    profiler = SamplingProfiler(interval=0.001).start()
+    busy_loop(0.1)
+    samples = profiler.stop()
+
+    assert sum(samples.values()) > 0
+    assert any('busy_loop' in stack.split(';')[-1] for stack in samples)
+
+
+def test_profile_store_is_ring_buffer(tmp_path):
+    store = ProfileStore(directory=str(tmp_path), max_profiles=3)
+    for it in range(5):
+        filename = store.save({'main;voice': it + 1}, 'voice', f'CA{it}')
+
+    profiles = store.list()
+    assert len(profiles) == 3
+    assert profiles[-1] == filename
+    assert os.path.basename(filename).endswith('_voice_CA4.collapsed')
+    with open(filename) as fd:
+        assert fd.read() == 'main;voice 5\n'
+
+    # nothing is written for empty profiles
+    assert store.save({}, 'voice') is None
+
+
+def test_should_profile():
+    headers = {'X-Profile': 'secret'}
+    assert should_profile(headers, sample_rate=0, admin_token='secret')
+    assert not should_profile(headers, sample_rate=0, admin_token='other')
+    assert not should_profile(headers, sample_rate=0, admin_token='')
+    assert should_profile(None, sample_rate=1, admin_token='')
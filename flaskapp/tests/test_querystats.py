@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 5:48:02 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import pytest
+from peewee import SqliteDatabase, Model, IntegerField
+from flaskapp.models.storages import InstrumentedDatabaseMixin
+from flaskapp.tools.querystats import track_queries, record_query
+
+
+class InstrumentedSqliteDatabase(InstrumentedDatabaseMixin, SqliteDatabase):
+    ...
+
+
+sqlite_db = InstrumentedSqliteDatabase(':memory:')
+
+
+class Item(Model):
+    value = IntegerField()
+
+    class Meta:
+        database = sqlite_db
+
+
+@pytest.fixture
+def items():
+    sqlite_db.create_tables([Item])
+    Item.insert_many([{'value': it} for it in range(10)]).execute()
+    yield
+    sqlite_db.drop_tables([Item])
+
+
+def test_track_queries_nested():
+    record_query('SELECT 1', 0.1)  # nothing to account to, ignored
+
+    with track_queries('outer', budget=0) as outer:
+        record_query('SELECT 1', 0.1)
+        with track_queries('inner', budget=0) as inner:
+            record_query('SELECT 2', 0.2)
+            record_query('SELECT 2', 0.2)
+
+    assert inner.count == 2
+    assert outer.count == 3
+    assert outer.duration == pytest.approx(0.5)
+    assert outer.duplicates() == {'SELECT 2': 2}
+
+
+def test_budget_and_duplicates_are_logged(caplog):
+    with track_queries('view', budget=2, duplicate_threshold=3):
+        for _ in range(3):
+            record_query('SELECT * FROM reminders WHERE id = %s', 0.01)
+
+    assert 'Query budget (2) exceeded by view' in caplog.text
+    assert 'Possible N+1 queries in view' in caplog.text
+
+
+@pytest.mark.usefixtures('items')
+def test_query_budget_fixture(query_budget):
+    # N+1: one query per item
+    with query_budget(11) as stats:
+        for item in Item.select():
+            Item.get(Item.id == item.id)
+    assert stats.count == 11
+    assert len(stats.duplicates()) == 1
+
+    with pytest.raises(AssertionError):
+        with query_budget(1):
+            list(Item.select())
+            list(Item.select())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 9:31:47 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+
+import datetime
+import pandas as pd
+import pytest
+from loadtest.sheets_client import standin_client
+from flaskapp.core.reconcile import diff_users, reconcile_users
+from flaskapp.models.ivr_models import User, PhoneNumber
+
+
+def test_diff_users():
+    sheet = pd.DataFrame(
+        {'username': ['alice', 'bob', 'carol'], 'hobby': ['', '', 'chess']},
+        index=pd.Index(['1', '2', '3'], name='Phone Number'))
+    postgres = pd.DataFrame(
+        {'username': ['alice', 'robert', 'dave'],
+         'call time': [datetime.time(8, 30), None, None]},
+        index=pd.Index(['1', '2', '4'], name='Phone Number'))
+
+    diff = diff_users(sheet, postgres, duplicates=['1'])
+    assert diff.values.tolist() == [
+        ['only_in_sheet', '3', '', '', ''],
+        ['only_in_postgres', '4', '', '', ''],
+        ['mismatch', '2', 'username', 'bob', 'robert'],
+        ['duplicate', '1', '', '', ''],
+    ]
+
+
+@pytest.mark.usefixtures('init_test_db')
+def test_reconcile_users(sheets_api, tmp_path):
+    client = standin_client(sheets_api.url)
+    worksheet = client.open('Users').worksheet('Existing')
+    records = worksheet.get_all_records()
+
+    for record in records[:3]:
+        user = User.create(username=record['username'], type=record['type'],
+                           gender=record['gender'] or None,
+                           timezone=record['time zone'] or None)
+        PhoneNumber.create(number=str(record['Phone Number']), user=user)
+    User.update(username='alice').where(User.username == 'user1').execute()
+    bob = User.create(username='bob')
+    PhoneNumber.create(number='+1 555-000-1234', user=bob)
+    # a number known without its user
+    PhoneNumber.create(number='12000000005')
+
+    report = reconcile_users(client, report_path=tmp_path / 'diff.csv')
+    assert report['only_in_sheet'] == 17
+    assert report['only_in_postgres'] == 1
+    assert report['mismatches_by_column'] == {'username': 1}
+    assert report['api_calls'] == 1
+    diff = pd.read_csv(tmp_path / 'diff.csv', dtype=str).fillna('')
+    assert diff[diff.kind == 'mismatch'].values.tolist() == \
+        [['mismatch', '12000000001', 'username', 'user1', 'alice']]
+
+    report = reconcile_users(client, repair='postgres')
+    assert report['repaired'] == {'created': 17, 'updated': 1}
+    assert User.get(User.id == 2).username == 'user1'
+    assert PhoneNumber.get(PhoneNumber.number == '12000000005') \
+        .user.username == 'user5'
+    assert User.select().count() == 21
+
+    report = reconcile_users(client, repair='sheets')
+    assert (report['only_in_sheet'], report['only_in_postgres'],
+            report['mismatched_cells']) == (0, 1, 0)
+    assert report['repaired'] == {'updated': 0, 'appended': 1}
+    assert worksheet.get_all_values()[-1][:2] == ['15550001234', 'bob']
+
+    report = reconcile_users(client)
+    assert (report['only_in_sheet'], report['only_in_postgres'],
+            report['mismatched_cells']) == (0, 0, 0)
+
+    with pytest.raises(ValueError):
+        reconcile_users(client, repair='both')
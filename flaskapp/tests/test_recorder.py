@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 6:05:51 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import threading
+from flask import Flask, Blueprint, request
+from werkzeug.serving import make_server
+from flaskapp.tools import recorder as recorder_module
+from flaskapp.tools.recorder import TrafficRecorder, sanitize, hash_phone
+from loadtest.replay import load_recordings, synthetic_phone, Replayer
+
+
+def test_sanitize_hashes_phones_and_drops_secrets():
+    values = sanitize({'From': '+1 (200) 000-0001', 'CallSid': 'CA123',
+                       'Digits': '1', 'note': '12000000001',
+                       'password': 'secret'}, salt='salt')
+    assert values['From'] == hash_phone('12000000001', salt='salt')
+    assert values['note'] == values['From']
+    assert values['From'].startswith('phone:')
+    assert (values['CallSid'], values['Digits']) == ('CA123', '1')
+    assert 'password' not in values
+    assert hash_phone('12000000001', salt='other') != values['From']
+
+
+def test_recording_requires_salt(tmpdir, monkeypatch):
+    monkeypatch.setattr(recorder_module, 'TRAFFIC_RECORDER_DIR', str(tmpdir))
+    monkeypatch.setattr(recorder_module, 'recorder',
+                        TrafficRecorder(str(tmpdir), salt=''))
+    blueprint = Blueprint('IVR', __name__)
+    recorder_module.init_blueprint(blueprint)
+    assert not blueprint.deferred_functions
+
+
+def test_record_and_replay(tmpdir, monkeypatch):
+    recorded = TrafficRecorder(str(tmpdir), salt='salt')
+    monkeypatch.setattr(recorder_module, 'TRAFFIC_RECORDER_DIR', str(tmpdir))
+    monkeypatch.setattr(recorder_module, 'recorder', recorded)
+
+    app = Flask(__name__)
+    blueprint = Blueprint('IVR', __name__)
+    seen = []
+
+    @blueprint.route('/voice', methods=['POST'])
+    def voice():
+        seen.append(request.form['From'])
+        return '<Response/>'
+
+    recorder_module.init_blueprint(blueprint)
+    app.register_blueprint(blueprint)
+
+    client = app.test_client()
+    for phone in ('+12000000001', '+12000000002', '+12000000001'):
+        client.post('/voice', data={'From': phone, 'CallSid': 'CA1'})
+    recorded.flush()
+
+    records = load_recordings([str(tmpdir.join('*.ndjson.gz'))])
+    assert [record['path'] for record in records] == ['/voice'] * 3
+    assert records[0]['status'] == 200
+    assert records[0]['form']['From'] == records[2]['form']['From']
+    assert '12000000001' not in str(records)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        seen.clear()
+        replayer = Replayer(f'http://127.0.0.1:{server.server_port}',
+                            speed=50)
+        summary = replayer.run(records).summary()
+    finally:
+        server.shutdown()
+
+    assert summary['/voice']['count'] == 3
+    assert summary['/voice']['errors'] == 0
+    assert sorted(seen) == sorted(
+        synthetic_phone(record['form']['From']) for record in records
+    )
+    assert len(set(seen)) == 2
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 8:31:07 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+import pytest
+from flaskapp.core.ivr_core import is_user_new
+from flaskapp.models.routing import (StorageRouter, parse_route,
+                                     storage_router)
+from flaskapp.models.ivr_models import User, PhoneNumber
+from flaskapp.tools.metrics import registry, SHADOW_READ_METRIC
+
+
+def test_parse_route():
+    assert parse_route('sheets') == ('sheets', 'postgres', 0)
+    assert parse_route('postgres') == ('postgres', 'sheets', 0)
+    assert parse_route('postgres + shadow(5%)') == ('postgres', 'sheets', 0.05)
+    for route in ('mongo', 'postgres+shadow(5)', 'postgres+shadow(150%)'):
+        with pytest.raises(ValueError):
+            parse_route(route)
+
+
+def shadow_results(entity):
+    return {dict(labels)['result']: count
+            for (metric, labels), (_, _, count) in registry.snapshot().items()
+            if metric == SHADOW_READ_METRIC and
+            dict(labels)['entity'] == entity}
+
+
+def test_shadow_reads(caplog):
+    sheet = {'1200': 'alice', '1201': 'bob'}
+    postgres = {'1200': 'alice', '1201': 'robert'}
+    router = StorageRouter(
+        {'username': 'postgres+shadow(100%)', 'client_type': 'sheets'},
+        {'username': {'sheets': sheet.get, 'postgres': postgres.get},
+         'client_type': {'sheets': {}.__getitem__, 'postgres': None}})
+
+    before = shadow_results('username')
+    assert router.read('username', '1200') == 'alice'
+    assert router.read('username', '1201') == 'robert'  # postgres wins
+    router.executor.shutdown(wait=True)
+    after = shadow_results('username')
+    assert {result: after[result] - before.get(result, 0)
+            for result in after} == {'match': 1, 'mismatch': 1}
+    # phone numbers aren't logged
+    assert '**01' in caplog.text and '1201' not in caplog.text
+
+    # no shadow reads, errors of the primary storage are raised
+    before = shadow_results('client_type')
+    with pytest.raises(KeyError):
+        router.read('client_type', '1200')
+    assert shadow_results('client_type') == before
+
+
+def test_shadow_reads_are_bounded():
+    router = StorageRouter({'username': 'postgres+shadow(100%)'},
+                           {'username': {'sheets': lambda phone: None,
+                                         'postgres': lambda phone: 'x'}},
+                           max_pending=0)
+    assert router.read('username', '1200') == 'x'
+    assert router.shadow_read('username', 'sheets', '1200', 'x') is None
+
+
+@pytest.mark.usefixtures("init_test_db")
+def test_is_user_new_reads_postgres(monkeypatch, query_budget):
+    monkeypatch.setitem(storage_router.routes, 'user_exists',
+                        parse_route('postgres'))
+    PhoneNumber.create(number='1555000123', user=User.create())
+    with query_budget(1):
+        assert not is_user_new('+1 555-000-123')
+    with query_budget(1):
+        assert is_user_new('+1555000124')
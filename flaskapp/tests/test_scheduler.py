@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 6:02:11 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import datetime
+import subprocess
+import numpy as np
+import pandas as pd
+import pytest
+from taskscheduler.tools import CeleryTask
+from taskscheduler.bench import make_app, queue_size, purge
+from taskscheduler.planner import (plan_calls, spread, summary, load_users,
+                                   schedule_calls, USER_COLUMNS)
+from taskscheduler.supervisor import Supervisor, BrokerProbe, worker_cmd
+from flaskapp.models.bases import db_proxy
+from flaskapp.models.storages import create_database, database
+from flaskapp.models.utils import init_db
+from flaskapp.models.ivr_models import User, PhoneNumber
+from flaskapp.models.beats import AdvisoryLock, Checkpoint, BeatCheckpoint
+from flaskapp.core import ivr_core
+
+
+@pytest.fixture
+def app():
+    app, beat, task = make_app()
+    purge(app)
+    yield app
+    purge(app)
+
+
+def test_plugged_tasklist_registry(app):
+    seen = []
+
+    @app.create_beat(name='registry-beat')
+    def registry_beat():
+        seen.append(app.get_plugged_tasklist())
+
+    @app.add_task(plug_to='registry-beat')
+    def proxy_registry_job(item):
+        pass
+
+    registry_beat()
+    assert list(seen[0]) == ['proxy_registry_job']
+    # available by name as well, but not outside of the beat
+    assert app.get_plugged_tasklist('registry-beat') is seen[0]
+    assert app.get_plugged_tasklist('unknown-beat') == {}
+    assert app.get_plugged_tasklist() is None
+
+
+def test_fan_out_chunks(app):
+    tasks = app.get_plugged_tasklist('bench-beat')
+    assert app.fan_out(tasks, range(1001), chunk_size=100) == 11
+    assert queue_size(app) == 11
+    assert app.fan_out(tasks, []) == 0
+
+
+def test_fan_out_queue(app):
+    @app.add_task(plug_to='queued-beat', queue='realtime')
+    def proxy_queued_job(item):
+        pass
+
+    tasks = app.get_plugged_tasklist('queued-beat')
+    assert app.fan_out(tasks, range(10), chunk_size=5) == 2
+    assert queue_size(app, 'realtime') == 2
+    app.fan_out(tasks, range(10), chunk_size=5, queue='bulk')
+    assert queue_size(app, 'bulk') == 2
+    assert queue_size(app) == 0
+    purge(app, 'realtime', 'bulk')
+
+
+def test_queue_routing():
+    from taskscheduler import celery_app
+    from taskscheduler.celeryconfig import QUEUES, DEFAULT_QUEUE
+    assert celery_app.tasks['gspread_to_postgres'].queue == 'bulk'
+    assert celery_app.tasks['schedule-tasks-from-DB'].queue == 'realtime'
+    for task in celery_app.get_plugged_tasklist(
+            'schedule-tasks-from-DB').values():
+        assert task.queue == 'bulk'  # profile_detail
+    assert celery_app.conf.task_default_queue == DEFAULT_QUEUE in QUEUES
+    # every scheduled beat exists and has something to do
+    for entry in celery_app.conf.beat_schedule.values():
+        assert entry['task'] in celery_app.tasks
+    assert celery_app.get_plugged_tasklist('schedule-tasks-from-DB')
+    options = {'concurrency': 4, 'prefetch_multiplier': 1, 'time_limit': 90}
+    assert worker_cmd('app', 'io', options) == [
+        'celery', '-A', 'app', 'worker', '--loglevel=info',
+        '-Q', 'io', '--prefetch-multiplier=1', '--time-limit=90'
+    ]
+
+
+def test_fan_out_calls_every_item():
+    app = CeleryTask('Fan-Out-Test', broker='memory://')
+    app.conf.task_always_eager = True
+    calls = []
+
+    @app.add_task(plug_to='eager-beat')
+    def proxy_eager_job(item):
+        calls.append(item)
+
+    app.fan_out(app.get_plugged_tasklist('eager-beat'), range(25),
+                chunk_size=10)
+    assert sorted(calls) == list(range(25))
+
+
+def users_frame(rows):
+    return pd.DataFrame(rows, columns=USER_COLUMNS)
+
+
+def slots(plan):
+    return {row.id: row.slot.strftime('%m-%d %H:%M')
+            for row in plan.itertuples()}
+
+
+def test_plan_calls_time_zones():
+    users = users_frame([
+        (1, '+1', 'a', 'US/Pacific', None, None),
+        (2, '+2', 'b', 'US/Eastern', datetime.time(8, 30),
+         datetime.time(9, 30)),
+        (3, '+3', 'c', 'not/a zone', None, None),    # default zone
+        (4, '+4', 'd', 'US/Eastern', datetime.time(9), datetime.time(11)),
+    ])
+    # 2026-03-08 is DST start in the US
+    plan = plan_calls(users, now=datetime.datetime(2026, 3, 8, 14, 0),
+                      window_start='10:00', window_end='12:00',
+                      default_timezone='US/Eastern', max_per_minute=10)
+    assert slots(plan) == {1: '03-08 17:00',   # 10:00 PDT
+                           2: '03-09 12:30',   # today's window is over
+                           3: '03-08 14:00',   # in the window: now
+                           4: '03-08 14:00'}
+    assert not plan['late'].any()
+    assert list(plan['slot']) == sorted(plan['slot'])
+
+
+def test_plan_calls_max_per_minute():
+    users = users_frame([(it, f'+{it}', 'u', 'UTC', None, None)
+                         for it in range(25)])
+    plan = plan_calls(users, now=datetime.datetime(2026, 1, 1, 9, 0),
+                      window_start='10:00', window_end='10:02',
+                      max_per_minute=10)
+    assert plan.groupby('slot').size().tolist() == [10, 10, 5]
+    assert summary(plan)['late'] == 5
+    assert summary(plan)['max_per_slot'] == 10
+
+
+def test_spread():
+    minutes = np.array([5, 0, 0, 0, 1, 5, 9])
+    assert spread(minutes, 2).tolist() == [5, 0, 0, 1, 1, 5, 9]
+
+
+@pytest.fixture
+def sqlite_db():
+    sqlite = create_database('sqlite',
+                             'file:test_scheduler?mode=memory&cache=shared')
+    db_proxy.initialize(sqlite)
+    init_db()
+    yield sqlite
+    sqlite.close()
+    sqlite.keeper.close()
+    db_proxy.initialize(database)
+
+
+def test_schedule_calls(sqlite_db, app):
+    for it in range(30):
+        user = User.create(username=f'user{it}', timezone='US/Central',
+                           status='B' if it % 10 == 0 else 'A')
+        PhoneNumber.create(number=f'+1555000{it:04d}', user=user)
+    # a user with two phone numbers is called once, at the first one
+    PhoneNumber.create(number='+15551110001', user=user)
+    assert load_users().set_index('id').loc[user.id, 'phone'] == \
+        '+15550000029'
+    tasks = app.get_plugged_tasklist('bench-beat')
+    info = schedule_calls(app, tasks, now=datetime.datetime(2026, 1, 1),
+                          chunk_size=100)
+    assert info['users'] == 27
+    assert info['messages'] == info['slots'] == queue_size(app)
+
+
+class FakeProcess:
+    pids = iter(range(1000, 2000))
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.pid = next(self.pids)
+        self.returncode = None
+        self.signals = []
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.signals.append('TERM')
+
+    def kill(self):
+        self.signals.append('KILL')
+        self.returncode = -9
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            raise subprocess.TimeoutExpired(self.cmd, timeout)
+        return self.returncode
+
+
+class FakeProbe:
+    def __init__(self):
+        self.depth_value, self.latency_value = 0, 0.0
+
+    def depth(self):
+        return self.depth_value
+
+    def latency(self):
+        return self.latency_value
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def supervisor():
+    clock, probe = Clock(), FakeProbe()
+    supervisor = Supervisor(probe, min_workers=1, max_workers=3,
+                            depth_per_worker=10, target_latency=2.0,
+                            idle_ticks=2, cooldown=10, backoff=1.0,
+                            max_backoff=4.0, drain_timeout=5,
+                            popen=FakeProcess, clock=clock)
+    supervisor.start()
+    return supervisor, probe, clock
+
+
+def test_supervisor_scaling(supervisor):
+    supervisor, probe, clock = supervisor
+    assert len(supervisor.workers) == 1
+    assert supervisor.beat.running
+
+    probe.depth_value = 50
+    supervisor.tick()
+    assert len(supervisor.workers) == 2
+    assert supervisor.workers[-1].cmd[-2:] == ['-n', 'worker2@%h']
+    supervisor.tick()  # cooldown
+    assert len(supervisor.workers) == 2
+
+    probe.depth_value, probe.latency_value = 0, 5.0  # slow tasks
+    clock.now = 11
+    supervisor.tick()
+    supervisor.tick()
+    assert len(supervisor.workers) == 3  # max_workers
+
+    probe.latency_value = 0.1
+    clock.now = 30
+    supervisor.tick()
+    assert len(supervisor.workers) == 3  # not idle long enough
+    supervisor.tick()
+    assert len(supervisor.workers) == 2
+    youngest = supervisor.retiring[0]
+    assert youngest.process.signals == ['TERM']
+    youngest.process.returncode = 0
+    clock.now = 50
+    for _ in range(4):
+        supervisor.tick()
+    assert len(supervisor.workers) == 1  # min_workers
+    assert youngest not in supervisor.retiring
+
+
+def test_supervisor_restarts_with_backoff(supervisor):
+    supervisor, probe, clock = supervisor
+    worker = supervisor.workers[0]
+    first = worker.process
+    first.returncode = 1
+    supervisor.tick()
+    assert worker.process is first  # waits for backoff (1s)
+    clock.now = 1
+    supervisor.tick()
+    assert worker.process is not first and worker.running
+
+    worker.process.returncode = 1
+    clock.now = 1.5
+    supervisor.tick()
+    clock.now = 3
+    supervisor.tick()
+    assert not worker.running  # second restart waits 2s
+    clock.now = 3.5
+    supervisor.tick()
+    assert worker.running and worker.restarts == 2
+
+
+def test_supervisor_drain(supervisor):
+    supervisor, probe, clock = supervisor
+    processes = [supervisor.beat.process, supervisor.workers[0].process]
+    supervisor.stop()
+    assert supervisor.stopping
+    supervisor.drain()  # FakeProcess never exits by itself
+    assert [process.signals for process in processes] == \
+        [['TERM', 'KILL'], ['TERM', 'KILL']]
+    assert supervisor.workers == []
+
+
+def test_broker_probe(app):
+    from flaskapp.tools.metrics import MetricsRegistry, TASK_QUEUE_METRIC
+    # the supervisor needs latency even if METRICS_DISABLED is set
+    registry = MetricsRegistry(directory='', enabled=False)
+    probe = BrokerProbe(app, queues=['celery'], registry=registry)
+    registry.observe(TASK_QUEUE_METRIC, 100.0, queue='celery')
+    assert probe.latency() == 0.0  # older values are ignored
+    registry.observe(TASK_QUEUE_METRIC, 1.0, queue='celery')
+    registry.observe(TASK_QUEUE_METRIC, 3.0, queue='celery')
+    registry.observe(TASK_QUEUE_METRIC, 9.0, queue='other')
+    assert probe.latency() == 2.0
+    app.fan_out(app.get_plugged_tasklist('bench-beat'), range(10),
+                chunk_size=5)
+    assert probe.depth() == 2
+
+
+def test_advisory_lock(sqlite_db):
+    first, second = AdvisoryLock('test-lock'), AdvisoryLock('test-lock')
+    with first as acquired:
+        assert acquired
+        assert not second.acquire()
+        assert AdvisoryLock('other-lock').acquire()
+    assert second.acquire()
+    second.release()
+
+
+def test_beat_lock(sqlite_db):
+    app = CeleryTask('Lock-Test', broker='memory://')
+    runs = []
+
+    @app.create_beat(name='locked-beat', lock='shared-lock')
+    def locked_beat():
+        runs.append(app.current_beat.get())
+        return 'done'
+
+    with AdvisoryLock('shared-lock'):
+        assert locked_beat() is None
+    assert locked_beat() == 'done'
+    assert runs == ['locked-beat']
+
+
+class RecordsSheet:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_all_records(self):
+        return self.rows
+
+
+def test_profile_detail_checkpoint(sqlite_db, monkeypatch):
+    phones = [f'+1555000{it:04d}' for it in range(5)]
+    called, crash_at = [], [phones[3]]
+
+    def call_flow(flow_sid, phone_number):
+        if phone_number in crash_at:
+            crash_at.remove(phone_number)
+            raise RuntimeError('twilio is down')
+        called.append(phone_number)
+
+    monkeypatch.setattr(ivr_core, 'gs_users_existing', RecordsSheet(
+        [{'Phone Number': phone, 'dob': ''} for phone in phones]
+    ))
+    monkeypatch.setattr(ivr_core, 'call_flow', call_flow)
+
+    with pytest.raises(RuntimeError):
+        ivr_core.profile_detail(checkpoint=Checkpoint('weekly'))
+    assert BeatCheckpoint.get(name='weekly').position == '15550000002'
+
+    # rows are reordered and a new one is inserted before the next run
+    monkeypatch.setattr(ivr_core, 'gs_users_existing', RecordsSheet(
+        [{'Phone Number': phone, 'dob': ''}
+         for phone in ['+15559999999'] + phones[::-1]]
+    ))
+    checkpoint = Checkpoint('weekly')
+    assert checkpoint.resumed
+    ivr_core.profile_detail(checkpoint=checkpoint)
+    # users before the crash are not called again, the new one is
+    assert called == phones + ['+15559999999']
+    record = BeatCheckpoint.get(name='weekly')
+    assert record.position is None and record.finished
+    assert not Checkpoint('weekly').resumed
+
+
+def test_proxy_task_shares_weekly_lock(sqlite_db, monkeypatch):
+    from taskscheduler.tasks import proxy_task1, PROFILE_DETAILS_BEAT
+    runs = []
+    monkeypatch.setattr(ivr_core, 'profile_detail',
+                        lambda checkpoint=None: runs.append(checkpoint.name))
+
+    with AdvisoryLock(PROFILE_DETAILS_BEAT):
+        proxy_task1()
+    assert runs == []
+    proxy_task1()
+    assert runs == [PROFILE_DETAILS_BEAT]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 7:40:18 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+import datetime
+import pytest
+from loadtest.sheets_client import standin_client
+from flaskapp.core import ivr_core
+from flaskapp.core import sheets_mirror
+from flaskapp.core.sheets_mirror import mirror_users, load_rows, MIRROR_BEAT
+from flaskapp.models.beats import Watermark
+from flaskapp.models.ivr_models import User, PhoneNumber, HealthMetric
+from flaskapp.models.routing import storage_router, parse_route
+
+
+@pytest.mark.usefixtures('init_test_db')
+def test_mirror_users(sheets_api, monkeypatch):
+    client = standin_client(sheets_api.url)
+    worksheet = client.open('Users').worksheet('Existing')
+
+    alice = User.create(username='alice', type='C', timezone='US/Pacific')
+    PhoneNumber.create(number='12000000001', user=alice)  # sheet row 3
+    bob = User.create(username='bob')
+    PhoneNumber.create(number='+1 555-000-1234', user=bob)
+    HealthMetric.create(user=bob, data={'weight': 70, 'sbp': 120})
+    HealthMetric.create(user=bob, data={'weight': 72})
+
+    rows = load_rows()
+    assert rows.loc['15550001234', 'weight'] == 72
+
+    report = mirror_users(client)
+    # read header and phone numbers, one batch update, one append
+    assert report == {'users': 2, 'updated': 1, 'appended': 1,
+                      'ranges': 2, 'callers': 0, 'api_calls': 3}
+    row = worksheet.row_values(3)
+    assert row[:3] == ['12000000001', 'alice', 'C']
+    assert row[9] == 'US/Pacific'
+    assert worksheet.get_all_values()[-1][:6] == \
+        ['15550001234', 'bob', '', '', '', '72']
+
+    # users changed shortly before the run are mirrored again, in place
+    sheet_rows = len(worksheet.get_all_values())
+    report = mirror_users(client)
+    assert (report['users'], report['appended']) == (2, 0)
+    assert len(worksheet.get_all_values()) == sheet_rows
+
+    # nothing has changed since the previous run
+    monkeypatch.setattr(sheets_mirror, 'SHEETS_MIRROR_OVERLAP', 0)
+    mirror_users(client)
+    assert mirror_users(client)['api_calls'] == 0
+
+    bob.type = 'V'
+    bob.save()
+    report = mirror_users(client)
+    assert (report['users'], report['updated'], report['appended']) == \
+        (1, 1, 0)
+    assert report['api_calls'] == 2
+    assert worksheet.get_all_values()[-1][2] == 'V'
+
+
+@pytest.mark.usefixtures('init_test_db')
+def test_new_user_is_mirrored(sheets_api, monkeypatch):
+    monkeypatch.setattr(ivr_core, 'GOOGLE_SHEETS_DUAL_WRITE', False)
+    monkeypatch.setattr(ivr_core, 'send_mail', lambda *args, **kw: True)
+    # without dual writes new users are read from postgres
+    monkeypatch.setitem(storage_router.routes, 'user_exists',
+                        parse_route('postgres'))
+    client = standin_client(sheets_api.url)
+    worksheet = client.open('Users').worksheet('Existing')
+
+    # a caller is not a user until they join, they go to Calls tab
+    ivr_core.save_new_user('+1 555-000-7777', 'Calls')
+    assert ivr_core.is_user_new('+1 555-000-7777')
+    report = mirror_users(client)
+    assert (report['appended'], report['callers']) == (0, 1)
+    calls = client.open('Users').worksheet('Calls').get_all_values()
+    assert calls[-1][0] == '15550007777'
+
+    ivr_core.save_new_user('+1 555-000-7777', 'Existing')
+    assert not ivr_core.is_user_new('+1 555-000-7777')
+    assert PhoneNumber.get(number='15550007777').user is not None
+    mirror_users(client)
+    rows = [row for row in worksheet.get_all_values()
+            if row[0] == '15550007777']
+    assert len(rows) == 1
+    assert rows[0][-2:] == ['19258609793', '19258609793']
+
+
+@pytest.mark.usefixtures('init_test_db')
+def test_late_commit_is_mirrored(sheets_api):
+    client = standin_client(sheets_api.url)
+    mirror_users(client, full=True)
+
+    # stamped a second before the previous run started, committed after it
+    stamp = Watermark(MIRROR_BEAT).value + datetime.timedelta(
+        seconds=sheets_mirror.SHEETS_MIRROR_OVERLAP - 1)
+    late = User.create(username='late')
+    PhoneNumber.create(number='15550005555', user=late)
+    User.update(updated=stamp).where(User.id == late.id).execute()
+    PhoneNumber.update(updated=stamp) \
+        .where(PhoneNumber.user == late).execute()
+
+    assert mirror_users(client)['appended'] == 1
+    values = client.open('Users').worksheet('Existing').get_all_values()
+    assert '15550005555' in [row[0] for row in values]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 4:40:12 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import pytest
+import gspread
+from loadtest.sheets_server import parse_a1, USERS_SPREADSHEET_ID
+from loadtest.sheets_client import standin_client
+from flaskapp.models.storages import GoogleSpreadSheet
+
+
+def test_parse_a1():
+    assert parse_a1("'Sheet 1'!A2:C10") == ('Sheet 1', 2, 10, 1, 3)
+    assert parse_a1('Existing!B3') == ('Existing', 3, 3, 2, 2)
+    assert parse_a1('Existing') == ('Existing', None, None, None, None)
+    assert parse_a1('A:C') == ('', None, None, 1, 3)
+    assert parse_a1('2:5') == ('', 2, 5, None, None)
+
+
+def test_gspread_against_standin(sheets_api):
+    client = standin_client(sheets_api.url)
+
+    spreadsheet = client.open('Users')
+    assert spreadsheet.id == USERS_SPREADSHEET_ID
+    assert [ws.title for ws in spreadsheet.worksheets()] == \
+        ['Existing', 'Calls']
+
+    worksheet = client.open_by_key(USERS_SPREADSHEET_ID).worksheet('Existing')
+    records = worksheet.get_all_records()
+    assert len(records) == 20
+    assert records[0]['username'] == 'user0'
+
+    worksheet.update_cell(2, 2, 'alice')
+    assert worksheet.cell(2, 2).value == 'alice'
+
+    calls = spreadsheet.worksheet('Calls')
+    calls.append_row(['12000000001', 'bob'])
+    assert calls.get_all_values()[-1][:2] == ['12000000001', 'bob']
+
+    worksheet.batch_update([{'range': 'B3:C3', 'values': [['carol', 'V']]}])
+    assert worksheet.row_values(3)[1:3] == ['carol', 'V']
+
+
+def test_google_spreadsheet_uses_standin(sheets_api, monkeypatch):
+    monkeypatch.setattr(GoogleSpreadSheet, 'gc',
+                        standin_client(sheets_api.url))
+    sheet = GoogleSpreadSheet(USERS_SPREADSHEET_ID, 'Existing')
+    sheet.open_spreadsheet()
+    assert len(sheet.get_all_value()) == 21
+
+
+def test_injected_quota_and_errors(sheets_api):
+    client = standin_client(sheets_api.url)
+    worksheet = client.open('Users').sheet1
+
+    sheets_api.faults.configure(quota=1)
+    worksheet.get_all_values()
+    with pytest.raises(gspread.exceptions.APIError) as e:
+        worksheet.get_all_values()
+    assert e.value.response.status_code == 429
+
+    sheets_api.faults.configure(quota=0, error_rate=1)
+    with pytest.raises(gspread.exceptions.APIError) as e:
+        worksheet.get_all_values()
+    assert e.value.response.status_code == 500
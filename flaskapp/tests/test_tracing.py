@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 2:05:51 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import pytest
+from flaskapp.tools.tracing import Tracer, parse_traceparent
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+def test_parse_traceparent():
+    trace_id, parent_id = 'a' * 32, 'b' * 16
+    assert parse_traceparent(f'00-{trace_id}-{parent_id}-01') == \
+        (trace_id, parent_id, True)
+    assert parse_traceparent(f'00-{trace_id}-{parent_id}-00')[2] is False
+    assert parse_traceparent('garbage') is None
+    assert parse_traceparent(f'00-{trace_id}-xyz-01') is None
+
+
+def test_child_spans_share_trace():
+    exporter = CollectingExporter()
+    tracer = Tracer(exporter, sample_rate=1)
+
+    with tracer.span('voice') as root:
+        with tracer.span('gspread get_all_records') as child:
+            pass
+
+    # spans are exported once finished: child first, then root
+    assert exporter.spans == [child, root]
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert root.parent_id is None
+
+
+def test_remote_parent_and_errors():
+    exporter = CollectingExporter()
+    tracer = Tracer(exporter, sample_rate=0)
+    traceparent = f"00-{'c' * 32}-{'d' * 16}-01"
+
+    with pytest.raises(ValueError):
+        with tracer.span('task proxy_task1', traceparent=traceparent):
+            raise ValueError('boom')
+
+    span, = exporter.spans
+    # sampling decision of the remote parent takes precedence
+    assert span.trace_id == 'c' * 32
+    assert span.parent_id == 'd' * 16
+    assert 'boom' in span.attributes['error']
+
+
+def test_not_sampled_traces_are_not_exported():
+    exporter = CollectingExporter()
+    tracer = Tracer(exporter, sample_rate=0)
+
+    with tracer.span('voice') as root:
+        with tracer.span('postgres execute_sql'):
+            pass
+
+    assert root.sampled is False
+    assert exporter.spans == []
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 5:12:40 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import pytest
+import threading
+from flask import Flask, request
+from werkzeug.serving import make_server
+from twilio.rest import Client
+from twilio.base.exceptions import TwilioRestException
+from twilio.twiml.voice_response import VoiceResponse, Gather
+from loadtest.twilio_server import TwilioStore, create_app
+from loadtest.call_driver import CallDriver
+from flaskapp.tools.utils import TimedTwilioHttpClient
+
+
+def serve(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+@pytest.fixture
+def ivr_app():
+    """Tiny IVR app answering like flaskapp webhooks do"""
+
+    app = Flask(__name__)
+    app.webhooks = []
+
+    @app.route('/voice', methods=['POST'])
+    def voice():
+        app.webhooks.append(('voice', request.form['From']))
+        response = VoiceResponse()
+        response.append(Gather(input='speech dtmf', action='/voice_joined'))
+        return str(response)
+
+    @app.route('/voice_joined', methods=['POST'])
+    def voice_joined():
+        app.webhooks.append(('voice_joined', request.form['SpeechResult']))
+        return str(VoiceResponse())
+
+    @app.route('/after_call', methods=['POST'])
+    def after_call():
+        app.webhooks.append(('after_call', request.form.get('UP')))
+        return str(VoiceResponse())
+
+    server, app.url = serve(app)
+    yield app
+    server.shutdown()
+
+
+@pytest.fixture
+def twilio_api(ivr_app):
+    store = TwilioStore()
+    driver = CallDriver(ivr_app.url, on_call=store.add_call)
+    app = create_app(store, driver=driver)
+    server, app.url = serve(app)
+    yield app
+    server.shutdown()
+
+
+def twilio_client(url):
+    return Client('AC' + '1' * 32, 'token',
+                  http_client=TimedTwilioHttpClient(api_url=url))
+
+
+def test_studio_execution_drives_simulated_call(twilio_api, ivr_app):
+    client = twilio_client(twilio_api.url)
+    flow = client.studio.flows('FW' + '0' * 32)
+
+    execution = flow.executions.create(to='+12000000001', from_='+15550000000')
+    steps = flow.executions(execution.sid).steps.list(limit=20)
+    assert len(steps) == 12
+    context = flow.executions(execution.sid).steps(steps[0].sid) \
+        .step_context().fetch()
+    assert context.context['flow']['variables']['UP'] == '120'
+
+    twilio_api.driver.executor.shutdown(wait=True)
+    assert ivr_app.webhooks == [('voice', '+12000000001'),
+                                ('voice_joined', 'yes'),
+                                ('after_call', '120')]
+
+    calls = client.calls.list(from_='+12000000001')
+    assert [call.status for call in calls] == ['completed']
+    assert client.calls(calls[0].sid).fetch().sid == calls[0].sid
+
+
+def test_messages_and_rate_limit(twilio_api):
+    client = twilio_client(twilio_api.url)
+    client.messages.create(to='+12000000001', from_='+15550000000',
+                           body='Your password: 123456')
+    assert twilio_api.store.messages[0]['body'] == 'Your password: 123456'
+
+    twilio_api.faults.configure(quota=1, quota_window=60)
+    client.messages.create(to='+12000000001', from_='+15550000000',
+                           body='1')
+    with pytest.raises(TwilioRestException) as e:
+        client.messages.create(to='+12000000001', from_='+15550000000',
+                               body='2')
+    assert (e.value.status, e.value.code) == (429, 20429)
+
+
+def test_call_driver_paces_calls(ivr_app):
+    driver = CallDriver(ivr_app.url)
+    phones = iter(['+12000000001', '+12000000002', '+12000000003'])
+    summary = driver.run(phones, cps=50, calls=3).summary()
+    assert {name: row['count'] for name, row in summary.items()} == \
+        {'voice': 3, 'voice_joined': 3, 'after_call': 3}
+    assert not any(row['errors'] for row in summary.values())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 10:41:52 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+
+import json
+import pytest
+from flask import url_for
+from flaskapp.core import user_import
+from flaskapp.core.user_import import read_users, import_users, summarize
+from flaskapp.models.ivr_models import User, PhoneNumber
+from flaskapp.views import provisioning
+
+
+CSV = '''phone,username,gender,call_window_start,hobby
++1 650-555-0001,alice,W,8:30,chess
+16505550002,bob,X,,
+not a phone,carol,,,
+1-650-555-0001,alice again,,,
+16505550003,,,9:00:00,
+16505550004,known,,,
+16505550005,orphan,,,
+'''
+
+
+@pytest.mark.usefixtures('init_test_db')
+def test_import_users(query_budget):
+    known = User.create(username='known')
+    PhoneNumber.create(number='16505550004', user=known)
+    orphan = PhoneNumber.create(number='+16505550005')
+
+    rows = read_users(CSV.encode())
+    assert summarize(import_users(rows, dry_run=True))['new'] == 3
+    assert User.select().count() == 1
+
+    # phone numbers, then a transaction per chunk:
+    # BEGIN, users, their phone numbers
+    with query_budget(1 + 3 * 3):
+        report = import_users(rows, chunk_size=1)
+    assert report[['phone', 'status', 'error']].values.tolist() == [
+        ['16505550001', 'created', ''],
+        ['16505550002', 'invalid', 'invalid gender'],
+        ['not a phone', 'invalid', 'invalid phone'],
+        ['16505550001', 'duplicate', ''],
+        ['16505550003', 'created', ''],
+        ['16505550004', 'exists', ''],
+        ['16505550005', 'created', ''],
+    ]
+    assert report['user_id'][5] == known.id
+
+    alice = User.get(User.id == report['user_id'][0])
+    assert (alice.username, alice.gender, str(alice.call_window_start)) == \
+        ('alice', 'W', '08:30:00')
+    assert alice.updated is not None
+    assert PhoneNumber.get(PhoneNumber.user == alice).number == '16505550001'
+    assert PhoneNumber.get_by_id(orphan.id).user.username == 'orphan'
+
+    # imported again, valid rows (and the repeated one) exist
+    assert summarize(import_users(rows))['exists'] == 5
+
+
+def test_read_users():
+    rows = read_users('{"phone": 16505550010, "username": "dave"}\n\n'
+                      '{"phone": "16505550011", "timezone": null}\n',
+                      fmt='ndjson')
+    assert rows.values.tolist() == [['16505550010', 'dave', ''],
+                                    ['16505550011', '', '']]
+    with pytest.raises(ValueError):
+        read_users('username\nalice\n')
+
+
+@pytest.mark.usefixtures('init_test_db')
+def test_import_users_view(client, monkeypatch):
+    monkeypatch.setattr(provisioning, 'USERS_IMPORT_TOKEN', 'secret')
+    with client.application.test_request_context():
+        url = url_for('MobileAPIBluprint.import_users_view')
+    body = '{"phone": "16505550020", "username": "erin"}\n'
+
+    response = client.post(url, data=body)
+    assert response.status_code == 403
+
+    response = client.post(url, data=body,
+                           content_type='application/x-ndjson',
+                           headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['summary']['created'] == 1
+    assert result['rows'][0]['status'] == 'created'
+    assert User.get_by_id(result['rows'][0]['user_id']).username == 'erin'
+
+    response = client.post(url, data='username\nfrank\n',
+                           content_type='text/csv',
+                           headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 400
+
+
+@pytest.mark.usefixtures('init_test_db')
+def test_import_users_cli(tmp_path, capsys):
+    path = tmp_path / 'users.csv'
+    path.write_text('phone,username\n16505550030,grace\n')
+    assert user_import.main([str(path), '--report',
+                             str(tmp_path / 'report.csv')]) == 0
+    assert json.loads(capsys.readouterr().out)['created'] == 1
+    assert '16505550030,created' in (tmp_path / 'report.csv').read_text()
@@ -25,14 +25,11 @@ Copyright (c) 2021
 """
 
 import datetime
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException, TwilioException
-from flaskapp.settings import (OTP_DURATION,
-                               TWILIO_ACCOUNT_SID,
-                               TWILIO_AUTH_TOKEN,
-                               TWILIO_MAIN_PHONE_NUMBER)
+from flaskapp.settings import OTP_DURATION, TWILIO_MAIN_PHONE_NUMBER
 from flaskapp.models.ivr_models import OTPPassword
-from flaskapp.tools.utils import cleanup_phone_number
+from flaskapp.tools.utils import cleanup_phone_number, get_twilio_client
+from flaskapp.tools.phones import e164
 from logging import getLogger
 
 logger = getLogger(__name__)
@@ -54,7 +51,7 @@ class OTPValidator:
 
         if message and phone_number:
             try:
-                client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+                client = get_twilio_client()
                 client.messages.create(
                     to=phone_number,
                     from_=TWILIO_MAIN_PHONE_NUMBER,
@@ -83,7 +80,7 @@ class OTPValidator:
         )
         message = f"Your One Time Password (OTP) is: {otp_object.otp_password}"
         return self.send_message_by_twilio(
-            phone_number='+' + otp_object.phone_number,
+            phone_number=e164(otp_object.phone_number),
             message=message
         )
 
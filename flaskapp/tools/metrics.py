@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 10:12:40 am
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import os
+import json
+import time
+import uuid
+import atexit
+import bisect
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from flaskapp.tools.tracing import tracer
+from flaskapp.settings import (METRICS_ENABLED, METRICS_DIR,
+                               METRICS_FLUSH_INTERVAL, METRICS_EXPIRE_AFTER,
+                               METRICS_BUCKETS)
+
+
+__all__ = ('registry', 'timer', 'timed', 'timed_view')
+
+
+logger = logging.getLogger(__name__)
+
+
+VIEW_METRIC = 'buzznet_view_duration_seconds'
+DEPENDENCY_METRIC = 'buzznet_dependency_duration_seconds'
+TASK_QUEUE_METRIC = 'buzznet_task_queue_seconds'
+WORKERS_METRIC = 'buzznet_scheduler_workers'
+SHADOW_READ_METRIC = 'buzznet_shadow_read_seconds'
+
+# recorded even if METRICS_DISABLED is set: the worker supervisor scales
+# by task queue latency, storage routes are switched by shadow reads
+CONTROL_METRICS = frozenset((TASK_QUEUE_METRIC, WORKERS_METRIC,
+                             SHADOW_READ_METRIC))
+
+METRIC_DESCRIPTIONS = {
+    VIEW_METRIC: 'Time spent inside registered view functions.',
+    DEPENDENCY_METRIC: 'Time spent waiting for external dependencies '
+                       '(postgres, google sheets, twilio, sendgrid, etc.).',
+    TASK_QUEUE_METRIC: 'Time celery tasks spent in the broker queue '
+                       '(since publishing or eta).',
+    WORKERS_METRIC: 'Decisions of the worker supervisor (start_scheduler.py '
+                    '--supervise); observed value is the number of workers '
+                    'after the decision.',
+    SHADOW_READ_METRIC: 'Duration of background reads of the secondary '
+                        'storage (see STORAGE_ROUTES); `result` label '
+                        'is match, mismatch or error.'
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram of observed values
+
+    Instances are never shared between threads (see `MetricsRegistry`),
+    so no locking is needed when observing values.
+    """
+
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, size):
+        self.counts = [0] * size  # the last one is +Inf bucket
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value, bounds):
+        self.counts[bisect.bisect_left(bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per-process registry of latency histograms
+
+    Every thread records values into its own set of histograms, so
+    the hot path doesn't take any locks; these sets are merged only
+    when a snapshot is requested.
+
+    Snapshots are dumped (as json) to `directory` by a background thread,
+    one file per process; `collect` merges all of them, so metrics of all
+    gunicorn (or celery) workers are available from any of them. A process
+    removes its file on exit, files of killed processes expire.
+
+    :param directory: a directory shared by all processes,
+                      metrics aren't shared if it is empty
+    :type directory: str
+    :param bounds: upper bounds of histogram buckets (in seconds)
+    :type bounds: Iterable[float]
+    :param flush_interval: how often (seconds) snapshot is dumped to disk
+    :type flush_interval: float
+    :param expire_after: files not updated for that many seconds
+                         are deleted by `collect`
+    :type expire_after: float
+    :param name: snapshot file name, defaults to process id
+                 and a random suffix (process ids are reused)
+    :type name: str, optional
+    :param enabled: if False, only `CONTROL_METRICS` are recorded
+                    (METRICS_DISABLED)
+    :type enabled: bool
+    """
+
+    def __init__(self, directory=METRICS_DIR, bounds=METRICS_BUCKETS,
+                 flush_interval=METRICS_FLUSH_INTERVAL,
+                 expire_after=METRICS_EXPIRE_AFTER, name=None,
+                 enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.directory = directory
+        self.bounds = tuple(sorted(bounds))
+        self.flush_interval = flush_interval
+        self.expire_after = expire_after
+        self.name = name
+        self._local = threading.local()
+        self._stores = []
+        self._suffix = uuid.uuid4().hex[:8]
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # the flushing thread isn't copied to the child process
+        # and the child must not overwrite files of the parent one
+        self._suffix = uuid.uuid4().hex[:8]
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def filename(self):
+        name = self.name or f'{os.getpid()}-{self._suffix}'
+        return os.path.join(self.directory, f'{name}.json')
+
+    def _get_store(self):
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = {}
+            # NOTE: list.append is atomic, no lock is required here
+            self._stores.append(store)
+        return store
+
+    def observe(self, metric, value, **labels):
+        """Record a single value (e.g. duration in seconds)
+
+        :param metric: metric name, e.g. buzznet_view_duration_seconds
+        :type metric: str
+        :param value: observed value
+        :type value: float
+        """
+
+        if not self.enabled and metric not in CONTROL_METRICS:
+            return
+        key = (metric, tuple(sorted(labels.items())))
+        store = self._get_store()
+        histogram = store.get(key)
+        if histogram is None:
+            histogram = store[key] = Histogram(len(self.bounds) + 1)
+        histogram.observe(value, self.bounds)
+
+        if self._thread is None and self.directory:
+            self._start_thread()
+
+    def _start_thread(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.remove)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def snapshot(self):
+        """Merge histograms of all threads of the current process
+
+        :return: mapping (metric, labels) -> [counts, total, count]
+        :rtype: dict
+        """
+
+        result = {}
+        for store in list(self._stores):
+            for key, histogram in store.copy().items():
+                merged = result.setdefault(
+                    key, [[0] * len(histogram.counts), 0.0, 0]
+                )
+                merged[0] = [a + b for a, b in zip(merged[0],
+                                                   histogram.counts)]
+                merged[1] += histogram.total
+                merged[2] += histogram.count
+        return result
+
+    def flush(self):
+        """Dump snapshot of the current process to the shared directory
+        """
+
+        data = {
+            'bounds': self.bounds,
+            'histograms': [
+                [metric, labels, *values]
+                for (metric, labels), values in self.snapshot().items()
+            ]
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_name = f'{self.filename}.{threading.get_ident()}.tmp'
+            with open(tmp_name, 'w') as fd:
+                json.dump(data, fd)
+            os.replace(tmp_name, self.filename)
+        except OSError as e:
+            logger.error(f"Couldn't dump metrics to {self.directory}: {e}")
+
+    def remove(self):
+        """Remove the file of the current process (on exit)
+        """
+
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+    def collect(self):
+        """Merge snapshots of all processes sharing the same directory
+
+        :return: mapping (metric, labels) -> [counts, total, count]
+        :rtype: dict
+        """
+
+        result = self.snapshot()
+        if not self.directory:
+            return result
+
+        own_filename = self.filename
+        try:
+            filenames = [os.path.join(self.directory, name)
+                         for name in os.listdir(self.directory)
+                         if name.endswith(('.json', '.tmp'))]
+        except OSError:
+            filenames = []
+
+        now = time.time()
+        for filename in filenames:
+            if filename == own_filename:
+                continue
+            try:
+                if now - os.path.getmtime(filename) > self.expire_after:
+                    # left by a killed process (or an interrupted dump)
+                    os.remove(filename)
+                    continue
+                if filename.endswith('.tmp'):
+                    continue
+                with open(filename) as fd:
+                    data = json.load(fd)
+            except (OSError, ValueError):
+                # the file could be removed or replaced meanwhile
+                continue
+            if tuple(data.get('bounds', ())) != self.bounds:
+                logger.warning(f"Metrics file {filename} has "
+                               "incompatible buckets; skipped.")
+                continue
+            for metric, labels, counts, total, count in data['histograms']:
+                key = (metric, tuple(tuple(item) for item in labels))
+                merged = result.setdefault(key, [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+        return result
+
+    def render(self):
+        """Render all collected metrics in Prometheus text format
+
+        :return: text exposition of collected metrics
+        :rtype: str
+        """
+
+        by_metric = {}
+        for (metric, labels), values in self.collect().items():
+            by_metric.setdefault(metric, []).append((labels, values))
+
+        lines = []
+        for metric in sorted(by_metric):
+            description = METRIC_DESCRIPTIONS.get(metric, metric)
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} histogram')
+            for labels, (counts, total, count) in sorted(by_metric[metric]):
+                label_str = ''.join(
+                    f'{name}="{_escape(value)}",' for name, value in labels
+                )
+                cumulative = 0
+                for bound, bucket_count in zip(self.bounds + ('+Inf',),
+                                               counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{{label_str}le="{bound}"}}'
+                                 f' {cumulative}')
+                label_str = '{' + label_str.rstrip(',') + '}' \
+                    if label_str else ''
+                lines.append(f'{metric}_sum{label_str} {total}')
+                lines.append(f'{metric}_count{label_str} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\') \
+        .replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timer(dependency, operation=''):
+    """Measure time spent in the block and record it as dependency latency
+
+    The block is also traced as a child span of the current one
+    (see `flaskapp.tools.tracing`).
+
+    >>> with timer('postgres', 'execute_sql'):
+    ...     cursor.execute(sql)
+    """
+
+    with tracer.span(f'{dependency} {operation}'.strip(),
+                     dependency=dependency):
+        if not registry.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            registry.observe(
+                DEPENDENCY_METRIC,
+                time.perf_counter() - start,
+                dependency=dependency,
+                operation=operation
+            )
+
+
+def timed(dependency, operation=None):
+    """Decorator version of `timer`;
+    `operation` defaults to the name of decorated function.
+    """
+
+    def decorator(fun):
+        if not METRICS_ENABLED:
+            return fun
+
+        @wraps(fun)
+        def wrapper(*args, **kwargs):
+            with timer(dependency, operation or fun.__name__):
+                return fun(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_view(view, endpoint=''):
+    """Wrap view function to record its latency
+
+    :param view: a view function to wrap
+    :type view: Callable
+    :param endpoint: value of `view` label, defaults to view name
+    :type endpoint: str, optional
+    """
+
+    if not METRICS_ENABLED:
+        return view
+
+    endpoint = endpoint or view.__name__
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            registry.observe(VIEW_METRIC, time.perf_counter() - start,
+                             view=endpoint)
+    return wrapper
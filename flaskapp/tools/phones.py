@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 11:03:26 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+import re
+import string
+from functools import lru_cache
+import pandas as pd
+
+
+__all__ = ('normalize_phone', 'e164', 'normalize_phones', 'phones_equal',
+           'find_phone_row', 'mask_phone')
+
+
+# separators allowed in raw numbers: '+1 (650) 555-0100', '1.650.555.0100'
+SEPARATORS = string.whitespace + '\xa0+-().'
+
+# E.164: a country code and a subscriber number, at most 15 digits
+E164_DIGITS = r'[0-9]{1,15}'
+
+# digits of a phone number left visible in logs (at most a half of them)
+MASK_VISIBLE_DIGITS = 4
+
+# phone numbers of webhooks repeat a lot (the same caller within a call)
+CACHE_SIZE = 4096
+
+# str.translate deletes them faster than re.sub / str.replace
+_separators = str.maketrans('', '', SEPARATORS)
+_e164_re = re.compile(E164_DIGITS)
+
+
+def _text(phone_number):
+    """The raw phone number as a string; floats (cells of a numeric
+    column with blanks, 16505550100.0) are integers, '' if they aren't
+    ('.' is a separator, the fraction would become digits)"""
+
+    if isinstance(phone_number, float):
+        return str(int(phone_number)) if phone_number.is_integer() else ''
+    return str(phone_number)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_phone(phone_number):
+    """Canonical form of the phone number: E.164 digits without '+'
+    (as phone numbers are stored), e.g. '+1 650-555-0100' -> '16505550100'
+
+    :param phone_number: raw phone number
+    :type phone_number: Union[str, int, float]
+    :raises ValueError: if the phone number isn't a number
+    :rtype: str
+    """
+
+    digits = _text(phone_number).translate(_separators)
+    if not _e164_re.fullmatch(digits):
+        raise ValueError(f"Phone number {phone_number} couldn't be cleaned.")
+    return digits
+
+
+def e164(phone_number):
+    """The phone number in E.164 format, e.g. '+16505550100'
+    (to call or text it)"""
+
+    return '+' + normalize_phone(phone_number)
+
+
+def mask_phone(phone_number):
+    """The phone number fit for logs: all but the last digits are masked,
+    e.g. '16505550100' -> '*******0100'"""
+
+    text = _text(phone_number)
+    visible = min(MASK_VISIBLE_DIGITS, len(text) // 2)
+    return '*' * (len(text) - visible) + text[len(text) - visible:]
+
+
+def normalize_phones(phone_numbers, errors='coerce'):
+    """`normalize_phone` of a column, by pandas `.str` methods
+
+    :param phone_numbers: raw phone numbers (strings, integers or floats)
+    :type phone_numbers: pandas.Series
+    :param errors: 'coerce' - invalid numbers are '', 'raise' - raise
+                   ValueError, 'ignore' - they are left without separators
+    :type errors: str
+    :rtype: pandas.Series
+    """
+
+    if pd.api.types.infer_dtype(phone_numbers, skipna=False) in \
+            ('string', 'integer', 'empty'):
+        text = phone_numbers.astype(str)
+    else:  # floats are converted one by one, see _text
+        text = phone_numbers.map(_text).astype(object)
+    digits = text.str.translate(_separators)
+    if errors == 'ignore':
+        return digits
+    valid = digits.str.fullmatch(E164_DIGITS)
+    if errors == 'raise' and not valid.all():
+        raise ValueError(f"Phone number {phone_numbers[~valid].iloc[0]} "
+                         "couldn't be cleaned.")
+    return digits.where(valid, '')
+
+
+def phones_equal(phone_numbers, phone_number):
+    """Mask of numbers of the column equal to the phone number, once both
+    are normalized (invalid numbers are equal to nothing)
+
+    :type phone_numbers: pandas.Series
+    :rtype: numpy.ndarray
+    """
+
+    try:
+        phone_number = normalize_phone(phone_number)
+    except ValueError:
+        return pd.Series(False, index=phone_numbers.index).values
+    return (normalize_phones(phone_numbers) == phone_number).values
+
+
+def find_phone_row(records, phone_number, column='Phone Number'):
+    """The last of sheet records with the phone number (one comparison
+    of the column), None if there is none
+
+    :param records: rows of a sheet, see `gspread.Worksheet.get_all_records`
+    :type records: list
+    :rtype: dict
+    """
+
+    table = pd.DataFrame(records)
+    if table.empty:
+        return None
+    found = table[phones_equal(table[column], phone_number)]
+    # the last row wins, as in the former row-by-row lookups
+    return found.iloc[-1].to_dict() if len(found) else None
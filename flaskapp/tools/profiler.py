@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 3:27:10 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import os
+import re
+import sys
+import hmac
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from flaskapp.settings import (PROFILER_ADMIN_TOKEN, PROFILER_SAMPLE_RATE,
+                               PROFILER_DIR, PROFILER_MAX_PROFILES,
+                               PROFILER_INTERVAL)
+
+
+__all__ = ('SamplingProfiler', 'ProfileStore', 'profile_store', 'init_app')
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_HEADER = 'X-Profile'
+
+
+def collapse_stack(frame):
+    """Represent call stack as a single line in collapsed-stack format:
+    outermost frame first, frames are separated by semicolons
+    """
+
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} '
+                     f'({os.path.basename(code.co_filename)}:'
+                     f'{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Statistical profiler of a single thread
+
+    While started, a helper thread takes a snapshot of the target
+    thread's call stack every `interval` seconds; nothing is done
+    (and nothing costs) while the profiler isn't started.
+
+    :param interval: the number of seconds between samples
+    :type interval: float
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = None
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    def start(self, thread_id=None):
+        self._thread_id = thread_id or threading.get_ident()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+
+
+class ProfileStore:
+    """Directory of recent profiles working as a ring buffer
+
+    Once there are more than `max_profiles` profiles, the oldest ones
+    are removed; file names start with timestamps, so it works for all
+    processes sharing the directory.
+
+    :param directory: where profiles are written
+    :type directory: str
+    :param max_profiles: how many recent profiles to keep
+    :type max_profiles: int
+    """
+
+    suffix = '.collapsed'
+
+    def __init__(self, directory=PROFILER_DIR,
+                 max_profiles=PROFILER_MAX_PROFILES):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def list(self):
+        try:
+            names = sorted(name for name in os.listdir(self.directory)
+                           if name.endswith(self.suffix))
+        except OSError:
+            names = []
+        return [os.path.join(self.directory, name) for name in names]
+
+    def save(self, samples, *name_parts):
+        """Write profile in collapsed-stack format (flamegraph.pl input)
+
+        :param samples: mapping collapsed stack -> number of samples
+        :type samples: Dict[str, int]
+        :return: path to written profile or None if nothing was written
+        :rtype: str or None
+        """
+
+        if not samples:
+            return None
+
+        parts = [str(time.time_ns())] + [
+            re.sub(r'[^\w.-]+', '-', str(part)) for part in name_parts if part
+        ]
+        filename = os.path.join(self.directory,
+                                '_'.join(parts) + self.suffix)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(filename, 'w') as fd:
+                for stack, count in sorted(samples.items(),
+                                           key=lambda item: -item[1]):
+                    fd.write(f'{stack} {count}\n')
+            for outdated in self.list()[:-self.max_profiles]:
+                os.remove(outdated)
+        except OSError as e:
+            logger.error(f"Couldn't save profile to {self.directory}: {e}")
+            return None
+        return filename
+
+
+profile_store = ProfileStore()
+
+
+def should_profile(headers=None, sample_rate=PROFILER_SAMPLE_RATE,
+                   admin_token=PROFILER_ADMIN_TOKEN):
+    """Decide whether to profile current request (or task)
+
+    Profiling is requested explicitly by `X-Profile` header carrying
+    admin token, or happens randomly for `sample_rate` fraction of calls.
+    """
+
+    if admin_token and headers is not None:
+        token = headers.get(PROFILE_HEADER)
+        if token and hmac.compare_digest(token, admin_token):
+            return True
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def init_app(app):
+    """Profile requests selected by `should_profile`
+
+    Profiles are saved to `profile_store`, their file names
+    contain endpoint name and twilio CallSid (if any).
+    """
+
+    if not (PROFILER_ADMIN_TOKEN or PROFILER_SAMPLE_RATE):
+        return
+
+    from flask import request
+
+    environ_key = 'buzznet.profiler'
+
+    @app.before_request
+    def start_request_profiler():
+        if should_profile(request.headers):
+            request.environ[environ_key] = SamplingProfiler().start()
+
+    @app.teardown_request
+    def save_request_profile(error=None):
+        profiler = request.environ.pop(environ_key, None)
+        if profiler is not None:
+            profile_store.save(profiler.stop(), request.endpoint,
+                               request.values.get('CallSid'))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 5:11:40 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import logging
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from flaskapp.settings import QUERY_BUDGET, QUERY_DUPLICATE_THRESHOLD
+
+
+__all__ = ('QueryStats', 'record_query', 'track_queries', 'init_app')
+
+
+logger = logging.getLogger(__name__)
+
+
+_current_stats = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    """Statistics of SQL statements executed within a request (or task)
+
+    Statements are compared before parameters are substituted,
+    so the same query repeated for different ids (N+1 pattern)
+    is counted as a duplicate.
+    """
+
+    def __init__(self, name='', parent=None):
+        self.name = name
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[sql] += 1
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+
+    def duplicates(self, threshold=2):
+        """Statements executed at least `threshold` times
+
+        :return: mapping sql -> the number of executions
+        :rtype: Dict[str, int]
+        """
+
+        return {sql: count for sql, count in self.statements.items()
+                if count >= threshold}
+
+    def report(self):
+        lines = [f"{self.name or 'block'}: {self.count} queries "
+                 f"in {self.duration * 1000:.1f} ms"]
+        for sql, count in self.statements.most_common():
+            lines.append(f"  {count} x {sql}")
+        return '\n'.join(lines)
+
+
+def record_query(sql, duration):
+    """Account executed statement to the current `track_queries` block
+    (does nothing outside of it)
+    """
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(sql, duration)
+
+
+def check_budget(stats, budget=QUERY_BUDGET,
+                 duplicate_threshold=QUERY_DUPLICATE_THRESHOLD):
+    """Log a warning if `stats` exceed the query budget
+    or contain repeated statements (probably N+1 queries)
+    """
+
+    if budget and stats.count > budget:
+        logger.warning(f"Query budget ({budget}) exceeded by "
+                       f"{stats.name}: {stats.report()}")
+
+    if duplicate_threshold:
+        for sql, count in stats.duplicates(duplicate_threshold).items():
+            logger.warning(f"Possible N+1 queries in {stats.name}: "
+                           f"statement executed {count} times: {sql}")
+
+
+@contextmanager
+def track_queries(name='', budget=QUERY_BUDGET,
+                  duplicate_threshold=QUERY_DUPLICATE_THRESHOLD):
+    """Count statements executed within the block
+
+    Blocks can be nested, statements are accounted to all of them.
+
+    >>> with track_queries('get_next_reminder') as stats:
+    ...     get_next_reminder()
+    >>> stats.count, stats.duration
+    """
+
+    stats = QueryStats(name, parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        check_budget(stats, budget, duplicate_threshold)
+
+
+def init_app(app):
+    """Track queries of every request handled by the flask app
+    """
+
+    from flask import request
+
+    environ_key = 'buzznet.query_stats'
+
+    @app.before_request
+    def start_tracking_queries():
+        stats = QueryStats(request.endpoint, parent=_current_stats.get())
+        request.environ[environ_key] = (stats, _current_stats.set(stats))
+
+    @app.teardown_request
+    def check_query_budget(error=None):
+        stats, token = request.environ.pop(environ_key, (None, None))
+        if stats is not None:
+            # NOTE: teardown could be delayed (e.g. by flask test client
+            # preserving request context), when other block is current
+            if _current_stats.get() is stats:
+                _current_stats.reset(token)
+            check_budget(stats)
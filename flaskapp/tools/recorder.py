@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 5:40:03 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+import os
+import re
+import gzip
+import hmac
+import json
+import time
+import queue
+import atexit
+import hashlib
+import logging
+import threading
+from flaskapp.settings import (TRAFFIC_RECORDER_DIR, TRAFFIC_RECORDER_SALT,
+                               TRAFFIC_RECORDER_FLUSH_INTERVAL)
+
+
+__all__ = ('TrafficRecorder', 'recorder', 'sanitize', 'init_blueprint')
+
+
+logger = logging.getLogger(__name__)
+
+
+# Request fields which always hold phone numbers
+PHONE_FIELDS = {'From', 'To', 'Caller', 'Called', 'ForwardedFrom',
+                'phone', 'phone_number', 'friend', 'operator'}
+
+# Request fields which are never recorded
+SECRET_FIELDS = {'password', 'otp', 'token', 'access_token', 'AuthToken'}
+
+# Any other value looking like E.164 number is hashed as well
+_PHONE_RE = re.compile(r'^\+?\d{10,15}$')
+
+HASH_PREFIX = 'phone:'
+
+
+def hash_phone(value, salt=TRAFFIC_RECORDER_SALT):
+    """Replace phone number with its keyed hash; the same number gives
+    the same hash, so calls of the same user can be told apart in replay
+
+    :param value: phone number in any format
+    :type value: str
+    :rtype: str
+    """
+
+    digits = ''.join(ch for ch in value if ch.isdigit())
+    if not digits:
+        return value
+    digest = hmac.new(salt.encode(), digits.encode(), hashlib.sha256)
+    return HASH_PREFIX + digest.hexdigest()[:16]
+
+
+def sanitize(values, salt=TRAFFIC_RECORDER_SALT):
+    """Hash phone numbers and drop secrets of request args/form
+
+    :param values: request args or form
+    :type values: dict
+    :rtype: dict
+    """
+
+    result = {}
+    for key, value in values.items():
+        if key in SECRET_FIELDS:
+            continue
+        if key in PHONE_FIELDS or _PHONE_RE.match(value.strip()):
+            value = hash_phone(value, salt)
+        result[key] = value
+    return result
+
+
+class TrafficRecorder:
+    """Writes recorded requests (one json per line) to gzipped files,
+    one file per process and day, from a background thread
+
+    :param directory: where to write recordings
+    :type directory: str
+    :param salt: secret for hashing phone numbers
+    :type salt: str
+    """
+
+    def __init__(self, directory=TRAFFIC_RECORDER_DIR,
+                 salt=TRAFFIC_RECORDER_SALT,
+                 flush_interval=TRAFFIC_RECORDER_FLUSH_INTERVAL):
+        self.directory = directory
+        self.salt = salt
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @property
+    def path(self):
+        day = time.strftime('%Y%m%d', time.gmtime())
+        return os.path.join(self.directory,
+                            f'traffic-{day}-{os.getpid()}.ndjson.gz')
+
+    def record(self, started, method, path, args, form, status, duration):
+        """Queue a request for writing
+
+        :param started: unix time the request arrived at
+        :type started: float
+        :param duration: the number of seconds the request took
+        :type duration: float
+        """
+
+        self._queue.put({
+            't': round(started, 6),
+            'method': method,
+            'path': path,
+            'args': sanitize(args, self.salt),
+            'form': sanitize(form, self.salt),
+            'status': status,
+            'duration': round(duration, 6)
+        })
+        if self._thread is None:
+            self._start_thread()
+
+    def _start_thread(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # every flush appends a separate gzip member,
+            # so the file stays readable while being written
+            with gzip.open(self.path, 'at') as fd:
+                for item in batch:
+                    fd.write(json.dumps(item) + '\n')
+        except Exception as e:
+            logger.error(f"Couldn't write {len(batch)} recorded requests: {e}")
+
+
+recorder = TrafficRecorder()
+
+
+def init_blueprint(blueprint):
+    """Record all requests handled by the blueprint
+    (if TRAFFIC_RECORDER_DIR is set); recording is refused without
+    TRAFFIC_RECORDER_SALT, as unsalted hashes of phone numbers are
+    easily reversed
+    """
+
+    if not TRAFFIC_RECORDER_DIR:
+        return
+    if not recorder.salt:
+        logger.error("Traffic isn't recorded: TRAFFIC_RECORDER_SALT "
+                     "is empty, phone numbers can't be hashed safely")
+        return
+
+    from flask import request
+
+    environ_key = 'buzznet.recorder'
+
+    @blueprint.before_request
+    def start_recording():
+        request.environ[environ_key] = (time.time(), time.perf_counter())
+
+    @blueprint.after_request
+    def finish_recording(response):
+        started = request.environ.pop(environ_key, None)
+        if started is not None:
+            recorder.record(started[0], request.method, request.path,
+                            request.args.to_dict(), request.form.to_dict(),
+                            response.status_code,
+                            time.perf_counter() - started[1])
+        return response
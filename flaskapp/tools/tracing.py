@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 1:14:22 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+from flaskapp.settings import (TRACING_EXPORTER, TRACING_FILE,
+                               TRACING_OTLP_ENDPOINT, TRACING_SAMPLE_RATE,
+                               TRACING_SERVICE_NAME, TRACING_FLUSH_INTERVAL)
+
+
+__all__ = ('tracer', 'current_traceparent', 'init_app')
+
+
+logger = logging.getLogger(__name__)
+
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """A single timed operation of a trace
+
+    Identifiers follow W3C trace-context format, so span context
+    can be passed in `traceparent` header (http or celery message).
+    """
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'sampled',
+                 'start', 'end', 'attributes')
+
+    def __init__(self, name, trace_id, parent_id=None, sampled=True,
+                 attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes or {}
+
+    @property
+    def traceparent(self):
+        flags = '01' if self.sampled else '00'
+        return f'00-{self.trace_id}-{self.span_id}-{flags}'
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'end': self.end,
+            'duration': (self.end or time.time()) - self.start,
+            'attributes': self.attributes
+        }
+
+
+def parse_traceparent(value):
+    """Parse W3C `traceparent` header value
+
+    :param value: header value, e.g. 00-<trace id>-<parent id>-01
+    :type value: str
+    :return: (trace_id, parent_id, sampled) or None if value is malformed
+    :rtype: Tuple[str, str, bool] or None
+    """
+
+    try:
+        _, trace_id, parent_id, flags = value.strip().split('-')
+        int(trace_id, 16), int(parent_id, 16)
+        if len(trace_id) != 32 or len(parent_id) != 16:
+            return None
+        return trace_id, parent_id, bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+class BatchSpanExporter:
+    """Base class for exporters which send finished spans in batches
+    from a background thread (so request threads never wait for I/O)
+    """
+
+    def __init__(self, flush_interval=TRACING_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, span):
+        self._queue.put(span)
+        if self._thread is None:
+            self._start_thread()
+
+    def _start_thread(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            try:
+                self.write(batch)
+            except Exception as e:
+                logger.error(f"Couldn't export {len(batch)} spans: {e}")
+
+    def write(self, spans):
+        raise NotImplementedError
+
+
+class FileSpanExporter(BatchSpanExporter):
+    """Append finished spans (one json per line) to a local file"""
+
+    def __init__(self, path=TRACING_FILE, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def write(self, spans):
+        with open(self.path, 'a') as fd:
+            for span in spans:
+                fd.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+
+class OTLPHttpExporter(BatchSpanExporter):
+    """Send finished spans to OTLP/HTTP collector (json encoding)"""
+
+    def __init__(self, endpoint=TRACING_OTLP_ENDPOINT,
+                 service_name=TRACING_SERVICE_NAME, **kwargs):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _span_to_otlp(span):
+        return {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'parentSpanId': span.parent_id or '',
+            'name': span.name,
+            'startTimeUnixNano': int(span.start * 1e9),
+            'endTimeUnixNano': int(span.end * 1e9),
+            'attributes': [
+                {'key': key, 'value': {'stringValue': str(value)}}
+                for key, value in span.attributes.items()
+            ]
+        }
+
+    def write(self, spans):
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [{
+                    'key': 'service.name',
+                    'value': {'stringValue': self.service_name}
+                }]},
+                'scopeSpans': [{
+                    'spans': [self._span_to_otlp(span) for span in spans]
+                }]
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+
+class Tracer:
+    """Creates spans and keeps track of the current one
+
+    A trace is sampled (or not) once, when its root span is created;
+    child spans (and spans continued from `traceparent`) inherit
+    this decision. Spans of not-sampled traces are still created,
+    so trace context is propagated, but they are never exported.
+
+    :param exporter: where to send finished spans, tracing is off if None
+    :type exporter: BatchSpanExporter, optional
+    :param sample_rate: fraction of traces to export, 0..1
+    :type sample_rate: float
+    """
+
+    def __init__(self, exporter=None, sample_rate=TRACING_SAMPLE_RATE):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def start_span(self, name, traceparent=None, **attributes):
+        """Start a new span as a child of current one
+        (or of remote parent defined by `traceparent`)
+
+        :return: tuple (span, token), both should be passed to `finish_span`
+        :rtype: Tuple[Span, contextvars.Token]
+        """
+
+        parent = _current_span.get()
+        remote = parse_traceparent(traceparent) if traceparent else None
+        if remote:
+            trace_id, parent_id, sampled = remote
+        elif parent is not None:
+            trace_id, parent_id, sampled = \
+                parent.trace_id, parent.span_id, parent.sampled
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < self.sample_rate
+
+        span = Span(name, trace_id, parent_id, sampled, attributes)
+        return span, _current_span.set(span)
+
+    def finish_span(self, span, token, error=None):
+        span.end = time.time()
+        if error is not None:
+            span.attributes['error'] = repr(error)
+        _current_span.reset(token)
+        if span.sampled:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name, traceparent=None, **attributes):
+        """Context manager version of `start_span`/`finish_span`
+
+        >>> with tracer.span('gspread get_all_records'):
+        ...     rows = sheet.get_all_records()
+        """
+
+        if not self.enabled:
+            yield None
+            return
+
+        span, token = self.start_span(name, traceparent, **attributes)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.finish_span(span, token, error)
+
+
+def current_traceparent():
+    """Trace context of the current span (to be passed downstream)
+
+    :return: `traceparent` header value or None if there is no active span
+    :rtype: str or None
+    """
+
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+def create_exporter(kind=TRACING_EXPORTER):
+    if kind == 'file':
+        return FileSpanExporter()
+    if kind == 'otlp':
+        return OTLPHttpExporter()
+    if kind:
+        logger.warning(f"Unknown tracing exporter: {kind}; tracing is off.")
+    return None
+
+
+tracer = Tracer(create_exporter())
+
+
+def init_app(app):
+    """Create a root span for every request handled by the flask app
+
+    Trace context is continued if the request has `traceparent` header.
+    """
+
+    if not tracer.enabled:
+        return
+
+    from flask import request
+
+    environ_key = 'buzznet.tracing_span'
+
+    @app.before_request
+    def start_request_span():
+        attributes = {'http.method': request.method,
+                      'http.route': request.endpoint}
+        call_sid = request.values.get('CallSid')
+        if call_sid:
+            attributes['twilio.call_sid'] = call_sid
+        request.environ[environ_key] = tracer.start_span(
+            f'{request.method} {request.endpoint}',
+            traceparent=request.headers.get('traceparent'),
+            **attributes
+        )
+
+    @app.after_request
+    def record_response_status(response):
+        span, _ = request.environ.get(environ_key, (None, None))
+        if span is not None:
+            span.attributes['http.status_code'] = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_span(error=None):
+        span, token = request.environ.pop(environ_key, (None, None))
+        if span is not None:
+            tracer.finish_span(span, token, error)
@@ -38,13 +38,20 @@ import gspread
 from twilio.twiml.voice_response import VoiceResponse
 from oauth2client.service_account import ServiceAccountCredentials
 from twilio.rest import Client
-from flaskapp.settings import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN
+from twilio.http.http_client import TwilioHttpClient
+from urllib.parse import urlparse
+from flaskapp.tools.phones import normalize_phone
+from flaskapp.settings import (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+                               TWILIO_API_URL, GOOGLE_SA_JSON_PATH,
+                               GOOGLE_SHEETS_API_URL)
+from flaskapp.tools.metrics import timed, timer
 
 recipient_list = ['goandtodo@googlegroups.com']
 
 sender_mail = 'heartvoices.org@gmail.com'
 
 
+@timed('sendgrid')
 def send_mail(mail_type, phone, feedback=''):
     """
     Function is used for sending the mail when the user is created and the user gives feedback
@@ -148,13 +155,59 @@ def matchFromDf(dataframe, tz_from, verbose=False):
     return match
 
 
+class TimedTwilioHttpClient(TwilioHttpClient):
+    """Twilio http client which records latency of every API request
+
+    :param api_url: if given, requests are sent to this base url
+                    instead of *.twilio.com (local stand-in)
+    :type api_url: str, optional
+    """
+
+    def __init__(self, api_url='', **kwargs):
+        super().__init__(**kwargs)
+        self.api_url = api_url.rstrip('/')
+
+    def request(self, method, url, *args, **kwargs):
+        parsed = urlparse(url)
+        operation = f"{method.upper()} {parsed.netloc}"
+        if self.api_url:
+            url = self.api_url + url[len(f"{parsed.scheme}://{parsed.netloc}"):]
+        with timer('twilio', operation):
+            return super().request(method, url, *args, **kwargs)
+
+
+def get_twilio_client():
+    """Create Twilio REST client (with latency recording)
+
+    :return: Twilio REST client
+    :rtype: twilio.rest.Client
+    """
+
+    return Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+                  http_client=TimedTwilioHttpClient(api_url=TWILIO_API_URL))
+
+
+def get_gspread_client():
+    """Create gspread client authorized with the service account
+    (or talking to local Sheets API stand-in if GOOGLE_SHEETS_API_URL is set)
+
+    :return: gspread client
+    :rtype: gspread.Client
+    """
+
+    if GOOGLE_SHEETS_API_URL:
+        from loadtest.sheets_client import standin_client
+        return standin_client(GOOGLE_SHEETS_API_URL)
+    return gspread.service_account(filename=GOOGLE_SA_JSON_PATH)
+
+
 def call_duration_from_api(phone):
     """
     The function is used for fetching the call duration for a particular number from the call log API of
     twilio and sum up the duration for the day and return it.
     """
     if phone:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        client = get_twilio_client()
         date = datetime.datetime.today()
         calls = client.calls.list(from_=str(phone),
                                   start_time_after=datetime.datetime(date.year, date.month, date.day, 0, 0, 0))
@@ -189,6 +242,7 @@ def get_txt_from_url(url):
 
 def cleanup_phone_number(phone_number):
     """Remove any punctuation signs from the phone number string
+    (see `flaskapp.tools.phones.normalize_phone`)
 
     :param phone_number: raw phone number
     :type phone_number: str
@@ -197,12 +251,7 @@ def cleanup_phone_number(phone_number):
     :rtype: str
     """
 
-    result = phone_number.replace(' ', '').replace('-', '').replace('+', '')
-    try:
-        int(result)
-    except Exception:
-        raise ValueError(f"Phone number {phone_number} couldn't be cleaned.")
-    return result
+    return normalize_phone(phone_number)
 
 
 def ensure_twilio_voice_response(response):
@@ -25,27 +25,26 @@ Copyright (c) 2021
 """
 
 
-import os
-import gspread
 import datetime
 import json
 from flask import request, jsonify, url_for
 from flask import Response
 from twilio.twiml.voice_response import VoiceResponse, Dial, Gather, Say
-from twilio.rest import Client
-from oauth2client.service_account import ServiceAccountCredentials
 from flaskapp.views.authenticate import is_user_authenticated
 from playhouse.shortcuts import model_to_dict
 from flaskapp.core.ivr_core import (google_search, save_new_user, save_data,
                                     is_user_new, update_reminder)
-from flaskapp.models.ivr_models import PhoneNumber, User, SmartReminder, Reminder
+from flaskapp.models.ivr_models import (User, PhoneNumber, SmartReminder,
+                                       Reminder)
+from flaskapp.models.routing import storage_router
 from flaskapp.tools.utils import (send_mail, matchFromDf, TimeZoneHelper,
                                   getTemporaryUserData, get_txt_from_url,
-                                  cleanup_phone_number)
-from flaskapp.models.storages import gs_users_existing, gs_health_metric_data
+                                  cleanup_phone_number, get_twilio_client,
+                                  get_gspread_client)
+from flaskapp.tools.phones import e164, find_phone_row
+from flaskapp.models.storages import gs_health_metric_data
 
-from flaskapp.settings import (ORDINAL_NUMBERS, TWILIO_OPT_PHONE_NUMBER,
-                               GOOGLE_SA_JSON_PATH)
+from flaskapp.settings import ORDINAL_NUMBERS, TWILIO_OPT_PHONE_NUMBER
 from flaskapp.dialogs import THANKS_FOR_JOIN, WELCOME_GREETING, GOOD_BYE
 
 try:
@@ -99,50 +98,24 @@ def after_call():
 
 
 def get_username():
-    """ Function for getting Name of the Client from google spreadsheet """
+    """ Function for getting Name of the Client (from the storage
+    configured by STORAGE_ROUTES setting, see flaskapp/models/routing.py)
+    """
 
     request_values = request.values
     phone_number = cleanup_phone_number(request_values.get('phone'))
-
-    # TODO: gs-support should be dropped
-    rows = gs_users_existing.get_all_records()
-    for row in rows:
-        # FIXME: WE have different names 'phone' and 'Phone Number' (bad)
-        tel = cleanup_phone_number(row.get('Phone Number'))
-        if phone_number == tel:
-            x = {"username": row.get('username')}
-
-    user = PhoneNumber.select().join(User).where(
-        PhoneNumber.number == phone_number
-    )
-
-    # FIXME: data from postgres have precedence
-    # should be removed when gs-support will be dropped
-    return jsonify(user.username or x)
+    return jsonify({"username": storage_router.read('username', phone_number)})
 
 
 def get_client_type():
-    """ Function for checking Type of the Client from google spreadsheet
-    (Client, Volunteer, Client and Volunteer, QA Engineer
+    """ Function for checking Type of the Client
+    (Client, Volunteer, Client and Volunteer, QA Engineer);
+    the storage is configured by STORAGE_ROUTES setting
     """
 
     request_values = request.values
     phone_number = cleanup_phone_number(request_values.get('phone'))
-
-    # TODO: gs-support should be dropped
-    rows = gs_users_existing.get_all_records()
-    for row in rows:
-        # FIXME: WE have different names 'phone' and 'Phone Number' (bad)
-        tel = cleanup_phone_number(row.get('Phone Number'))
-        if phone_number == tel:
-            x = {"type": row.get('type')}
-
-    user = PhoneNumber.select().join(User).where(
-        PhoneNumber.number == phone_number
-    )
-
-    # FIXME: should be changed when gs-support will be dropped
-    return jsonify(user.type or x)
+    return jsonify({"type": storage_router.read('client_type', phone_number)})
 
 
 def save_client_type():
@@ -175,9 +148,7 @@ def call_to_friend():
     phone = req.get('phone')
 
     # GET username from SPREDASHEET
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_SA_JSON_PATH, scope)
-    client = gspread.authorize(creds)
+    client = get_gspread_client()
 
     spreadsheetName = "Users"
     sheetName = "Existing"
@@ -185,12 +156,8 @@ def call_to_friend():
     spreadsheet = client.open(spreadsheetName)
     sheet = spreadsheet.worksheet(sheetName)
 
-    rows = sheet.get_all_records()
-    x = {}
-    for row in rows:
-        tel = row.get('Phone Number')
-        if phone == f'+{tel}':
-            x = {f"friend": row.get('friend')}
+    row = find_phone_row(sheet.get_all_records(), phone) or {}
+    x = {"friend": row.get('friend')} if row else {}
     return (jsonify(x))
 
 
@@ -209,7 +176,7 @@ def find_friend_timezone():
     match = matchFromDf(dataframe, tz_from)
 
     # now that we have match, forward call to match
-    formatMatch = "+" + str(match)
+    formatMatch = e164(match)
     resp.say(
         "Connecting you to a friend. Please stay on the line."
     )
@@ -233,9 +200,7 @@ def call_to_operator():
     phone = req.get('phone')
 
     # GET username from SPREDASHEET
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_SA_JSON_PATH, scope)
-    client = gspread.authorize(creds)
+    client = get_gspread_client()
 
     spreadsheetName = "Users"
     sheetName = "Existing"
@@ -243,12 +208,8 @@ def call_to_operator():
     spreadsheet = client.open(spreadsheetName)
     sheet = spreadsheet.worksheet(sheetName)
 
-    rows = sheet.get_all_records()
-    x = {}
-    for row in rows:
-        tel = row.get('Phone Number')
-        if phone == f'+{tel}':
-            x = {'operator': row.get('operator')}
+    row = find_phone_row(sheet.get_all_records(), phone) or {}
+    x = {'operator': row.get('operator')} if row else {}
     return jsonify(x)
 
 
@@ -262,9 +223,7 @@ def save_blood_pressure():
     DOWN = ''.join(e for e in req.get('DOWN') if e.isalnum())
 
     # GET username from SPREDASHEET
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_SA_JSON_PATH, scope)
-    client = gspread.authorize(creds)
+    client = get_gspread_client()
     spreadsheetName = "health_metrics"
     sheetName = "blood_pressure"
     spreadsheet = client.open(spreadsheetName)
@@ -288,17 +247,13 @@ def save_feedback_service():
     if req.get('phone'):
         phone = req.get('phone')
     else:
-        account_sid = os.environ['TWILIO_ACCOUNT_SID']
-        auth_token = os.environ['TWILIO_AUTH_TOKEN']
-        client = Client(account_sid, auth_token)
+        client = get_twilio_client()
         call = client.calls(req.get('CallSid')).fetch()
         phone = call.from_
         REurl = req.get('RecordingUrl')
 
     # GET username from SPREDASHEET
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_SA_JSON_PATH, scope)
-    client = gspread.authorize(creds)
+    client = get_gspread_client()
     spreadsheetName = "feedback"
     sheetName = "service"
     spreadsheet = client.open(spreadsheetName)
@@ -317,9 +272,7 @@ def save_feedback():
         # GET username from SPREDASHEET
         phone = request.args.get('phone')
         msg = request.args.get('msg')
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_SA_JSON_PATH, scope)
-        client = gspread.authorize(creds)
+        client = get_gspread_client()
         spreadsheetName = "feedback"
         sheetName = "service"
         spreadsheet = client.open(spreadsheetName)
@@ -358,30 +311,27 @@ def search_via_google():
 
 
 def get_next_reminder():
-    req = request.values
-    phone = req.get('phone')
-    tel = str(phone[1:15])  # exclude +
-
-    # conn.connect()
-    # get User ID by the phone
-    pat = User.get(User.phone == tel)
-    print(pat.id, pat.phone)
+    """ Returns text of the user's reminder with the earliest next time
+    and schedules its next repetition (see `update_reminder`);
+    the reminder is read with one query, whatever the number of them
+    """
 
-    # get SmartReminders by User ID
-    # smr = SmartReminder.get(SmartReminder.id==pat.id)
-    query = SmartReminder.select().where(SmartReminder.patient_id == pat.id).order_by(SmartReminder.next_time).limit(1)
-    smr_selected = query.dicts().execute()
+    phone_number = cleanup_phone_number(request.values.get('phone'))
+    smart_reminder = (SmartReminder
+                      .select(SmartReminder, Reminder)
+                      .join(Reminder)
+                      .switch(SmartReminder)
+                      .join(PhoneNumber,
+                            on=(PhoneNumber.user == SmartReminder.user))
+                      .where(PhoneNumber.number == phone_number)
+                      .order_by(SmartReminder.next_time)
+                      .first())
 
     result = ''
-    # get reminder text by SmartReminder ID
-    for s in smr_selected:
-        rm = Reminder.get(Reminder.id == s['reminder_id'])
-        result = rm.text
-        print(rm.text)
+    if smart_reminder is not None:
+        result = smart_reminder.reminder.text
         # change next time of reminding
-        update_reminder(s['reminder_id'])
-        conn.commit()
-    conn.close()
+        update_reminder(smart_reminder.id)
     return jsonify(
         {
             "text":
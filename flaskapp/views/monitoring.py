@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 10:31:05 am
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+from flask import Response
+from flaskapp.tools.metrics import registry
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def get_metrics():
+    """Expose latency histograms collected by all worker processes
+    in Prometheus text format
+
+    :return: Flask response object with text/plain mimetype
+    :rtype: Flask Response object
+    """
+
+    return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+This file is a part of heartvoices.org project.
+
+The software embedded in or related to heartvoices.org
+is provided under a some-rights-reserved license. This means
+that Users are granted broad rights, including but not limited
+to the rights to use, execute, copy or distribute the software,
+to the extent determined by such license. The terms of such
+license shall always prevail upon conflicting, divergent or
+inconsistent provisions of these Terms. In particular, heartvoices.org
+and/or the software thereto related are provided under a GNU GPLv3 license,
+allowing Users to access and use the software’s source code.
+Terms and conditions: https://www.goandtodo.org/terms-and-conditions
+
+Created Date: Monday October 19th 2026
+Author: GO and to DO Inc
+E-mail: heartvoices.org@gmail.com
+-----
+Last Modified: Monday, October 19th 2026, 10:27:09 pm
+Modified By: GO and to DO Inc
+-----
+Copyright (c) 2026
+"""
+
+
+
+
+import hmac
+from flask import request, abort, jsonify
+from flaskapp.core.user_import import (CSV, NDJSON, read_users, import_users,
+                                       summarize)
+from flaskapp.settings import USERS_IMPORT_TOKEN
+
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl',
+                    'application/json')
+
+
+def import_users_view():
+    """Create users from CSV (with header) or NDJSON file: the request
+    body or `file` of multipart form; `?dry_run=1` validates it only.
+
+    Requests should have `X-Admin-Token: <USERS_IMPORT_TOKEN>` header.
+
+    :return: the number of rows of every status and the result
+             of every row (see `flaskapp.core.user_import.import_users`)
+    :rtype: Flask Response object
+    """
+
+    token = request.headers.get('X-Admin-Token', '')
+    if not (USERS_IMPORT_TOKEN and
+            hmac.compare_digest(token, USERS_IMPORT_TOKEN)):
+        abort(403, 'Invalid admin token')
+
+    upload = request.files.get('file')
+    if upload is not None:
+        data, mimetype = upload.read(), upload.mimetype
+        filename = upload.filename or ''
+    else:
+        data, mimetype, filename = request.get_data(), request.mimetype, ''
+    fmt = NDJSON if mimetype in NDJSON_MIMETYPES or \
+        filename.endswith(('.ndjson', '.jsonl')) else CSV
+    try:
+        rows = read_users(data, fmt)
+    except ValueError as e:
+        abort(400, e)
+
+    report = import_users(rows, dry_run=request.args.get('dry_run') in
+                          ('1', 'true'))
+    report = report.astype(object).where(report.notna(), None)
+    return jsonify({'summary': summarize(report),
+                    'rows': report.to_dict('records')})
@@ -0,0 +1,242 @@
+""" Bulk loading of DataFrames with COPY ... FROM STDIN (postgres only)
+
+Columns are encoded chunk by chunk with numpy (no per-row python tuples)
+into COPY binary format (default) or CSV, and streamed to the server
+through a file-like object, so only one chunk is in memory at a time:
+
+    >>> load_dataframe(engine, 'Existing', df, dtype={'weight': sa.Float})
+
+Binary format needs a native encoder for every column type (see
+`ENCODERS`); other types (e.g. Numeric, JSON) can be loaded as CSV.
+"""
+import csv
+import io
+import logging
+import struct
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+from .incremental import column_type
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 50000
+
+COPY_BUFFER = 1 << 20  # bytes sent to the server at once
+
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+BINARY_TRAILER = struct.pack('>h', -1)
+
+NULL = '\\N'
+
+PG_EPOCH = np.datetime64('2000-01-01', 'us')
+
+
+def _fixed(dtype):
+    """ Encoder of a fixed-width big-endian type """
+    def encode(values):
+        null = values.isna().to_numpy()
+        data = values.to_numpy(dtype='float64' if dtype[1] == 'f' else
+                               'int64', na_value=0).astype(dtype)
+        return _cells(data, null)
+    return encode
+
+
+def _cells(data, null):
+    """ (bytes of every cell as uint8 matrix, null mask) """
+    return data.view(np.uint8).reshape(len(data), -1), null
+
+
+def _encode_bool(values):
+    null = values.isna().to_numpy()
+    data = values.fillna(False).astype(bool).to_numpy().astype('u1')
+    return _cells(data, null)
+
+
+def _encode_timestamp(values):
+    times = pd.to_datetime(values)
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    null = times.isna().to_numpy()
+    micros = (times.to_numpy(dtype='datetime64[us]') - PG_EPOCH)
+    data = np.where(null, 0, micros.astype('int64')).astype('>i8')
+    return _cells(data, null)
+
+
+def _encode_date(values):
+    days = pd.to_datetime(values).to_numpy(dtype='datetime64[D]')
+    null = np.isnat(days)
+    offset = (days - PG_EPOCH.astype('datetime64[D]')).astype('int64')
+    return _cells(np.where(null, 0, offset).astype('>i4'), null)
+
+
+def _encode_text(values):
+    """ Variable-width cells: (utf-8 bytes of the column, lengths, null) """
+    null = values.isna().to_numpy()
+    encoded = values.where(~null, '').astype(str).str.encode('utf-8')
+    lengths = encoded.str.len().to_numpy(dtype='int64')
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), lengths, null
+
+
+# sqlalchemy type -> binary encoder (subclasses first)
+ENCODERS = [
+    (sa.Boolean, _encode_bool),
+    (sa.BigInteger, _fixed('>i8')),
+    (sa.SmallInteger, _fixed('>i2')),
+    (sa.Integer, _fixed('>i4')),
+    (sa.REAL, _fixed('>f4')),
+    (sa.Float, _fixed('>f8')),
+    (sa.DateTime, _encode_timestamp),
+    (sa.Date, _encode_date),
+    (sa.String, _encode_text),
+]
+
+
+def encoder(sql_type):
+    for base, encode in ENCODERS:
+        if isinstance(sql_type, base):
+            return encode
+    raise TypeError(f'{sql_type} has no binary COPY encoder, use csv format')
+
+
+def encode_binary(df, types):
+    """ Rows of the chunk in COPY binary format (without header) """
+    rows = len(df)
+    columns = []
+    sizes = np.full(rows, 2, dtype=np.int64)  # int16 field count
+    for name, sql_type in types.items():
+        cells = encoder(sql_type)(df[name])
+        if len(cells) == 2:  # fixed width
+            data, null = cells
+            lengths = np.where(null, 0, data.shape[1])
+        else:
+            data, lengths, null = cells
+        sizes += 4 + lengths
+        columns.append((data, lengths, null))
+
+    ends = np.cumsum(sizes)
+    out = np.zeros(int(ends[-1]) if rows else 0, dtype=np.uint8)
+    position = ends - sizes
+    out[position[:, None] + np.arange(2)] = \
+        np.frombuffer(struct.pack('>h', len(types)), dtype=np.uint8)
+    position = position + 2
+    for data, lengths, null in columns:
+        header = np.where(null, -1, lengths).astype('>i4')
+        out[position[:, None] + np.arange(4)] = _cells(header, null)[0]
+        position = position + 4
+        if data.ndim == 2:  # fixed width: null cells are skipped
+            valid = ~null
+            out[position[valid, None] + np.arange(data.shape[1])] = \
+                data[valid]
+        elif len(data):
+            starts = np.cumsum(lengths) - lengths
+            out[np.repeat(position - starts, lengths) +
+                np.arange(len(data))] = data
+        position = position + lengths
+    return out.tobytes()
+
+
+def encode_csv(df):
+    buffer = io.StringIO()
+    df.to_csv(buffer, header=False, index=False, na_rep=NULL,
+              quoting=csv.QUOTE_MINIMAL, date_format='%Y-%m-%d %H:%M:%S.%f')
+    return buffer.getvalue().encode('utf-8')
+
+
+class CopyStream(io.RawIOBase):
+    """ File-like object encoding the DataFrame chunk by chunk
+        as COPY reads it """
+
+    def __init__(self, df, types, format='binary', chunk_rows=CHUNK_ROWS):
+        self.rows = len(df)
+        self._chunks = self._encode(df, types, format, chunk_rows)
+        self._chunk = memoryview(b'')
+
+    @staticmethod
+    def _encode(df, types, format, chunk_rows):
+        if format == 'binary':
+            yield BINARY_HEADER
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            if format == 'binary':
+                yield encode_binary(chunk, types)
+            else:
+                yield encode_csv(chunk[list(types)])
+        if format == 'binary':
+            yield BINARY_TRAILER
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        parts = []
+        while size:
+            if not self._chunk:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._chunk = memoryview(chunk)
+            part = self._chunk if size < 0 else self._chunk[:size]
+            self._chunk = self._chunk[len(part):]
+            parts.append(part)
+            size = size - len(part) if size > 0 else size
+        return b''.join(parts)
+
+
+def copy_statement(conn, table, format='binary'):
+    preparer = conn.dialect.identifier_preparer
+    columns = ', '.join(preparer.quote(column.name)
+                        for column in table.columns)
+    options = 'FORMAT binary' if format == 'binary' else \
+        f"FORMAT csv, NULL '{NULL}'"
+    return f'COPY {preparer.format_table(table)} ({columns}) ' \
+        f'FROM STDIN WITH ({options})'
+
+
+def copy_dataframe(conn, table, df, format='binary', chunk_rows=CHUNK_ROWS):
+    """ Copies DataFrame rows into existing table (sqlalchemy Table,
+        its columns define the column order and binary encoding) """
+    if format not in ('binary', 'csv'):
+        raise ValueError(f'Unknown COPY format: {format}')
+    if conn.dialect.name != 'postgresql':
+        raise NotImplementedError('COPY is supported by postgres only')
+    types = {column.name: column.type for column in table.columns}
+    stream = CopyStream(df, types, format, chunk_rows)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(copy_statement(conn, table, format), stream,
+                           size=COPY_BUFFER)
+    finally:
+        cursor.close()
+    return stream.rows
+
+
+def table_for(table_name, df, dtype=None):
+    """ sqlalchemy Table for the DataFrame; `dtype` overrides
+        types of some columns (as in DataFrame.to_sql) """
+    dtype = dtype or {}
+    return sa.Table(table_name, sa.MetaData(),
+                    *[sa.Column(name, dtype.get(name) or column_type(kind))
+                      for name, kind in df.dtypes.items()])
+
+
+def load_dataframe(engine, table_name, df, format='binary', dtype=None,
+                   if_exists='replace', chunk_rows=CHUNK_ROWS):
+    """ Faster replacement of `df.to_sql(table_name, engine,
+        if_exists=..., index=False, dtype=dtype)` """
+    table = table_for(table_name, df, dtype)
+    with engine.begin() as conn:
+        exists = sa.inspect(conn).has_table(table_name)
+        if exists and if_exists == 'fail':
+            raise ValueError(f'Table {table_name} already exists')
+        if exists and if_exists == 'replace':
+            table.drop(conn)
+        if not exists or if_exists == 'replace':
+            table.create(conn)
+        else:
+            table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+        rows = copy_dataframe(conn, table, df, format, chunk_rows)
+    logger.info(f'{rows} rows copied to {table_name}')
+    return rows
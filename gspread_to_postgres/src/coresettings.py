@@ -33,6 +33,40 @@ def perform_sp_check(dic):
     if not isinstance(dic.get("credential_path"),str):
         msg = "Invallid path provided"
         raise WrongSettings(msg)
+    if dic.get("sync_mode", "replace") not in ("incremental", "replace"):
+        msg = "sync_mode should be 'incremental' or 'replace'"
+        raise WrongSettings(msg)
+    if dic.get("copy_format") not in (None, "binary", "csv"):
+        msg = "copy_format should be 'binary', 'csv' or None"
+        raise WrongSettings(msg)
+    if not isinstance(dic.get("snapshots_to_keep", 1), int) or dic.get("snapshots_to_keep", 1) < 0:
+        msg = "snapshots_to_keep should be a non-negative number"
+        raise WrongSettings(msg)
+    if dic.get("page_rows") is not None and (not isinstance(dic.get("page_rows"), int) or dic.get("page_rows") < 1):
+        msg = "page_rows should be a positive number or None"
+        raise WrongSettings(msg)
+    if not isinstance(dic.get("api_requests_per_minute", 60), (int, float)) or dic.get("api_requests_per_minute", 60) <= 0:
+        msg = "api_requests_per_minute should be a positive number"
+        raise WrongSettings(msg)
+    if not isinstance(dic.get("api_retries", 5), int) or dic.get("api_retries", 5) < 0:
+        msg = "api_retries should be a non-negative number"
+        raise WrongSettings(msg)
+    if not isinstance(dic.get("key_columns", {}), dict):
+        msg = "key_columns should be a dict: worksheet -> list of columns"
+        raise WrongSettings(msg)
+    column_types = dic.get("column_types", {})
+    if not isinstance(column_types, dict) or not all(isinstance(types, dict) for types in column_types.values()):
+        msg = "column_types should be a dict: worksheet -> {column: type}"
+        raise WrongSettings(msg)
+    from .schema import SQL_TYPES
+    for worksheet, types in column_types.items():
+        if set(types.values()) - set(SQL_TYPES):
+            msg = f"column_types of {worksheet} should be one of {', '.join(SQL_TYPES)}"
+            raise WrongSettings(msg)
+    primary_keys = dic.get("primary_keys", {})
+    if not isinstance(primary_keys, dict) or not all(isinstance(columns, (list, tuple)) for columns in primary_keys.values()):
+        msg = "primary_keys should be a dict: worksheet -> list of columns"
+        raise WrongSettings(msg)
     return True
 
 
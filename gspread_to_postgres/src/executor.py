@@ -0,0 +1,246 @@
+""" Worker pool of gspread_to_postgres
+
+* worksheets are synced by a bounded thread pool, every thread has its
+  own GoogleSheetHelper (gspread client and its http session);
+* all API requests share a token bucket refilled at Sheets API quota
+  (`api_requests_per_minute` in settings);
+* requests failed with 429/5xx or a connection error are retried with
+  exponential backoff and full jitter (Retry-After is respected);
+* failures are collected and raised by `run` as SyncError when all
+  worksheets are done; on KeyboardInterrupt (or `stop`) queued
+  worksheets are cancelled and sleeping retries are woken up;
+* progress and timing of every worksheet are logged and returned.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import gspread
+import requests
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class SyncError(Exception):
+    """ Some worksheets failed; `errors` is worksheet -> exception """
+
+    def __init__(self, errors):
+        self.errors = errors
+        details = '; '.join(f'{worksheet}: {error!r}'
+                            for worksheet, error in errors.items())
+        super().__init__(f'{len(errors)} worksheets failed: {details}')
+
+
+class Cancelled(Exception):
+    pass
+
+
+class TokenBucket:
+    """ Thread-safe token bucket: `rate` tokens per second,
+        at most `capacity` tokens saved up """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic,
+                 stopped=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.clock = clock
+        self.stopped = stopped or threading.Event()
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _wait_time(self, tokens):
+        now = self.clock()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """ Blocks until tokens are available; returns seconds waited """
+        waited = 0.0
+        while True:
+            with self.lock:
+                delay = self._wait_time(tokens)
+            if not delay:
+                return waited
+            if self.stopped.wait(delay):
+                raise Cancelled('Sync is stopped')
+            waited += delay
+
+
+class RequestStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0.0  # seconds waited for the bucket
+
+
+class RetryingRequests:
+    """ Replacement of `gspread.Client.request`: takes a token from
+        the bucket before every request, retries transient errors """
+
+    def __init__(self, request, bucket, retries=5, backoff=1.0,
+                 max_backoff=60.0):
+        self.request = request
+        self.bucket = bucket
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = RequestStats()
+
+    def delay(self, attempt, error):
+        delay = random.uniform(0, min(self.max_backoff,
+                                      self.backoff * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('Retry-After') \
+            if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def __call__(self, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self.stats.throttled += self.bucket.acquire()
+            self.stats.calls += 1
+            try:
+                return self.request(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                if e.response.status_code not in RETRY_STATUSES or \
+                        attempt == self.retries:
+                    raise
+                error = e
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                error = e
+            delay = self.delay(attempt, error)
+            self.stats.retries += 1
+            logger.warning(f'Sheets API request failed ({error}), '
+                           f'retry {attempt + 1} in {delay:.1f}s')
+            if self.bucket.stopped.wait(delay):
+                raise Cancelled('Sync is stopped')
+
+
+class Progress:
+    """ Per-worksheet status and timing """
+
+    def __init__(self, worksheets):
+        self.total = len(worksheets)
+        self.items = {worksheet: {'status': 'queued'}
+                      for worksheet in worksheets}
+        self.lock = threading.Lock()
+
+    def update(self, worksheet, **fields):
+        with self.lock:
+            self.items[worksheet].update(fields)
+            if 'seconds' in fields:
+                finished = sum(item['status'] in ('done', 'failed')
+                               for item in self.items.values())
+                logger.info(f'[{finished}/{self.total}] {worksheet} '
+                            f'{fields["status"]} in '
+                            f'{fields["seconds"]:.1f}s')
+
+    def report(self):
+        with self.lock:
+            return {worksheet: dict(item)
+                    for worksheet, item in self.items.items()}
+
+
+class SheetExecutor:
+    """ Runs `job(helper, worksheet)` for every worksheet
+
+        :param make_helper: function(request_wrapper) -> GoogleSheetHelper,
+                            called once per thread
+        :param requests_per_minute: Sheets API quota shared by threads
+    """
+
+    def __init__(self, make_helper, job, max_workers=5,
+                 requests_per_minute=60, retries=5, backoff=1.0,
+                 max_backoff=60.0):
+        self.make_helper = make_helper
+        self.job = job
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stopped = threading.Event()
+        self.bucket = TokenBucket(requests_per_minute / 60.0,
+                                  stopped=self.stopped)
+        self.local = threading.local()
+
+    def wrap_request(self, request):
+        """ Throttles and retries requests of a gspread client """
+        self.local.requests = RetryingRequests(
+            request, self.bucket, self.retries, self.backoff,
+            self.max_backoff)
+        return self.local.requests
+
+    def helper(self):
+        """ GoogleSheetHelper of the current thread """
+        helper = getattr(self.local, 'helper', None)
+        if helper is None:
+            helper = self.local.helper = self.make_helper(self.wrap_request)
+        return helper
+
+    def _run_one(self, worksheet, progress):
+        if self.stopped.is_set():
+            raise Cancelled('Sync is stopped')
+        started = time.perf_counter()
+        progress.update(worksheet, status='running')
+        helper = self.helper()
+        stats = self.local.requests.stats = RequestStats()
+        try:
+            result = self.job(helper, worksheet)
+        except BaseException:
+            progress.update(worksheet, status='failed',
+                            seconds=time.perf_counter() - started,
+                            requests=stats.calls, retries=stats.retries)
+            raise
+        progress.update(worksheet, status='done', result=result,
+                        seconds=time.perf_counter() - started,
+                        requests=stats.calls, retries=stats.retries,
+                        throttled=round(stats.throttled, 3))
+        return result
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self, worksheets):
+        """ Syncs worksheets; returns progress report (worksheet ->
+            status, seconds, requests, retries, result of the job),
+            raises SyncError if any of them failed """
+        progress = Progress(worksheets)
+        errors = {}
+        pool = ThreadPoolExecutor(self.max_workers,
+                                  thread_name_prefix='gspread-sync')
+        try:
+            futures = {pool.submit(self._run_one, worksheet, progress):
+                       worksheet for worksheet in worksheets}
+            for future in as_completed(futures):
+                worksheet = futures[future]
+                error = future.exception()
+                if error is not None:
+                    logger.error(f'{worksheet} failed: {error!r}')
+                    errors[worksheet] = error
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        report = progress.report()
+        logger.info('Sync report: %s', {
+            worksheet: {key: value for key, value in item.items()
+                        if key != 'result'}
+            for worksheet, item in report.items()})
+        if errors:
+            raise SyncError(errors)
+        return report
+
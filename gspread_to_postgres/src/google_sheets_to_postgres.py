@@ -6,38 +6,49 @@ import sqlalchemy as sa
 from sqlalchemy.engine import make_url
 # from sqlalchemy.types import Integer, Text, String, DateTime
 import datetime
+import logging
 
-from threading import Thread 
-from queue import Queue
+from .incremental import sync_worksheet, SyncReport, metadata as sync_metadata
+from .swap import load_and_swap, collector
+from .streaming import iter_chunks, typed_pages
+from .schema import Schema, metadata as schema_metadata
+from .executor import SheetExecutor
+
+logger = logging.getLogger(__name__)
 
-class Worker(Thread):
-    def __init__(self ,queue = None,*args,**kw):
-        self.callback = kw.get('target',None)
-        self.queue = queue
-        super().__init__(*args,**kw)
-    
-    def run(self):
-        while True:
-            engine,main_sheet,wrksht =  self.queue.get()
-            self.callback(engine,main_sheet,wrksht)
-            self.queue.task_done()
 
 class GoogleSheetHelper:
     """Helper class to pull data from googlesheets"""
-    def __init__(self, cred_json, spreadsheetName):
+    def __init__(self, cred_json, spreadsheetName, api_url='', request_wrapper=None):
         self.scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
         self.cred_json = cred_json
         self.spreadsheetName = spreadsheetName
-        self.creds = ServiceAccountCredentials.from_json_keyfile_name(self.cred_json, self.scope)
-        self.client = gspread.authorize(self.creds)
+        if api_url:
+            # local Sheets API stand-in (load testing)
+            from loadtest.sheets_client import standin_client
+            self.client = standin_client(api_url)
+        else:
+            self.creds = ServiceAccountCredentials.from_json_keyfile_name(self.cred_json, self.scope)
+            self.client = gspread.authorize(self.creds)
+        if request_wrapper:
+            # throttling and retries of API requests, see executor.py
+            self.client.request = request_wrapper(self.client.request)
         self.spreadsheet = self.client.open(self.spreadsheetName)
 
-    def getDataframe(self,worksheet):
-        """Returns all rows data from sheet as dataframe"""
+    def getDataframe(self,worksheet,raw=False):
+        """Returns all rows data from sheet as dataframe
+           (cells as strings if `raw`, to be cast by schema.Schema)"""
         sheet = self.spreadsheet.worksheet(worksheet)
-        rows = sheet.get_all_records()
+        if raw:
+            rows = sheet.get_all_records(numericise_ignore=['all'])
+        else:
+            rows = sheet.get_all_records()
         return pd.DataFrame(rows)
 
+    def iterDataframes(self, worksheet, page_rows, schema=None):
+        """Yields typed dataframe chunks of `page_rows` rows (see streaming.py)"""
+        return iter_chunks(self.spreadsheet, worksheet, page_rows, schema=schema)
+
     def getAllWorksheet(self):
         # spreadsheet = self.client.open(self.spreadsheetName)
         return [s.title for s in self.spreadsheet.worksheets()] 
@@ -82,21 +93,28 @@ def create_db_if_not_exists(url:str,dbname:str):
             con.execute(sql)
 
 
-def create_table(engine,main_sheet,wrksht):
-    """ Function thats actualy takes the Database and creates a entry inside the postgresSQL server"""
+def create_table(engine,main_sheet,wrksht,copy_format=None,key_columns=None,snapshots_to_keep=1,page_rows=None,schema=None):
+    """ Function thats actualy takes the Database and creates a entry inside the postgresSQL server
+        (loaded into a staging table and swapped in, see swap.py; with COPY
+        if `copy_format` is 'binary' or 'csv', see copy_loader.py;
+        page by page if `page_rows` is set, see streaming.py; columns
+        are cast to the types of `schema`, see schema.py) """
 
-    df = main_sheet.getDataframe(wrksht)
     table_name = wrksht
     current_utc = datetime.datetime.utcnow()
-    df["CreatedUTC"] = current_utc
-    df.to_sql(
-        table_name,
-        engine,
-        if_exists='replace',
-        index=False,
-        chunksize=500,
-    )
-    return True
+    schema = schema or Schema(table_name)
+    if page_rows:
+        chunks = main_sheet.iterDataframes(wrksht, page_rows, schema)
+    else:
+        df = main_sheet.getDataframe(wrksht, raw=True)
+        chunks = typed_pages([df] if len(df.columns) else [], schema)
+    chunks = (chunk.assign(CreatedUTC=current_utc) for chunk in chunks)
+    key_columns = key_columns or schema.primary_key
+    indexes = [(key_columns, False)] if key_columns else []
+    return load_and_swap(engine,
+                         lambda first: schema.table(table_name, {"CreatedUTC": sa.DateTime()}),
+                         chunks, copy_format, indexes, snapshots_to_keep,
+                         schema.save)
 
     
 def execute(max_worker = 5):
@@ -121,25 +139,49 @@ def execute(max_worker = 5):
     
     engine = sa.create_engine(url_with_db, echo=False)
 
-    main_sheet = GoogleSheetHelper(sp_config.credential_path, sp_config.spreadsheet_name)
+    sync_mode = sp_config.__dict__.get('sync_mode', 'replace')
+    key_columns = sp_config.__dict__.get('key_columns') or {}
+    copy_format = sp_config.__dict__.get('copy_format')
+    snapshots_to_keep = sp_config.__dict__.get('snapshots_to_keep', 1)
+    page_rows = sp_config.__dict__.get('page_rows')
+    column_types = sp_config.__dict__.get('column_types') or {}
+    primary_keys = sp_config.__dict__.get('primary_keys') or {}
+
+    def make_helper(request_wrapper):
+        return GoogleSheetHelper(sp_config.credential_path, sp_config.spreadsheet_name,
+                                 sp_config.__dict__.get('api_url', ''), request_wrapper)
+
+    def sync(main_sheet, wrksht):
+        schema = Schema.load(engine, wrksht, column_types.get(wrksht),
+                             primary_keys.get(wrksht, []))
+        if sync_mode == 'incremental':
+            return sync_worksheet(engine, main_sheet, wrksht,
+                                  key_columns.get(wrksht),
+                                  copy_format, snapshots_to_keep, schema,
+                                  page_rows)
+        return create_table(engine, main_sheet, wrksht, copy_format,
+                            key_columns.get(wrksht), snapshots_to_keep,
+                            page_rows, schema)
+
+    executor = SheetExecutor(make_helper, sync, max_worker,
+                             sp_config.__dict__.get('api_requests_per_minute', 60),
+                             sp_config.__dict__.get('api_retries', 5))
 
     if sp_config.backup_all_worksheets:
-        wrksheet_list = main_sheet.getAllWorksheet()
+        wrksheet_list = executor.helper().getAllWorksheet()
     else:
         wrksheet_list =  sp_config.worksheet_to_consider
 
-    qu = Queue()  
-    threadlist = []
-    for _ in range(max_worker):
-        t = Worker(queue=qu,target=create_table,daemon=True)
-        t.start()
-        # threadlist.append(t)
-
-    for wrksht in wrksheet_list:
-        # create_table(engine,main_sheet,wrksht)
-        qu.put((engine,main_sheet,wrksht))
-    qu.join()
-
-        
-    
-        
\ No newline at end of file
+    schema_metadata.create_all(engine)  # once, not by every worker
+    if sync_mode == 'incremental':
+        sync_metadata.create_all(engine)
+    try:
+        report = executor.run(wrksheet_list)
+    finally:
+        collector.join(timeout=60)  # old tables are dropped in background
+        engine.dispose()
+
+    if sync_mode == 'incremental':
+        total = SyncReport.total([item['result'] for item in report.values()])
+        logger.info(f'Sync finished: {total.as_dict()}')
+    return report
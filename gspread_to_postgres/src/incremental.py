@@ -0,0 +1,358 @@
+""" Incremental sync of worksheets (sync_mode = 'incremental' in settings)
+
+Every row is hashed (pandas `hash_pandas_object`) and stored with
+its hash in `_row_hash` column and its key in `_row_key` one (hash of
+`key_columns` of the worksheet, or of the whole row if there are none).
+The hash of the whole sheet is kept in `_gspread_sync_state` table.
+
+Worksheets are read page by page (`page_rows` in settings, see
+streaming.py) and only keys and hashes of stored rows are kept in memory:
+
+* rows of every page are compared with stored hashes, new and updated
+  ones are upserted (INSERT ... ON CONFLICT (_row_key) DO UPDATE)
+  before the next page is read; stored rows which were not met are
+  deleted at the end, all in one transaction;
+* unchanged worksheets are skipped, nothing is written;
+* the table is re-created only if it doesn't exist yet, the header
+  of the worksheet or column types (see schema.py) have changed
+  (if a later page changes them, the worksheet is read again).
+
+Rows are cast to the worksheet schema before hashing, so the hashes
+(and the keys of `key_columns`, primary key of the schema by default)
+are taken from native values.
+"""
+import datetime
+import hashlib
+import itertools
+import logging
+
+import pandas as pd
+import sqlalchemy as sa
+
+from .schema import Schema
+from .streaming import typed_pages
+
+logger = logging.getLogger(__name__)
+
+ROW_KEY = '_row_key'
+ROW_HASH = '_row_hash'
+CREATED = 'CreatedUTC'
+META_COLUMNS = [CREATED, ROW_KEY, ROW_HASH]
+META_TYPES = {CREATED: sa.DateTime(), ROW_KEY: sa.Text(),
+              ROW_HASH: sa.BigInteger()}
+
+CHUNKSIZE = 500
+
+metadata = sa.MetaData()
+
+sync_state = sa.Table(
+    '_gspread_sync_state', metadata,
+    sa.Column('worksheet', sa.Text, primary_key=True),
+    sa.Column('sheet_hash', sa.Text, nullable=False),
+    sa.Column('rows', sa.Integer, nullable=False),
+    sa.Column('synced_at', sa.DateTime, nullable=False),
+)
+
+
+class SyncReport:
+    """ What a sync of one worksheet (or a whole run) did """
+
+    FIELDS = ('scanned', 'inserted', 'updated', 'deleted', 'written')
+
+    def __init__(self, worksheet, skipped=False, rebuilt=False, **counts):
+        self.worksheet = worksheet
+        self.skipped = skipped
+        self.rebuilt = rebuilt
+        for field in self.FIELDS:
+            setattr(self, field, counts.get(field, 0))
+
+    @property
+    def changed(self):
+        return self.inserted + self.updated + self.deleted
+
+    def as_dict(self):
+        data = {'worksheet': self.worksheet, 'skipped': self.skipped,
+                'rebuilt': self.rebuilt, 'changed': self.changed}
+        data.update({field: getattr(self, field) for field in self.FIELDS})
+        return data
+
+    @classmethod
+    def total(cls, reports):
+        total = cls('total')
+        for report in reports:
+            for field in cls.FIELDS:
+                setattr(total, field,
+                        getattr(total, field) + getattr(report, field))
+        total.skipped = sum(report.skipped for report in reports)
+        total.rebuilt = sum(report.rebuilt for report in reports)
+        return total
+
+    def __repr__(self):
+        return f'SyncReport({self.as_dict()})'
+
+
+def row_hashes(df, columns=None):
+    """ uint64 hash of every row (values are compared as strings,
+        so 1 and '1' from get_all_records are the same) """
+    data = df if columns is None else df[list(columns)]
+    return pd.util.hash_pandas_object(data.astype(str), index=False)
+
+
+def row_keys(df, key_columns=None, repeats=None):
+    """ Key of every row: hash of key columns, or of the whole row with
+        the number of its repetition (identical rows are kept apart);
+        `repeats` - row hash -> identical rows on previous pages,
+        updated with the rows of df """
+    if key_columns:
+        return row_hashes(df, key_columns).map('{:016x}'.format)
+    hashes = row_hashes(df)
+    repeat = hashes.groupby(hashes).cumcount()
+    if repeats is not None:
+        repeat += hashes.map(repeats).fillna(0).astype('int64')
+        for row_hash, count in hashes.value_counts().items():
+            repeats[row_hash] = repeats.get(row_hash, 0) + count
+    return hashes.map('{:016x}'.format) + '-' + repeat.astype(str)
+
+
+class SheetHasher:
+    """ Row keys and the hash of a worksheet read page by page; keys of
+        rows met on previous pages are kept (a repeated key is dropped,
+        the first row with it is kept) """
+
+    def __init__(self, key_columns=None):
+        self.key_columns = list(key_columns or ())
+        self.created = datetime.datetime.utcnow()
+        self.columns = []
+        self.keys = set()
+        self.repeats = {}
+        self.hashes = hashlib.sha1()
+        self.rows = 0
+
+    def prepare(self, df):
+        """ Adds meta columns (row key and hash, time of the sync) """
+        missing = set(self.key_columns) - set(df.columns)
+        if missing:
+            raise KeyError(f'Key columns {sorted(missing)} are not in '
+                           f'the sheet')
+        self.columns = list(df.columns)
+        hashes = row_hashes(df)
+        self.hashes.update(hashes.values.tobytes())
+        keys = row_keys(df, self.key_columns, self.repeats)
+        repeated = keys.duplicated() | keys.isin(self.keys)
+        if repeated.any():
+            logger.warning(f'{int(repeated.sum())} rows have duplicate '
+                           f'{self.key_columns}, the first ones are kept')
+        self.keys.update(keys[~repeated])
+        self.rows += int((~repeated).sum())
+        df = df.assign(**{CREATED: self.created, ROW_KEY: keys,
+                          ROW_HASH: hashes.values.view('int64')})
+        return df[~repeated.values]
+
+    def digest(self, types=None):
+        """ Hash of the header, key columns, column types and all rows """
+        header = self.columns + ['\x1e'] + self.key_columns + ['\x1e'] + \
+            list((types or {}).values())
+        digest = hashlib.sha1('\x1f'.join(map(str, header)).encode())
+        digest.update(self.hashes.digest())
+        return digest.hexdigest()
+
+
+def _records(df):
+    """ Rows as dicts of python values (NaN is NULL) """
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _upsert(conn, table, rows):
+    dialect = conn.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Upserts are not supported by {dialect}')
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c[ROW_KEY]],
+        set_={column.name: statement.excluded[column.name]
+              for column in table.columns if column.name != ROW_KEY})
+    for start in range(0, len(rows), CHUNKSIZE):
+        conn.execute(statement, rows[start:start + CHUNKSIZE])
+
+
+def _save_state(conn, worksheet, digest, rows):
+    conn.execute(sync_state.delete()
+                 .where(sync_state.c.worksheet == worksheet))
+    conn.execute(sync_state.insert().values(
+        worksheet=worksheet, sheet_hash=digest, rows=rows,
+        synced_at=datetime.datetime.utcnow()))
+
+
+def column_type(dtype):
+    """ SQL type of a DataFrame column (mixed columns are text) """
+    if pd.api.types.is_bool_dtype(dtype):
+        return sa.Boolean
+    if pd.api.types.is_integer_dtype(dtype):
+        return sa.BigInteger
+    if pd.api.types.is_float_dtype(dtype):
+        return sa.Float
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return sa.DateTime
+    return sa.Text
+
+
+def _python_types(table):
+    types = []
+    for column in table.columns:
+        try:
+            types.append((column.name, column.type.python_type))
+        except NotImplementedError:
+            types.append((column.name, None))
+    return types
+
+
+def rebuild(engine, table_name, chunks, key_columns=None, copy_format=None,
+            snapshots_to_keep=1, schema=None):
+    """ Re-creates the table with all rows (unique index on row key)
+        without downtime, page by page, see swap.py """
+    from .swap import load_and_swap
+    schema = schema or Schema(table_name)
+    hasher = SheetHasher(key_columns)
+
+    def before_swap(conn):
+        _save_state(conn, table_name, hasher.digest(schema.columns),
+                    hasher.rows)
+        schema.save(conn)
+
+    rows = load_and_swap(
+        engine, lambda first: schema.table(table_name, META_TYPES),
+        (hasher.prepare(chunk) for chunk in chunks), copy_format,
+        [([ROW_KEY], True)], snapshots_to_keep, before_swap)
+    return SyncReport(table_name, rebuilt=True, scanned=rows,
+                      inserted=rows, written=rows)
+
+
+def apply_changes(engine, table_name, chunks, columns, key_columns=None,
+                  schema=None):
+    """ Upserts new/changed rows page by page and deletes the rows which
+        are not in the sheet any more (only keys and hashes of stored
+        rows are kept in memory); returns None if the table has to be
+        rebuilt
+
+        :param columns: header of the sheet (columns of the first page)
+    """
+    schema = schema or Schema(table_name)
+    hasher = SheetHasher(key_columns)
+    with engine.connect() as conn, conn.begin() as transaction:
+        try:
+            table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+        except sa.exc.NoSuchTableError:
+            return None
+        if [column.name for column in table.columns] != \
+                list(columns) + META_COLUMNS:
+            logger.info(f'Header of {table_name} has changed')
+            return None
+        if _python_types(table) != _python_types(
+                schema.table(table_name, {name: table.c[name].type
+                                          for name in META_COLUMNS})):
+            logger.info(f'Column types of {table_name} have changed')
+            return None
+        stored = dict(conn.execute(
+            sa.select(table.c[ROW_KEY], table.c[ROW_HASH])).all())
+        stored_digest = conn.execute(
+            sa.select(sync_state.c.sheet_hash)
+            .where(sync_state.c.worksheet == table_name)).scalar()
+
+        inserted = updated = upserted = 0
+        for chunk in chunks:
+            if schema.changed:  # the page didn't fit the types
+                logger.info(f'Column types of {table_name} have changed')
+                transaction.rollback()
+                return None
+            page = hasher.prepare(chunk)
+            before = [stored.pop(key, None) for key in page[ROW_KEY]]
+            changed = [old != new for old, new
+                       in zip(before, page[ROW_HASH].tolist())]
+            new = sum(old is None for old in before)
+            inserted, updated = inserted + new, updated + sum(changed) - new
+            upserts = _records(page[changed])
+            _upsert(conn, table, upserts)
+            upserted += len(upserts)
+
+        # stored rows which were not met
+        deleted = list(stored)
+        for start in range(0, len(deleted), CHUNKSIZE):
+            conn.execute(table.delete().where(
+                table.c[ROW_KEY].in_(deleted[start:start + CHUNKSIZE])))
+        digest = hasher.digest(schema.columns)
+        if digest == stored_digest and not upserted + len(deleted):
+            return SyncReport(table_name, skipped=True, scanned=hasher.rows)
+        _save_state(conn, table_name, digest, hasher.rows)
+        schema.save(conn)
+    return SyncReport(table_name, scanned=hasher.rows, inserted=inserted,
+                      updated=updated, deleted=len(deleted),
+                      written=upserted + len(deleted))
+
+
+def sync_pages(engine, table_name, pages, schema, key_columns=None,
+               copy_format=None, snapshots_to_keep=1):
+    """ Syncs the table with the worksheet page by page, see the module
+        docstring
+
+        :param pages: function() -> iterable of pages of the worksheet
+                      cast by `schema` (see streaming.typed_pages); it is
+                      called again if a later page changes column types
+        :param schema: schema.Schema of the worksheet
+
+        `sync_state` table has to exist (`metadata.create_all(engine)`,
+        done once by execute())
+    """
+    chunks = iter(pages())
+    first = next(chunks, None)
+    if first is None:
+        logger.warning(f'{table_name} is empty, skipped')
+        return SyncReport(table_name, skipped=True)
+    key_columns = key_columns or schema.primary_key
+    chunks = itertools.chain([first], chunks)
+    report = None
+    if not schema.changed:
+        report = apply_changes(engine, table_name, chunks, first.columns,
+                               key_columns, schema)
+        if report is None and schema.changed:  # pages are read again
+            chunks = iter(pages())
+    return report or rebuild(engine, table_name, chunks, key_columns,
+                             copy_format, snapshots_to_keep, schema)
+
+
+def sync_dataframe(engine, table_name, df, key_columns=None,
+                   copy_format=None, snapshots_to_keep=1, schema=None):
+    """ Syncs the table with the whole worksheet (strings, e.g.
+        `getDataframe(raw=True)`), see sync_pages
+
+        :param schema: schema.Schema of the worksheet (inferred from
+                       the data if not given)
+    """
+    schema = schema or Schema(table_name)
+    return sync_pages(
+        engine, table_name,
+        lambda: typed_pages([df] if len(df.columns) else [], schema),
+        schema, key_columns, copy_format, snapshots_to_keep)
+
+
+def sync_worksheet(engine, main_sheet, wrksht, key_columns=None,
+                   copy_format=None, snapshots_to_keep=1, schema=None,
+                   page_rows=None):
+    """ Worker target of incremental mode (see create_table); the
+        worksheet is read in pages of `page_rows` rows (at once if
+        it is not set) """
+    schema = schema or Schema(wrksht)
+
+    def pages():
+        if page_rows:
+            return main_sheet.iterDataframes(wrksht, page_rows, schema)
+        df = main_sheet.getDataframe(wrksht, raw=True)
+        return typed_pages([df] if len(df.columns) else [], schema)
+
+    report = sync_pages(engine, wrksht, pages, schema, key_columns,
+                        copy_format, snapshots_to_keep)
+    logger.info(f'Synced {wrksht}: {report.as_dict()}')
+    return report
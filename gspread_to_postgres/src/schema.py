@@ -0,0 +1,220 @@
+""" Column types of worksheet tables
+
+Types ('text', 'int', 'float', 'bool', 'date', 'timestamp') are inferred
+from a random sample of rows (`SAMPLE_ROWS`) with vectorized parsers,
+then every sync casts all rows to them, so tables keep the same native
+types between runs. Types and the primary key are kept per worksheet
+in `_gspread_schema` table:
+
+* a persisted type is never narrowed; if values don't fit it any more,
+  the column is widened to text (and the table is rebuilt);
+* `column_types` in settings pins types (values which don't fit
+  are NULL), `primary_keys` pins the primary key of the table;
+* numbers with a leading zero or '+' (phone numbers) are text.
+"""
+import datetime
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+TEXT, INT, FLOAT, BOOL, DATE, TIMESTAMP = \
+    'text', 'int', 'float', 'bool', 'date', 'timestamp'
+
+SQL_TYPES = {TEXT: sa.Text, INT: sa.BigInteger, FLOAT: sa.Float,
+             BOOL: sa.Boolean, DATE: sa.Date, TIMESTAMP: sa.DateTime}
+
+SAMPLE_ROWS = 1000
+
+BOOLEANS = {'true': True, 'false': False}
+
+metadata = sa.MetaData()
+
+schema_table = sa.Table(
+    '_gspread_schema', metadata,
+    sa.Column('worksheet', sa.Text, primary_key=True),
+    sa.Column('columns', sa.Text, nullable=False),  # json [[name, type]]
+    sa.Column('primary_key', sa.Text, nullable=False),  # json [names]
+    sa.Column('updated_at', sa.DateTime, nullable=False),
+)
+
+
+def strings(values):
+    """ Column as strings, blank cells are '' """
+    if values.dtype == object and \
+            values.map(type).eq(str).all():
+        return values
+    return values.astype(object).where(values.notna(), '').astype(str)
+
+
+def _numbers(values, nonblank):
+    """ (numbers, can be numeric, can be int) """
+    numbers = pd.to_numeric(values.where(nonblank), errors='coerce')
+    text = nonblank.values & (numbers.isna().values |
+                              values.str.match(r'^[+0]\d').values)
+    numeric = not text.any()
+    integer = numeric and not values.str.contains('[.eE]').any() and \
+        bool((numbers.dropna() % 1 == 0).all())
+    return numbers, numeric, integer
+
+
+def _times(values, nonblank):
+    """ (parsed times, all nonblank are times, all are dates) """
+    looks_like_time = values.str.match(r'^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}')
+    if not looks_like_time[nonblank].all():
+        return None, False, False
+    times = pd.to_datetime(values.where(nonblank), errors='coerce')
+    parsed = bool(times[nonblank].notna().all())
+    dates = parsed and bool((times.dropna() == times.dropna()
+                             .dt.normalize()).all())
+    return times, parsed, dates
+
+
+def infer_type(values):
+    """ Type of a column of strings """
+    values = strings(values)
+    nonblank = values != ''
+    if not nonblank.any():
+        return TEXT
+    if values[nonblank].str.lower().isin(list(BOOLEANS)).all():
+        return BOOL
+    _, numeric, integer = _numbers(values, nonblank)
+    if numeric:
+        return INT if integer else FLOAT
+    _, parsed, dates = _times(values, nonblank)
+    if parsed:
+        return DATE if dates else TIMESTAMP
+    return TEXT
+
+
+def convert(values, kind, coerce=False):
+    """ Column of strings as `kind` type; None if some values don't
+        fit it (or they are NULL if `coerce`) """
+    values = strings(values)
+    if kind == TEXT:
+        return values
+    nonblank = values != ''
+    if kind == BOOL:
+        converted = values.str.lower().map(BOOLEANS).astype('boolean')
+        fits = converted.notna() | ~nonblank
+    elif kind in (INT, FLOAT):
+        numbers, _, _ = _numbers(values, nonblank)
+        fits = numbers.notna() | ~nonblank
+        if kind == INT:
+            fits &= (numbers.isna() | (numbers % 1 == 0))
+            converted = numbers.where(fits).astype('Int64')
+        else:
+            converted = numbers.astype(np.float64)
+        fits &= ~(nonblank & values.str.match(r'^[+0]\d'))
+    else:
+        converted = pd.to_datetime(values.where(nonblank), errors='coerce')
+        fits = converted.notna() | ~nonblank
+        if kind == DATE:
+            converted = converted.dt.normalize()
+    if not fits.all():
+        if not coerce:
+            return None
+        logger.warning(f'{int((~fits).sum())} values of {values.name} '
+                       f'are not {kind}, they are NULL')
+        converted = converted.where(fits)
+    return converted
+
+
+class Schema:
+    """ Column types and primary key of a worksheet table
+
+        :param columns: column -> type (persisted ones)
+        :param pinned: column -> type, from settings
+    """
+
+    def __init__(self, worksheet, columns=None, primary_key=(), pinned=None,
+                 sample_rows=SAMPLE_ROWS):
+        self.worksheet = worksheet
+        self.columns = dict(columns or {})
+        self.primary_key = list(primary_key or ())
+        self.pinned = dict(pinned or {})
+        self.sample_rows = sample_rows
+        self.changed = False
+        unknown = set(self.pinned.values()) - set(SQL_TYPES)
+        if unknown:
+            raise ValueError(f'Unknown column types: {sorted(unknown)}')
+
+    @classmethod
+    def load(cls, engine, worksheet, pinned=None, primary_key=None):
+        """ Persisted schema of the worksheet; settings (`pinned`
+            types, `primary_key`) win over it """
+        metadata.create_all(engine, tables=[schema_table])
+        with engine.connect() as conn:
+            row = conn.execute(
+                sa.select(schema_table.c.columns,
+                          schema_table.c.primary_key)
+                .where(schema_table.c.worksheet == worksheet)).first()
+        columns = dict(json.loads(row.columns)) if row else {}
+        stored_key = json.loads(row.primary_key) if row else []
+        schema = cls(worksheet, columns,
+                     stored_key if primary_key is None else primary_key,
+                     pinned)
+        schema.changed = schema.primary_key != stored_key
+        return schema
+
+    def save(self, conn):
+        metadata.create_all(conn, tables=[schema_table])
+        conn.execute(schema_table.delete()
+                     .where(schema_table.c.worksheet == self.worksheet))
+        conn.execute(schema_table.insert().values(
+            worksheet=self.worksheet,
+            columns=json.dumps(list(self.columns.items())),
+            primary_key=json.dumps(self.primary_key),
+            updated_at=datetime.datetime.utcnow()))
+        self.changed = False
+
+    def update(self, df):
+        """ Sets types of new columns (pinned or inferred from a sample),
+            columns which are not in the sheet any more are removed """
+        missing = set(self.primary_key) - set(df.columns)
+        if missing:
+            raise KeyError(f'Primary key {sorted(missing)} of '
+                           f'{self.worksheet} is not in the sheet')
+        sample = df if len(df) <= self.sample_rows else \
+            df.sample(self.sample_rows, random_state=0)
+        columns = {}
+        for name in df.columns:
+            columns[name] = self.pinned.get(name) or \
+                self.columns.get(name) or infer_type(sample[name])
+        if columns != self.columns:
+            self.changed = self.changed or bool(self.columns)
+            logger.info(f'Columns of {self.worksheet}: {columns}')
+            self.columns = columns
+        return self
+
+    def cast(self, df):
+        """ DataFrame of strings with columns converted to their types;
+            not pinned columns which don't fit are widened to text """
+        converted = {}
+        for name in df.columns:
+            kind = self.columns[name]
+            column = convert(df[name], kind, coerce=name in self.pinned)
+            if column is None:
+                logger.warning(f'{self.worksheet}.{name} is not {kind} '
+                               f'any more, it is text now')
+                self.columns[name], self.changed = TEXT, True
+                column = strings(df[name])
+            converted[name] = column
+        return pd.DataFrame(converted, index=df.index)
+
+    def sql_types(self):
+        return {name: SQL_TYPES[kind]() for name, kind in self.columns.items()}
+
+    def table(self, table_name, extra=None):
+        """ sqlalchemy Table; `extra` - column -> sql type
+            of columns added to the sheet ones """
+        types = dict(self.sql_types(), **(extra or {}))
+        return sa.Table(
+            table_name, sa.MetaData(),
+            *[sa.Column(name, sql_type,
+                        primary_key=name in self.primary_key)
+              for name, sql_type in types.items()])
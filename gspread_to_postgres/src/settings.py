@@ -8,9 +8,19 @@ from .coresettings import Checksettings
 class Spreadsheet_config(Checksettings):
  
     credential_path = os.environ['JSON_OAUTH_PATH']
+    api_url = os.environ.get("GOOGLE_SHEETS_API_URL", "")   # local Sheets API stand-in, see loadtest/
     spreadsheet_name = "google_postgres"
     backup_all_worksheets = True     
     worksheet_to_consider = []         # should be emtry if backup_all_worksheet is True
+    sync_mode = "incremental"          # "incremental" (only changed rows are written) or "replace" (tables are re-created)
+    key_columns = {}                   # worksheet -> columns identifying a row (incremental mode); primary key or whole row if not given
+    column_types = {}                  # worksheet -> {column: "text"|"int"|"float"|"bool"|"date"|"timestamp"}, pinned types (others are inferred)
+    primary_keys = {}                  # worksheet -> primary key columns of its table
+    snapshots_to_keep = 1              # previous tables kept for rollback (see src/swap.py), older ones are dropped
+    page_rows = 5000                   # worksheets are read (and loaded or compared) in pages of that many rows; None - at once
+    api_requests_per_minute = 60       # Sheets API read quota (per user), shared by all workers
+    api_retries = 5                    # retries of requests failed with 429/5xx (with jittered exponential backoff)
+    copy_format = "binary"             # tables are loaded with COPY in "binary" or "csv" format; None - with INSERTs (to_sql)
 
 
 class PostgresSQL_config(Checksettings):
@@ -0,0 +1,72 @@
+""" Streaming reads of large worksheets (page_rows in settings)
+
+Instead of `get_all_records` (the whole worksheet as list of dicts, then
+as a DataFrame) a worksheet is read in pages of `page_rows` rows (A1
+ranges like 'Existing'!A2:O5001) and every page is converted to a typed
+DataFrame chunk, which is loaded into the staging table before the next
+page is read (see swap.load_and_swap); memory is bounded by page size.
+
+Column types of new columns are inferred from the first page (see
+schema.py; numbers with a leading zero or '+', e.g. phone numbers, stay
+text). If a later page doesn't fit the type, the column becomes 'text'
+from that page on (and the loader widens the staging column). Blank
+cells of typed columns are NULL, entirely blank rows are skipped; an
+empty page ends the worksheet (the grid usually has many empty rows
+after the data).
+"""
+import logging
+
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+from .schema import Schema
+
+logger = logging.getLogger(__name__)
+
+PAGE_ROWS = 5000
+
+
+def a1_range(title, first_row, last_row, columns):
+    title = title.replace("'", "''")
+    return f"'{title}'!A{first_row}:{rowcol_to_a1(last_row, columns)}"
+
+
+def iter_pages(spreadsheet, worksheet, page_rows=PAGE_ROWS, rows=None):
+    """ Yields pages of the worksheet as DataFrames of strings
+        (columns are taken from the first row) """
+    if rows is None:
+        rows = spreadsheet.worksheet(worksheet).row_count
+    title = worksheet.replace("'", "''")
+    header = spreadsheet.values_get(f"'{title}'!1:1")
+    header = (header.get('values') or [[]])[0]
+    if not header:
+        return
+    for first_row in range(2, rows + 1, page_rows):
+        last_row = min(first_row + page_rows - 1, rows)
+        values = spreadsheet.values_get(
+            a1_range(worksheet, first_row, last_row, len(header)))
+        values = values.get('values', [])
+        if not values:  # the rest of the grid is empty
+            return
+        values = [row for row in values if any(row)]
+        if values:
+            page = pd.DataFrame(values, columns=header[:max(map(len, values))])
+            yield page.reindex(columns=header).fillna('')
+
+
+def typed_pages(pages, schema=None):
+    """ Converts pages of strings to typed chunks; types of new columns
+        are inferred from the first page, a later page which doesn't
+        fit them widens the column to text (see schema.Schema.cast) """
+    schema = Schema('') if schema is None else schema
+    for number, page in enumerate(pages):
+        if not number:
+            schema.update(page)
+        yield schema.cast(page)
+
+
+def iter_chunks(spreadsheet, worksheet, page_rows=PAGE_ROWS, rows=None,
+                schema=None):
+    """ Typed DataFrame chunks of the worksheet, page by page """
+    return typed_pages(iter_pages(spreadsheet, worksheet, page_rows, rows),
+                       schema)
@@ -0,0 +1,246 @@
+""" Zero-downtime reload of worksheet tables
+
+Rows are loaded into a staging table, indexes are built there, then
+the staging table replaces the live one by two renames in one
+transaction, so readers see either the old or the new table:
+
+    Existing                       -> Existing__snap_20211008103534000000
+    Existing__stg_20211010...      -> Existing
+
+The previous tables are kept as snapshots (`snapshots_to_keep` in
+settings) for an instant `rollback`; older ones are dropped in
+a background thread (`collector`), not delaying the sync.
+"""
+import datetime
+import hashlib
+import itertools
+import logging
+import threading
+
+import pandas as pd
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT = '__snap_'
+STAGE = '__stg_'
+TRASH = '__del_'
+
+MAX_NAME = 63  # postgres identifier length
+BASE_NAME = MAX_NAME - len(SNAPSHOT) - 20  # 20 - length of the stamp
+
+# Seconds to wait for readers' locks when renaming/dropping tables
+# (then the statement fails and is retried) and the number of attempts
+LOCK_TIMEOUT = 5
+ATTEMPTS = 5
+
+CHUNKSIZE = 500
+
+
+def _stamp():
+    return datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+
+
+def _digest(table_name):
+    return hashlib.sha1(table_name.encode()).hexdigest()[:8]
+
+
+def _name(table_name, kind, stamp):
+    """ Name of a staging/snapshot table (long names are cut and
+        made unique by their hash) """
+    if len(table_name) > BASE_NAME:
+        table_name = f'{table_name[:BASE_NAME - 9]}_{_digest(table_name)}'
+    return f'{table_name}{kind}{stamp}'
+
+
+def _index_name(table_name, stamp, number):
+    return f'ix_{_digest(table_name)}_{stamp}_{number}'
+
+
+def snapshots(conn, table_name):
+    """ Snapshot tables of the table, the oldest first """
+    prefix = _name(table_name, SNAPSHOT, '')
+    return sorted(name for name in sa.inspect(conn).get_table_names()
+                  if name.startswith(prefix))
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _rename(conn, old, new):
+    conn.execute(sa.text(f'ALTER TABLE {_quote(conn, old)} '
+                         f'RENAME TO {_quote(conn, new)}'))
+
+
+def _with_lock_timeout(engine, function, *args):
+    """ Runs function(conn, *args) in a transaction; waits at most
+        LOCK_TIMEOUT seconds for locks (postgres), retries on failure """
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            with engine.begin() as conn:
+                if conn.dialect.name == 'postgresql':
+                    conn.execute(sa.text(
+                        f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}s'"))
+                return function(conn, *args)
+        except sa.exc.OperationalError as e:
+            if attempt == ATTEMPTS:
+                raise
+            logger.warning(f'Attempt {attempt} failed, retrying: {e}')
+
+
+def widen(conn, table, chunk):
+    """ Makes columns of the table text if the chunk has text there
+        (a later page of streamed worksheet doesn't fit inferred type);
+        returns the table and the chunk with matching columns """
+    from .incremental import column_type
+    for column in table.columns:
+        if isinstance(column.type, sa.String) or column.name not in chunk:
+            continue
+        if column_type(chunk[column.name].dtype) is sa.Text:
+            if conn.dialect.name == 'postgresql':
+                conn.execute(sa.text(
+                    f'ALTER TABLE {_quote(conn, table.name)} ALTER COLUMN '
+                    f'{_quote(conn, column.name)} TYPE text'))
+            column.type = sa.Text()
+            logger.info(f'{table.name}.{column.name} is widened to text')
+    text = [column.name for column in table.columns
+            if isinstance(column.type, sa.String) and column.name in chunk]
+    strings = {name: chunk[name].astype('string').astype(object)
+               .where(chunk[name].notna(), None) for name in text
+               if column_type(chunk[name].dtype) is not sa.Text}
+    return table, chunk.assign(**strings) if strings else chunk
+
+
+def insert_rows(conn, table, df, copy_format=None):
+    """ Loads DataFrame rows into the table (COPY on postgres
+        if `copy_format` is set, see copy_loader.py) """
+    from .copy_loader import copy_dataframe
+    from .incremental import _records
+    if copy_format and conn.dialect.name == 'postgresql':
+        return copy_dataframe(conn, table, df, copy_format)
+    rows = _records(df)
+    for start in range(0, len(rows), CHUNKSIZE):
+        conn.execute(table.insert(), rows[start:start + CHUNKSIZE])
+    return len(rows)
+
+
+class SnapshotCollector:
+    """ Drops old tables in background threads """
+
+    def __init__(self):
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def collect(self, engine, tables):
+        if not tables:
+            return None
+        thread = threading.Thread(target=self.drop, args=(engine, tables),
+                                  name='snapshot-gc', daemon=True)
+        with self.lock:
+            self.threads = [it for it in self.threads if it.is_alive()]
+            self.threads.append(thread)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def drop(engine, tables):
+        for name in tables:
+            try:
+                _with_lock_timeout(engine, lambda conn: conn.execute(
+                    sa.text(f'DROP TABLE IF EXISTS {_quote(conn, name)}')))
+                logger.info(f'Dropped old table {name}')
+            except Exception as e:
+                logger.error(f'Unable to drop {name}: {e}')
+
+    def join(self, timeout=None):
+        """ Waits for running drops (e.g. before the process exits) """
+        with self.lock:
+            threads = list(self.threads)
+        for thread in threads:
+            thread.join(timeout)
+
+
+collector = SnapshotCollector()
+
+
+def load_and_swap(engine, table, chunks, copy_format=None, indexes=(),
+                  snapshots_to_keep=1, before_swap=None):
+    """ Replaces the table with DataFrame rows without downtime
+
+        :param table: sqlalchemy Table (name and columns of the new table),
+                      function(first chunk) -> Table (e.g. schema.Schema
+                      is filled from the first page) or table name
+                      (columns are taken from the first chunk)
+        :param chunks: DataFrame or iterable of DataFrames (streamed pages)
+        :param indexes: (columns, unique) pairs, built before the swap
+        :param snapshots_to_keep: the number of previous tables kept
+        :param before_swap: function(conn) run in the swap transaction
+        :return: the number of loaded rows
+    """
+    from .copy_loader import table_for
+    chunks = iter([chunks] if isinstance(chunks, pd.DataFrame) else chunks)
+    first = next(chunks, None)
+    if first is None:
+        logger.warning(f'No rows to load into {getattr(table, "name", table)}'
+                       f', it is left as is')
+        return 0
+    if isinstance(table, str):
+        table = table_for(table, first)
+    elif callable(table):
+        table = table(first)
+    table_name, stamp = table.name, _stamp()
+    staging = table.to_metadata(sa.MetaData(),
+                                name=_name(table_name, STAGE, stamp))
+    rows = 0
+    with engine.begin() as conn:
+        staging.create(conn)
+        for chunk in itertools.chain([first], chunks):
+            staging, chunk = widen(conn, staging, chunk)
+            rows += insert_rows(conn, staging, chunk, copy_format)
+        for number, (columns, unique) in enumerate(indexes):
+            sa.Index(_index_name(table_name, stamp, number),
+                     *[staging.c[column] for column in columns],
+                     unique=unique).create(conn)
+
+    def swap(conn):
+        if sa.inspect(conn).has_table(table_name):
+            _rename(conn, table_name, _name(table_name, SNAPSHOT, stamp))
+        _rename(conn, staging.name, table_name)
+        if before_swap:
+            before_swap(conn)
+        return snapshots(conn, table_name)
+
+    try:
+        kept = _with_lock_timeout(engine, swap)
+    except Exception:
+        collector.collect(engine, [staging.name])
+        raise
+    old = kept[:len(kept) - snapshots_to_keep] if snapshots_to_keep else kept
+    collector.collect(engine, old)
+    logger.info(f'{table_name} is swapped ({rows} rows), '
+                f'{len(kept) - len(old)} snapshots kept')
+    return rows
+
+
+def rollback(engine, table_name):
+    """ Brings back the latest snapshot of the table (the current
+        table is dropped); returns the name of restored snapshot """
+    def restore(conn):
+        kept = snapshots(conn, table_name)
+        if not kept:
+            raise LookupError(f'{table_name} has no snapshots')
+        trash = _name(table_name, TRASH, _stamp())
+        _rename(conn, table_name, trash)
+        _rename(conn, kept[-1], table_name)
+        # incremental sync has to compare rows again
+        from .incremental import sync_state
+        if sa.inspect(conn).has_table(sync_state.name):
+            conn.execute(sync_state.delete()
+                         .where(sync_state.c.worksheet == table_name))
+        return kept[-1], trash
+
+    restored, trash = _with_lock_timeout(engine, restore)
+    collector.collect(engine, [trash])
+    logger.info(f'{table_name} is rolled back to {restored}')
+    return restored
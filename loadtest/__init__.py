@@ -0,0 +1,2 @@
+"""Local stand-ins of external services (Google Sheets, Twilio, etc.)
+and tools for load testing of the flaskapp without network access"""
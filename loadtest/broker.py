@@ -0,0 +1,121 @@
+"""Local message broker stand-in for the task scheduler
+
+Messages are files in a directory (kombu `filesystem://` transport),
+so celery workers, beat and the supervisor of workers
+(`start_scheduler.py --supervise`) share a broker without RabbitMQ.
+`celery_app` here has `loadtest-sleep` task (to simulate load) and
+`loadtest-ping` one (records its queue latency to `pings.txt`):
+
+    eval $(python -m loadtest.broker env)
+    python start_scheduler.py --supervise --app loadtest.broker.celery_app --no-beat
+    python -m loadtest.broker flood --tasks 5000 --duration 0.05
+    python -m loadtest.broker depth
+"""
+
+import os
+import json
+import time
+import shlex
+import argparse
+import tempfile
+from taskscheduler.tools import CeleryTask
+
+
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), 'buzznet_broker')
+
+BROKER_URL = 'filesystem://'
+
+PINGS_FILE = 'pings.txt'
+
+
+def transport_options(directory=DEFAULT_DIRECTORY):
+    """Options of filesystem transport keeping messages in `directory`"""
+
+    os.makedirs(directory, exist_ok=True)
+    return {'data_folder_in': directory, 'data_folder_out': directory,
+            'control_folder': os.path.join(directory, 'control'),
+            'polling_interval': 0.05}
+
+
+def environment(directory=DEFAULT_DIRECTORY):
+    """Env variables making taskscheduler (see celeryconfig.py)
+    use the stand-in broker
+    """
+
+    return {'BROKER_URL': BROKER_URL,
+            'BROKER_TRANSPORT_OPTIONS':
+                json.dumps(transport_options(directory))}
+
+
+def make_app(directory=None):
+    directory = directory or os.environ.get('BROKER_STANDIN_DIR',
+                                            DEFAULT_DIRECTORY)
+    app = CeleryTask('Broker-Standin', broker=BROKER_URL)
+    app.conf.broker_transport_options = transport_options(directory)
+
+    @app.task(name='loadtest-sleep')
+    def sleep(duration):
+        time.sleep(duration)
+
+    @app.task(name='loadtest-ping')
+    def ping(sent_at):
+        with open(os.path.join(directory, PINGS_FILE), 'a') as fd:
+            fd.write(f'{time.time() - sent_at}\n')
+
+    return app
+
+
+celery_app = make_app()
+
+
+def flood(app, tasks, duration, rate=0.0, queue=None):
+    """Publish `tasks` sleeping tasks (`rate` per second, 0 - at once)"""
+
+    started = time.perf_counter()
+    for it in range(tasks):
+        if rate:
+            delay = started + it / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        app.send_task('loadtest-sleep', args=(duration,), queue=queue)
+    return time.perf_counter() - started
+
+
+def depth(app, queue='celery'):
+    with app.connection_for_write() as conn:
+        return conn.default_channel.queue_declare(
+            queue, passive=True).message_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('env', help='print env variables to export')
+    flood_parser = commands.add_parser('flood', help='publish sleep tasks')
+    flood_parser.add_argument('--tasks', type=int, default=1000)
+    flood_parser.add_argument('--duration', type=float, default=0.1,
+                              help='seconds every task sleeps')
+    flood_parser.add_argument('--rate', type=float, default=0.0,
+                              help='tasks per second, 0 - all at once')
+    flood_parser.add_argument('--queue', default=None)
+    commands.add_parser('depth', help='print the number of queued tasks')
+    commands.add_parser('purge', help='drop all queued tasks')
+    args = parser.parse_args()
+
+    directory = os.environ.get('BROKER_STANDIN_DIR', DEFAULT_DIRECTORY)
+    if args.command == 'env':
+        for name, value in environment(directory).items():
+            print(f'export {name}={shlex.quote(value)}')
+        print(f'export BROKER_STANDIN_DIR={shlex.quote(directory)}')
+    elif args.command == 'flood':
+        elapsed = flood(celery_app, args.tasks, args.duration, args.rate,
+                        args.queue)
+        print(f'{args.tasks} tasks published in {elapsed:.1f}s')
+    elif args.command == 'depth':
+        print(depth(celery_app))
+    elif args.command == 'purge':
+        print(celery_app.control.purge())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Drives simulated phone calls into the flaskapp
+
+Each call posts the webhooks Twilio would post during a real call:
+`/voice` (incoming call), `/voice_joined` (if the TwiML asks to gather
+an answer) and `/after_call` (Studio flow results), new calls are
+started at a fixed rate (calls per second).
+
+    python -m loadtest.call_driver --app-url http://127.0.0.1:5000 --cps 5 --calls 300
+"""
+
+import re
+import time
+import uuid
+import random
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from loadtest.stats import LatencyReport
+
+
+_GATHER_ACTION_RE = re.compile(r'<Gather[^>]*\baction="([^"]+)"')
+
+
+def synthetic_phones(users=1000, new_user_rate=0.1, seed=0):
+    """Endless stream of caller phone numbers; existing ones match rows
+    of synthetic Users spreadsheet (see `loadtest.sheets_server`)
+    """
+
+    rnd = random.Random(seed)
+    while True:
+        if rnd.random() < new_user_rate:
+            yield f'+1{rnd.randrange(3000000000, 3999999999)}'
+        else:
+            yield f'+{12000000000 + rnd.randrange(users)}'
+
+
+class CallDriver:
+    """Posts realistic webhook sequences of simulated calls to the app
+
+    :param app_url: base url of the flaskapp, e.g. http://127.0.0.1:5000
+    :type app_url: str
+    :param to_number: the called (IVR) phone number
+    :type to_number: str
+    :param answer: speech result posted to gather action
+    :type answer: str
+    :param think_time: pause between webhooks of a call, seconds
+    :type think_time: float
+    :param concurrency: max simultaneous calls
+    :type concurrency: int
+    :param on_call: callback(call) invoked when a call is finished
+    :type on_call: callable, optional
+    """
+
+    def __init__(self, app_url, to_number='+15550000000', answer='yes',
+                 think_time=0.0, concurrency=50, on_call=None):
+        self.app_url = app_url.rstrip('/')
+        self.to_number = to_number
+        self.answer = answer
+        self.think_time = think_time
+        self.on_call = on_call
+        self.report = LatencyReport()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # requests.Session isn't thread-safe, one per worker thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def post(self, name, path, data):
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.app_url + path, data=data,
+                                         timeout=30)
+            ok = response.ok
+            text = response.text
+        except requests.RequestException:
+            ok, text = False, ''
+        self.report.add(name, time.perf_counter() - start, ok)
+        return ok, text
+
+    def simulate_call(self, from_number, call_sid=None, variables=None):
+        """Run the webhook sequence of a single call
+
+        :param from_number: caller phone number
+        :type from_number: str
+        :param variables: Studio flow variables posted to `/after_call`
+        :type variables: dict, optional
+        :return: call record: sid, from, to, status, duration
+        :rtype: dict
+        """
+
+        call_sid = call_sid or 'CA' + uuid.uuid4().hex
+        started = time.time()
+        call = {'CallSid': call_sid, 'AccountSid': 'AC' + '0' * 32,
+                'From': from_number, 'To': self.to_number,
+                'Direction': 'inbound'}
+
+        ok, twiml = self.post('voice', '/voice',
+                              dict(call, CallStatus='ringing'))
+        action = _GATHER_ACTION_RE.search(twiml)
+        if ok and action:
+            time.sleep(self.think_time)
+            ok, _ = self.post('voice_joined', action.group(1), dict(
+                call, CallStatus='in-progress',
+                SpeechResult=self.answer, Confidence='0.93'
+            ))
+
+        if ok:
+            time.sleep(self.think_time)
+            ok, _ = self.post('after_call', '/after_call', dict(
+                variables or {}, phone=from_number, CallSid=call_sid
+            ))
+
+        result = {'sid': call_sid, 'from': from_number,
+                  'to': self.to_number,
+                  'status': 'completed' if ok else 'failed',
+                  'start_time': started,
+                  'duration': max(int(time.time() - started), 1)}
+        if self.on_call:
+            self.on_call(result)
+        return result
+
+    def submit(self, from_number, **kwargs):
+        return self.executor.submit(self.simulate_call, from_number,
+                                    **kwargs)
+
+    def run(self, phones, cps, calls):
+        """Start `calls` calls at `cps` calls per second, wait for them
+
+        :param phones: iterator of caller phone numbers
+        :param cps: calls per second
+        :type cps: float
+        :param calls: total number of calls
+        :type calls: int
+        :return: latency report
+        :rtype: loadtest.stats.LatencyReport
+        """
+
+        start = time.perf_counter()
+        futures = []
+        for it in range(calls):
+            delay = start + it / cps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(self.submit(next(phones)))
+            if len(futures) > 1000:
+                futures = [future for future in futures
+                           if not future.done()]
+        for future in futures:
+            future.result()
+        return self.report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--app-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--cps', type=float, default=1.0,
+                        help='new calls per second')
+    parser.add_argument('--calls', type=int, default=60,
+                        help='total number of calls')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help='pause between webhooks of a call, seconds')
+    parser.add_argument('--users', type=int, default=1000,
+                        help='existing users in synthetic spreadsheet')
+    parser.add_argument('--new-user-rate', type=float, default=0.1)
+    args = parser.parse_args()
+
+    driver = CallDriver(args.app_url, think_time=args.think_time,
+                        concurrency=args.concurrency)
+    started = time.perf_counter()
+    report = driver.run(synthetic_phones(args.users, args.new_user_rate),
+                        args.cps, args.calls)
+    elapsed = time.perf_counter() - started
+    print(report.render())
+    print(f'{args.calls} calls in {elapsed:.1f}s '
+          f'({args.calls / elapsed:.2f} calls/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Configurable latency, errors and quota for stand-in servers"""
+
+import time
+import random
+import threading
+
+
+class FaultInjector:
+    """Decides how a stand-in server misbehaves for the next request
+
+    :param latency: base delay of each response (seconds)
+    :type latency: float
+    :param jitter: random extra delay, uniformly distributed in [0, jitter]
+    :type jitter: float
+    :param error_rate: fraction of requests failed with http 500
+    :type error_rate: float
+    :param quota: max requests per `quota_window`, exceeding ones are
+                  rejected with http 429 (0 means unlimited)
+    :type quota: int
+    :param quota_window: quota window, seconds (Google counts requests
+                         per minute, Twilio per second)
+    :type quota_window: float
+    """
+
+    OPTIONS = ('latency', 'jitter', 'error_rate', 'quota', 'quota_window')
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota=0,
+                 quota_window=60.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota = quota
+        self.quota_window = quota_window
+        self._lock = threading.Lock()
+        self._window = 0
+        self._used = 0
+
+    def configure(self, **options):
+        for name, value in options.items():
+            if name not in self.OPTIONS:
+                raise ValueError(f"Unknown fault option: {name}")
+            setattr(self, name, type(getattr(self, name))(value))
+
+    def options(self):
+        return {name: getattr(self, name) for name in self.OPTIONS}
+
+    def over_quota(self):
+        if not self.quota:
+            return False
+        window = int(time.time() // self.quota_window)
+        with self._lock:
+            if window != self._window:
+                self._window, self._used = window, 0
+            self._used += 1
+            return self._used > self.quota
+
+    def apply(self):
+        """Sleep for configured latency and tell how to fail
+
+        :return: 429 (quota exceeded), 500 (injected error) or None
+        :rtype: int or None
+        """
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self.over_quota():
+            return 429
+        if self.error_rate and random.random() < self.error_rate:
+            return 500
+        return None
+
+
+def add_fault_options(parser, quota_window=60.0):
+    """Add command line options of `FaultInjector` to argparse parser"""
+
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='base response delay, seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='random extra delay, seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests failed with http 500')
+    parser.add_argument('--quota', type=int, default=0,
+                        help='max requests per quota window (0 - unlimited)')
+    parser.add_argument('--quota-window', type=float, default=quota_window,
+                        help='quota window, seconds')
+
+
+def fault_injector_from_args(args):
+    return FaultInjector(latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, quota=args.quota,
+                         quota_window=args.quota_window)
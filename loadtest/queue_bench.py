@@ -0,0 +1,125 @@
+"""Reminder latency during a bulk sync: shared queue vs dedicated queues
+
+Bulk tasks (sleeping `--bulk-duration` seconds each) are queued at once,
+then reminder-like `loadtest-ping` tasks are sent at `--rate` per second;
+the time pings spend in the queue is reported for two layouts with the same
+number of worker processes:
+
+* shared - all tasks in one queue, as before `realtime`/`bulk` queues;
+* split - pings in `realtime` queue, bulk tasks in `bulk` one, each queue
+  with its own workers (see taskscheduler/celeryconfig.py).
+
+Workers use the local broker stand-in (see `loadtest.broker`):
+
+    python -m loadtest.queue_bench --bulk-tasks 200 --pings 60 --rate 4
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from loadtest import broker
+from loadtest.stats import LatencyReport
+from taskscheduler.supervisor import worker_cmd
+
+
+APP = 'loadtest.broker.celery_app'
+
+
+def start_worker(name, queues, concurrency, env):
+    cmd = worker_cmd(APP, ','.join(queues), {'prefetch_multiplier': 1}) + \
+        ['-c', str(concurrency), '-n', f'{name}@%h']
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+
+
+def read_pings(pings_file, count, timeout):
+    """Waits for `count` pings (at most `timeout` seconds),
+    returns their latencies
+    """
+
+    deadline = time.perf_counter() + timeout
+    latencies = []
+    while time.perf_counter() < deadline:
+        if os.path.exists(pings_file):
+            with open(pings_file) as fd:
+                latencies = [float(line) for line in fd if line.strip()]
+        if len(latencies) >= count:
+            break
+        time.sleep(0.2)
+    return latencies
+
+
+def run_layout(layout, args):
+    """Runs one layout, returns ping latencies (seconds)"""
+
+    directory = tempfile.mkdtemp(prefix=f'buzznet_queue_bench_{layout}_')
+    env = dict(os.environ, BROKER_STANDIN_DIR=directory,
+               **broker.environment(directory))
+    app = broker.make_app(directory)
+    if layout == 'shared':
+        ping_queue = bulk_queue = 'celery'
+        workers = [start_worker('shared', ['celery'], args.workers * 2, env)]
+    else:
+        ping_queue, bulk_queue = 'realtime', 'bulk'
+        workers = [start_worker('realtime', ['realtime'], args.workers, env),
+                   start_worker('bulk', ['bulk'], args.workers, env)]
+    pings_file = os.path.join(directory, broker.PINGS_FILE)
+    try:
+        # wait until workers are up (and warmed up)
+        queues = {ping_queue, bulk_queue}
+        for queue in queues:
+            app.send_task('loadtest-ping', args=(time.time(),), queue=queue)
+        started = read_pings(pings_file, len(queues), args.timeout)
+        if len(started) < len(queues):
+            raise RuntimeError('Workers have not started')
+        os.remove(pings_file)
+
+        broker.flood(app, args.bulk_tasks, args.bulk_duration,
+                     queue=bulk_queue)
+        started = time.perf_counter()
+        for it in range(args.pings):
+            delay = started + it / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            app.send_task('loadtest-ping', args=(time.time(),),
+                          queue=ping_queue)
+        return read_pings(pings_file, args.pings, args.timeout)
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bulk-tasks', type=int, default=200)
+    parser.add_argument('--bulk-duration', type=float, default=0.5,
+                        help='seconds every bulk task takes')
+    parser.add_argument('--pings', type=int, default=60)
+    parser.add_argument('--rate', type=float, default=4.0,
+                        help='pings per second')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='concurrency per queue (shared one gets twice)')
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help='max seconds to wait for pings')
+    args = parser.parse_args(argv)
+
+    report = LatencyReport()
+    for layout in ('shared', 'split'):
+        latencies = run_layout(layout, args)
+        for latency in latencies:
+            report.add(f'ping ({layout})', latency)
+        missing = args.pings - len(latencies)
+        if missing > 0:
+            print(f'{layout}: {missing} pings not run in {args.timeout}s',
+                  file=sys.stderr)
+    print(report.render())
+
+
+if __name__ == '__main__':
+    main()
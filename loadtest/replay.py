@@ -0,0 +1,179 @@
+"""Replays recorded traffic (see `flaskapp.tools.recorder`) against an app
+
+Requests are re-issued with the recorded inter-arrival times divided by
+`--speed`, hashed phone numbers are replaced by synthetic ones (the same
+hash always gives the same number). Latency percentiles are reported
+per route and can be saved/compared between builds:
+
+    python -m loadtest.replay recordings/*.ndjson.gz --app-url http://127.0.0.1:5000 --speed 10 --output new.json --baseline old.json
+"""
+
+import sys
+import glob
+import gzip
+import json
+import time
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from loadtest.stats import LatencyReport
+
+
+HASH_PREFIX = 'phone:'
+
+
+def load_recordings(paths):
+    """Read recorded requests from gzipped json lines files
+
+    :param paths: file names or glob patterns
+    :type paths: list
+    :return: recorded requests sorted by arrival time
+    :rtype: list
+    """
+
+    records = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with gzip.open(path, 'rt') as fd:
+                records.extend(json.loads(line) for line in fd if line.strip())
+    records.sort(key=lambda record: record['t'])
+    return records
+
+
+def synthetic_phone(value):
+    """Map hashed phone number to a stable fake US number"""
+
+    if not isinstance(value, str) or not value.startswith(HASH_PREFIX):
+        return value
+    return '+1555' + str(int(value[len(HASH_PREFIX):], 16) % 10 ** 7).zfill(7)
+
+
+def restore(values):
+    return {key: synthetic_phone(value) for key, value in values.items()}
+
+
+class Replayer:
+    """Re-issues recorded requests keeping their (scaled) timing
+
+    :param app_url: base url of the app under test
+    :type app_url: str
+    :param speed: time compression factor, e.g. 10 means 10x faster
+    :type speed: float
+    :param concurrency: max simultaneous requests
+    :type concurrency: int
+    """
+
+    def __init__(self, app_url, speed=1.0, concurrency=100):
+        self.app_url = app_url.rstrip('/')
+        self.speed = speed
+        self.report = LatencyReport()
+        self.lag = 0.0
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self, record):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                record['method'], self.app_url + record['path'],
+                params=restore(record.get('args', {})),
+                data=restore(record.get('form', {})),
+                timeout=60
+            )
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        self.report.add(record['path'], time.perf_counter() - start, ok)
+
+    def run(self, records):
+        """Replay records, wait for all responses
+
+        :return: latency report
+        :rtype: loadtest.stats.LatencyReport
+        """
+
+        if not records:
+            return self.report
+        first = records[0]['t']
+        start = time.perf_counter()
+        futures = []
+        for record in records:
+            due = start + (record['t'] - first) / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # the replayer can't keep up with the requested speed
+                self.lag = max(self.lag, -delay)
+            futures.append(self.executor.submit(self.send, record))
+        for future in futures:
+            future.result()
+        return self.report
+
+
+def compare(summary, baseline):
+    """Render p50/p95/p99 of the run next to baseline ones"""
+
+    lines = [f"{'route':<40}" + ''.join(
+        f'{key + " ms":>12}{"base":>10}{"diff":>9}'
+        for key in ('p50', 'p95', 'p99'))]
+    for route, row in summary.items():
+        base = baseline.get(route)
+        line = f'{route:<40}'
+        for key in ('p50', 'p95', 'p99'):
+            value = row[key] * 1000
+            if base:
+                base_value = base[key] * 1000
+                diff = (value / base_value - 1) * 100 if base_value else 0
+                line += f'{value:>12.1f}{base_value:>10.1f}{diff:>8.0f}%'
+            else:
+                line += f'{value:>12.1f}{"-":>10}{"-":>9}'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('recordings', nargs='+',
+                        help='recorded files (glob patterns are allowed)')
+    parser.add_argument('--app-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed factor, 1..50')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--output', help='save latency summary to json')
+    parser.add_argument('--baseline',
+                        help='latency summary of another build to compare to')
+    args = parser.parse_args()
+
+    if not 1 <= args.speed <= 50:
+        parser.error('--speed should be within 1..50')
+
+    records = load_recordings(args.recordings)
+    replayer = Replayer(args.app_url, args.speed, args.concurrency)
+    started = time.perf_counter()
+    summary = replayer.run(records).summary()
+    elapsed = time.perf_counter() - started
+
+    if args.baseline:
+        with open(args.baseline) as fd:
+            print(compare(summary, json.load(fd)))
+    else:
+        print(replayer.report.render())
+    print(f'{len(records)} requests in {elapsed:.1f}s, '
+          f'max schedule lag {replayer.lag * 1000:.0f} ms', file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(summary, fd, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""gspread client talking to local Sheets API stand-in
+(see `loadtest.sheets_server`) instead of Google
+"""
+
+import gspread
+import requests
+
+
+GOOGLE_API_PREFIXES = ('https://sheets.googleapis.com',
+                       'https://www.googleapis.com')
+
+
+class StandinSession(requests.Session):
+    """requests session which sends Google API calls to `api_url`"""
+
+    def __init__(self, api_url):
+        super().__init__()
+        self.api_url = api_url.rstrip('/')
+
+    def request(self, method, url, *args, **kwargs):
+        for prefix in GOOGLE_API_PREFIXES:
+            if url.startswith(prefix):
+                url = self.api_url + url[len(prefix):]
+                break
+        return super().request(method, url, *args, **kwargs)
+
+
+class StandinClient(gspread.Client):
+    """gspread client without (Google) authorization"""
+
+    def __init__(self, api_url):
+        super().__init__(None, session=StandinSession(api_url))
+
+    def login(self):
+        pass
+
+
+def standin_client(api_url):
+    """Create gspread client for the stand-in running at `api_url`
+
+    :param api_url: base url of the stand-in, e.g. http://127.0.0.1:8081
+    :type api_url: str
+    :rtype: gspread.Client
+    """
+
+    return StandinClient(api_url)
@@ -0,0 +1,387 @@
+"""Local stand-in of Google Sheets/Drive REST API
+
+Implements the subset of API used by gspread (open by key/name,
+worksheet list, get_all_values/records, update_cell, append_row,
+batch_update) on top of in-memory spreadsheets, with configurable
+latency, error rate and per-minute quota (see `loadtest.faults`).
+
+Run it with
+    python -m loadtest.sheets_server --port 8081 --users 10000 --latency 0.05
+
+and point the app to it with GOOGLE_SHEETS_API_URL=http://127.0.0.1:8081
+"""
+
+import re
+import json
+import random
+import argparse
+import threading
+from flask import Flask, request, jsonify
+from loadtest.faults import (FaultInjector, add_fault_options,
+                             fault_injector_from_args)
+
+
+USERS_SPREADSHEET_ID = '1rmfzTtQnQwzZHhPciTFmKIXju2b_ScH5mVvXhG_mlkM'
+
+USERS_HEADER = ['Phone Number', 'username', 'type', 'dob', 'gender',
+                'weight', 'height', 'activity', 'hobby', 'time zone',
+                'call time', 'emergency phone', 'emergency name',
+                'friend', 'operator']
+
+ERROR_STATUSES = {400: 'INVALID_ARGUMENT', 404: 'NOT_FOUND',
+                  429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL'}
+
+
+def column_to_number(letters):
+    number = 0
+    for letter in letters.upper():
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def number_to_column(number):
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+_CELL_RE = re.compile(r'^([A-Za-z]*)(\d*)$')
+
+
+def parse_a1(range_name):
+    """Parse A1 notation: 'Sheet 1'!A2:C10, Sheet1!B3, Sheet1, A:C, 2:5
+
+    :return: (title, first_row, last_row, first_col, last_col);
+             bounds are 1-based and inclusive, None means unbounded
+    :rtype: tuple
+    """
+
+    title, _, cells = range_name.rpartition('!')
+    if not title:
+        title, cells = cells, ''
+        if _CELL_RE.match(title.split(':')[0]) and ':' in title:
+            title, cells = '', range_name
+    title = title.strip("'").replace("''", "'")
+
+    if not cells:
+        return title, None, None, None, None
+
+    start, _, end = cells.partition(':')
+    start_col, start_row = _CELL_RE.match(start).groups()
+    if end:
+        end_col, end_row = _CELL_RE.match(end).groups()
+    else:
+        end_col, end_row = start_col, start_row
+    return (
+        title,
+        int(start_row) if start_row else None,
+        int(end_row) if end_row else None,
+        column_to_number(start_col) if start_col else None,
+        column_to_number(end_col) if end_col else None
+    )
+
+
+class SheetsStore:
+    """In-memory spreadsheets: id -> title and worksheets
+    (worksheet is a list of rows, row is a list of strings)
+    """
+
+    def __init__(self):
+        self.spreadsheets = {}
+        self.lock = threading.RLock()
+
+    def add_spreadsheet(self, spreadsheet_id, title, worksheets):
+        with self.lock:
+            self.spreadsheets[spreadsheet_id] = {
+                'title': title,
+                'sheets': {name: [[str(value) for value in row]
+                                  for row in rows]
+                           for name, rows in worksheets.items()}
+            }
+
+    def load(self, path):
+        """Load spreadsheets from json file:
+        [{"id": ..., "title": ..., "sheets": {"Existing": [[...], ...]}}]
+        """
+
+        with open(path) as fd:
+            for item in json.load(fd):
+                self.add_spreadsheet(item['id'], item['title'],
+                                     item['sheets'])
+
+    def find_by_title(self, title):
+        return [(spreadsheet_id, spreadsheet)
+                for spreadsheet_id, spreadsheet in self.spreadsheets.items()
+                if title is None or spreadsheet['title'] == title]
+
+    def get_rows(self, spreadsheet_id, range_name):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            raise LookupError(f'Spreadsheet {spreadsheet_id} not found')
+        title, first_row, last_row, first_col, last_col = \
+            parse_a1(range_name)
+        title = title or next(iter(spreadsheet['sheets']))
+        if title not in spreadsheet['sheets']:
+            raise LookupError(f'Unable to parse range: {range_name}')
+        bounds = (first_row or 1, last_row, first_col or 1, last_col)
+        return title, spreadsheet['sheets'][title], bounds
+
+    def read(self, spreadsheet_id, range_name):
+        with self.lock:
+            title, rows, (first_row, last_row, first_col, last_col) = \
+                self.get_rows(spreadsheet_id, range_name)
+            selected = rows[first_row - 1:last_row]
+            values = [row[first_col - 1:last_col] for row in selected]
+        # trailing empty cells/rows are omitted by the real API
+        values = [_rstrip_row(row) for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return title, values
+
+    def write(self, spreadsheet_id, range_name, values):
+        with self.lock:
+            title, rows, (first_row, _, first_col, _) = \
+                self.get_rows(spreadsheet_id, range_name)
+            for row_offset, new_row in enumerate(values):
+                row_index = first_row - 1 + row_offset
+                while len(rows) <= row_index:
+                    rows.append([])
+                row = rows[row_index]
+                for col_offset, value in enumerate(new_row):
+                    col_index = first_col - 1 + col_offset
+                    if len(row) <= col_index:
+                        row.extend([''] * (col_index + 1 - len(row)))
+                    row[col_index] = '' if value is None else str(value)
+            return title, first_row, first_col
+
+    def append(self, spreadsheet_id, range_name, values):
+        with self.lock:
+            title, rows, _ = self.get_rows(spreadsheet_id, range_name)
+            first_row = len(rows) + 1
+            rows.extend([['' if value is None else str(value)
+                          for value in row] for row in values])
+            return title, first_row
+
+    def clear(self, spreadsheet_id, range_name):
+        with self.lock:
+            title, rows, (first_row, last_row, first_col, last_col) = \
+                self.get_rows(spreadsheet_id, range_name)
+            for row in rows[first_row - 1:last_row]:
+                for col_index in range(first_col - 1,
+                                       min(last_col or len(row), len(row))):
+                    row[col_index] = ''
+            return title
+
+
+def _rstrip_row(row):
+    end = len(row)
+    while end and row[end - 1] == '':
+        end -= 1
+    return row[:end]
+
+
+def generate_users_spreadsheet(store, users=1000,
+                               spreadsheet_id=USERS_SPREADSHEET_ID,
+                               seed=0):
+    """Add synthetic "Users" spreadsheet (Existing and Calls worksheets)
+
+    :param users: the number of rows in Existing worksheet
+    :type users: int
+    """
+
+    rnd = random.Random(seed)
+    existing = [USERS_HEADER]
+    for it in range(users):
+        phone = str(12000000000 + it)
+        existing.append([
+            phone, f'user{it}', rnd.choice(['C', 'V', 'A']),
+            '', rnd.choice(['M', 'W', '']), '', '', '', '',
+            rnd.choice(['US/Pacific', 'US/Eastern', 'US/Central', '']),
+            '', '', '', str(12000000000 + rnd.randrange(users)),
+            '19258609793'
+        ])
+    store.add_spreadsheet(spreadsheet_id, 'Users', {
+        'Existing': existing,
+        'Calls': [USERS_HEADER]
+    })
+
+
+def create_app(store=None, faults=None):
+    """Create stand-in flask app
+
+    :param store: spreadsheets to serve, defaults to an empty store
+    :type store: SheetsStore, optional
+    :param faults: latency/errors/quota configuration
+    :type faults: loadtest.faults.FaultInjector, optional
+    """
+
+    app = Flask(__name__)
+    app.store = store = store if store is not None else SheetsStore()
+    app.faults = faults = faults if faults is not None else FaultInjector()
+
+    def error(code, message):
+        return jsonify({'error': {'code': code, 'message': message,
+                                  'status': ERROR_STATUSES.get(code)}}), code
+
+    @app.before_request
+    def inject_faults():
+        if request.path.startswith('/_standin'):
+            return None
+        code = faults.apply()
+        if code == 429:
+            return error(429, "Quota exceeded for quota metric "
+                              "'Read requests' of service "
+                              "'sheets.googleapis.com'")
+        if code:
+            return error(code, 'Internal error encountered.')
+
+    @app.errorhandler(LookupError)
+    def not_found(e):
+        return error(404, str(e).strip("'\""))
+
+    # ---- stand-in control
+    @app.route('/_standin/faults', methods=['GET', 'POST'])
+    def configure_faults():
+        if request.method == 'POST':
+            faults.configure(**request.get_json())
+        return jsonify(faults.options())
+
+    # ---- Drive API: list spreadsheets (Client.open, Client.openall)
+    @app.route('/drive/v3/files')
+    def list_files():
+        match = re.search(r'name = "(.*)"', request.args.get('q', ''))
+        title = match.group(1) if match else None
+        return jsonify({'files': [
+            {'id': spreadsheet_id, 'name': spreadsheet['title'],
+             'createdTime': '2021-01-01T00:00:00.000Z',
+             'modifiedTime': '2021-01-01T00:00:00.000Z'}
+            for spreadsheet_id, spreadsheet in store.find_by_title(title)
+        ]})
+
+    # ---- Sheets API
+    @app.route('/v4/spreadsheets/<spreadsheet_id>')
+    def get_metadata(spreadsheet_id):
+        spreadsheet = store.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            return error(404, 'Requested entity was not found.')
+        return jsonify({
+            'spreadsheetId': spreadsheet_id,
+            'properties': {'title': spreadsheet['title']},
+            'sheets': [{'properties': {
+                'sheetId': index,
+                'title': title,
+                'index': index,
+                'sheetType': 'GRID',
+                'gridProperties': {
+                    'rowCount': max(len(rows), 1000),
+                    'columnCount': max([len(row) for row in rows] + [26])
+                }
+            }} for index, (title, rows) in
+                enumerate(spreadsheet['sheets'].items())]
+        })
+
+    @app.route('/v4/spreadsheets/<spreadsheet_id>:batchUpdate',
+               methods=['POST'])
+    def batch_update(spreadsheet_id):
+        # structural changes (resize, formatting etc.) are accepted as is
+        requests = request.get_json().get('requests', [])
+        return jsonify({'spreadsheetId': spreadsheet_id,
+                        'replies': [{} for _ in requests]})
+
+    @app.route('/v4/spreadsheets/<spreadsheet_id>/values:batchGet')
+    def values_batch_get(spreadsheet_id):
+        value_ranges = []
+        for range_name in request.args.getlist('ranges'):
+            title, values = store.read(spreadsheet_id, range_name)
+            value_ranges.append({'range': range_name,
+                                 'majorDimension': 'ROWS',
+                                 'values': values})
+        return jsonify({'spreadsheetId': spreadsheet_id,
+                        'valueRanges': value_ranges})
+
+    @app.route('/v4/spreadsheets/<spreadsheet_id>/values:batchUpdate',
+               methods=['POST'])
+    def values_batch_update(spreadsheet_id):
+        responses = []
+        for item in request.get_json().get('data', []):
+            responses.append(_update(spreadsheet_id, item['range'],
+                                     item.get('values', [])))
+        return jsonify({
+            'spreadsheetId': spreadsheet_id,
+            'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+            'responses': responses
+        })
+
+    def _update(spreadsheet_id, range_name, values):
+        title, first_row, first_col = store.write(spreadsheet_id,
+                                                  range_name, values)
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'updatedRange': f"'{title}'!{number_to_column(first_col)}"
+                            f"{first_row}",
+            'updatedRows': len(values),
+            'updatedCells': sum(len(row) for row in values)
+        }
+
+    @app.route('/v4/spreadsheets/<spreadsheet_id>/values/<path:range_name>',
+               methods=['GET', 'PUT', 'POST'])
+    def values(spreadsheet_id, range_name):
+        if request.method == 'GET':
+            title, values = store.read(spreadsheet_id, range_name)
+            return jsonify({'range': range_name, 'majorDimension': 'ROWS',
+                            'values': values})
+
+        if request.method == 'PUT':
+            body = request.get_json()
+            return jsonify(_update(spreadsheet_id, range_name,
+                                   body.get('values', [])))
+
+        if range_name.endswith(':append'):
+            values = request.get_json().get('values', [])
+            title, first_row = store.append(spreadsheet_id,
+                                            range_name[:-len(':append')],
+                                            values)
+            return jsonify({
+                'spreadsheetId': spreadsheet_id,
+                'tableRange': f"'{title}'",
+                'updates': {
+                    'updatedRange': f"'{title}'!A{first_row}",
+                    'updatedRows': len(values),
+                    'updatedCells': sum(len(row) for row in values)
+                }
+            })
+
+        if range_name.endswith(':clear'):
+            title = store.clear(spreadsheet_id, range_name[:-len(':clear')])
+            return jsonify({'spreadsheetId': spreadsheet_id,
+                            'clearedRange': f"'{title}'"})
+
+        return error(400, f'Unsupported operation: {range_name}')
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--users', type=int, default=1000,
+                        help='rows of synthetic Users spreadsheet')
+    parser.add_argument('--data', help='json file with spreadsheets to load')
+    add_fault_options(parser)
+    args = parser.parse_args()
+
+    store = SheetsStore()
+    if args.users:
+        generate_users_spreadsheet(store, args.users)
+    if args.data:
+        store.load(args.data)
+
+    app = create_app(store, fault_injector_from_args(args))
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Latency statistics of load test runs"""
+
+import math
+import threading
+from collections import defaultdict
+
+
+def percentile(values, q):
+    """Nearest-rank percentile
+
+    :param values: sorted sample
+    :type values: list
+    :param q: percentile, 0..100
+    :type q: float
+    """
+
+    if not values:
+        return float('nan')
+    rank = max(int(math.ceil(q / 100 * len(values))), 1)
+    return values[rank - 1]
+
+
+class LatencyReport:
+    """Thread-safe collection of (name, latency, ok) observations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, latency, ok=True):
+        with self._lock:
+            self.latencies[name].append(latency)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self):
+        """
+        :return: name -> {count, errors, p50, p95, p99, max} (seconds)
+        :rtype: dict
+        """
+
+        with self._lock:
+            items = {name: sorted(values)
+                     for name, values in self.latencies.items()}
+            errors = dict(self.errors)
+        return {name: {
+            'count': len(values),
+            'errors': errors.get(name, 0),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': values[-1]
+        } for name, values in sorted(items.items())}
+
+    def render(self):
+        lines = [f"{'name':<40}{'count':>8}{'errors':>8}"
+                 f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for name, row in self.summary().items():
+            lines.append(
+                f"{name:<40}{row['count']:>8}{row['errors']:>8}"
+                + ''.join(f"{row[key] * 1000:>10.1f}"
+                          for key in ('p50', 'p95', 'p99', 'max'))
+            )
+        return '\n'.join(lines)
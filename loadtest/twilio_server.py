@@ -0,0 +1,277 @@
+"""Local stand-in of Twilio REST API
+
+Implements the subset used by the flaskapp: Studio flow executions
+(create, steps list, step context), message creates and call list/fetch,
+with configurable latency, error rate and rate limit (http 429,
+Twilio error 20429, see `loadtest.faults`).
+
+If `--app-url` is given, every Studio execution is followed by
+a simulated call, i.e. `voice` -> `voice_joined` -> `after_call`
+webhooks posted to the flaskapp (see `loadtest.call_driver`);
+`--cps` additionally starts inbound calls at a fixed rate.
+
+    python -m loadtest.twilio_server --port 8082 --app-url http://127.0.0.1:5000 --cps 2
+
+and point the app to it with TWILIO_API_URL=http://127.0.0.1:8082
+"""
+
+import time
+import uuid
+import argparse
+import threading
+from email.utils import formatdate
+from datetime import datetime, timezone
+from flask import Flask, request, jsonify
+from loadtest.faults import (FaultInjector, add_fault_options,
+                             fault_injector_from_args)
+from loadtest.call_driver import CallDriver, synthetic_phones
+
+
+ACCOUNT_SID = 'AC' + '0' * 32
+
+
+def make_sid(prefix):
+    return prefix + uuid.uuid4().hex
+
+
+def rfc2822(timestamp):
+    return formatdate(timestamp, usegmt=True)
+
+
+def iso8601(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc) \
+        .strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class TwilioStore:
+    """In-memory executions, messages and calls
+
+    :param steps: the number of steps of each Studio execution
+    :type steps: int
+    :param variables: flow variables reported by step context
+    :type variables: dict
+    """
+
+    def __init__(self, steps=12, variables=None):
+        self.steps = steps
+        self.variables = variables if variables is not None \
+            else {'UP': '120', 'DOWN': '80'}
+        self.executions = {}
+        self.messages = []
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def add_execution(self, flow_sid, to_number, from_number):
+        now = time.time()
+        execution = {
+            'sid': make_sid('FN'), 'account_sid': ACCOUNT_SID,
+            'flow_sid': flow_sid, 'contact_channel_address': to_number,
+            'from': from_number,
+            'context': {}, 'status': 'active',
+            'date_created': iso8601(now), 'date_updated': iso8601(now),
+            'steps': [make_sid('FT') for _ in range(self.steps)]
+        }
+        with self.lock:
+            self.executions[execution['sid']] = execution
+        return execution
+
+    def add_message(self, account_sid, to_number, from_number, body):
+        now = time.time()
+        message = {
+            'sid': make_sid('SM'), 'account_sid': account_sid,
+            'to': to_number, 'from': from_number, 'body': body,
+            'status': 'queued', 'direction': 'outbound-api',
+            'num_segments': '1', 'date_created': rfc2822(now),
+            'date_updated': rfc2822(now)
+        }
+        with self.lock:
+            self.messages.append(message)
+        return message
+
+    def add_call(self, call):
+        """Record a (simulated) call, see `CallDriver.on_call`"""
+
+        record = {
+            'sid': call['sid'], 'account_sid': ACCOUNT_SID,
+            'from': call['from'], 'to': call['to'],
+            'status': call['status'], 'direction': 'inbound',
+            'start_time': rfc2822(call['start_time']),
+            'date_created': rfc2822(call['start_time']),
+            'duration': str(call['duration']),
+            '_start': call['start_time']
+        }
+        with self.lock:
+            self.calls[record['sid']] = record
+        return record
+
+
+def public(record):
+    return {key: value for key, value in record.items()
+            if not key.startswith('_') and key != 'steps'}
+
+
+def create_app(store=None, faults=None, driver=None):
+    """Create stand-in flask app
+
+    :param store: executions/messages/calls storage
+    :type store: TwilioStore, optional
+    :param faults: latency/errors/rate limit configuration
+    :type faults: loadtest.faults.FaultInjector, optional
+    :param driver: if given, executions are followed by simulated calls
+    :type driver: loadtest.call_driver.CallDriver, optional
+    """
+
+    app = Flask(__name__)
+    app.store = store = store if store is not None else TwilioStore()
+    app.faults = faults = faults if faults is not None \
+        else FaultInjector(quota_window=1.0)
+    app.driver = driver
+
+    def error(status, code, message):
+        return jsonify({
+            'code': code, 'message': message, 'status': status,
+            'more_info': f'https://www.twilio.com/docs/errors/{code}'
+        }), status
+
+    @app.before_request
+    def inject_faults():
+        if request.path.startswith('/_standin'):
+            return None
+        status = faults.apply()
+        if status == 429:
+            return error(429, 20429, 'Too Many Requests')
+        if status:
+            return error(status, 20500, 'Internal Server Error')
+
+    @app.route('/_standin/faults', methods=['GET', 'POST'])
+    def configure_faults():
+        if request.method == 'POST':
+            faults.configure(**request.get_json())
+        return jsonify(faults.options())
+
+    @app.route('/_standin/report')
+    def report():
+        return jsonify({
+            'executions': len(store.executions),
+            'messages': len(store.messages),
+            'calls': len(store.calls),
+            'webhooks': driver.report.summary() if driver else {}
+        })
+
+    # ---- Studio API
+    @app.route('/v2/Flows/<flow_sid>/Executions', methods=['POST'])
+    def create_execution(flow_sid):
+        execution = store.add_execution(flow_sid, request.form.get('To'),
+                                        request.form.get('From'))
+        if driver:
+            driver.submit(execution['contact_channel_address'],
+                          variables=store.variables)
+        return jsonify(public(execution)), 201
+
+    def get_execution(flow_sid, execution_sid):
+        execution = store.executions.get(execution_sid)
+        if execution is None or execution['flow_sid'] != flow_sid:
+            raise LookupError(f'Execution {execution_sid} not found')
+        return execution
+
+    @app.route('/v2/Flows/<flow_sid>/Executions/<execution_sid>')
+    def fetch_execution(flow_sid, execution_sid):
+        return jsonify(public(get_execution(flow_sid, execution_sid)))
+
+    @app.route('/v2/Flows/<flow_sid>/Executions/<execution_sid>/Steps')
+    def list_steps(flow_sid, execution_sid):
+        execution = get_execution(flow_sid, execution_sid)
+        page_size = int(request.args.get('PageSize', 50))
+        # the latest step goes first, as Twilio returns them
+        steps = [{'sid': step_sid, 'flow_sid': flow_sid,
+                  'execution_sid': execution_sid,
+                  'name': f'step_{index}',
+                  'date_created': execution['date_created']}
+                 for index, step_sid in enumerate(execution['steps'])]
+        return jsonify({
+            'steps': steps[::-1][:page_size],
+            'meta': {'key': 'steps', 'page': 0, 'page_size': page_size,
+                     'next_page_url': None, 'previous_page_url': None}
+        })
+
+    @app.route('/v2/Flows/<flow_sid>/Executions/<execution_sid>/Steps/'
+               '<step_sid>/Context')
+    def fetch_step_context(flow_sid, execution_sid, step_sid):
+        get_execution(flow_sid, execution_sid)
+        return jsonify({
+            'flow_sid': flow_sid, 'execution_sid': execution_sid,
+            'step_sid': step_sid,
+            'context': {'flow': {'variables': dict(store.variables)}}
+        })
+
+    # ---- Programmable Messaging/Voice API
+    @app.route('/2010-04-01/Accounts/<account_sid>/Messages.json',
+               methods=['POST'])
+    def create_message(account_sid):
+        message = store.add_message(account_sid, request.form.get('To'),
+                                    request.form.get('From'),
+                                    request.form.get('Body'))
+        return jsonify(public(message)), 201
+
+    @app.route('/2010-04-01/Accounts/<account_sid>/Calls.json')
+    def list_calls(account_sid):
+        from_number = request.args.get('From')
+        start_after = request.args.get('StartTime>')
+        start_after = datetime.strptime(start_after, '%Y-%m-%dT%H:%M:%SZ') \
+            .replace(tzinfo=timezone.utc).timestamp() if start_after else 0
+        with store.lock:
+            calls = [public(call) for call in store.calls.values()
+                     if (not from_number or call['from'] == from_number)
+                     and call['_start'] >= start_after]
+        return jsonify({'calls': calls, 'page': 0, 'page_size': len(calls),
+                        'next_page_uri': None, 'start': 0,
+                        'end': max(len(calls) - 1, 0)})
+
+    @app.route('/2010-04-01/Accounts/<account_sid>/Calls/<call_sid>.json')
+    def fetch_call(account_sid, call_sid):
+        call = store.calls.get(call_sid)
+        if call is None:
+            raise LookupError(f'Call {call_sid} not found')
+        return jsonify(public(call))
+
+    @app.errorhandler(LookupError)
+    def not_found(e):
+        return error(404, 20404, str(e).strip("'\""))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--app-url',
+                        help='flaskapp url to post call webhooks to')
+    parser.add_argument('--cps', type=float, default=0.0,
+                        help='inbound calls per second (needs --app-url)')
+    parser.add_argument('--calls', type=int, default=0,
+                        help='total inbound calls, 0 - until stopped')
+    parser.add_argument('--users', type=int, default=1000,
+                        help='existing users in synthetic spreadsheet')
+    parser.add_argument('--steps', type=int, default=12,
+                        help='the number of steps of Studio executions')
+    add_fault_options(parser, quota_window=1.0)
+    args = parser.parse_args()
+
+    store = TwilioStore(steps=args.steps)
+    driver = CallDriver(args.app_url, on_call=store.add_call) \
+        if args.app_url else None
+    app = create_app(store, fault_injector_from_args(args), driver)
+
+    if driver and args.cps:
+        threading.Thread(
+            target=driver.run, daemon=True,
+            args=(synthetic_phones(args.users), args.cps,
+                  args.calls or 10 ** 9)
+        ).start()
+
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,29 @@
 import sys
+import argparse
+import logging
 import subprocess
 
 from multiprocessing import Process
 from threading import Thread, Event,Lock
 
-WORKER_CMD = ['celery', '-A', 'taskscheduler.celery_app', 'worker', '-c', '5', '--loglevel=info']
 BEAT_CMD = ['celery', '-A', 'taskscheduler.celery_app', 'beat', '--loglevel=info']
 POOL = {}
 lock = Lock()
 event = Event()
 
-def start_worker():
+def start_worker(queue):
+    ''' Starts a worker dedicated to the queue (see celeryconfig.QUEUES) '''
     global POOL
-    worker_process = subprocess.Popen(args=WORKER_CMD, stdout=subprocess.PIPE)
+    from taskscheduler.celeryconfig import QUEUES
+    from taskscheduler.supervisor import worker_cmd
+    options = QUEUES[queue]
+    cmd = worker_cmd(queue=queue, options=options) + \
+        ['-c', str(options['concurrency']), '-n', f'{queue}@%h']
+    worker_process = subprocess.Popen(args=cmd)
     lock.acquire()
-    with open('worker_pid.PID',"w") as fd:
+    with open(f'worker_{queue}_pid.PID',"w") as fd:
         fd.write(str(worker_process.pid))
-    POOL["worker_process"]=worker_process
+    POOL[f"worker_{queue}_process"]=worker_process
     print(POOL)
     lock.release()
     
@@ -37,18 +44,76 @@ def shutdown():
     print("Shuting down the processes")
     print(POOL)
     b = POOL.get("beat_process")
-    w = POOL.get("worker_process")
     b.terminate()
     print(f"Beat terminated")
-    w.terminate()
+    for name, w in POOL.items():
+        if name.startswith("worker_"):
+            w.terminate()
     print("workers terminated")
 
 
+def supervise(args):
+    from celery.utils.imports import symbol_by_name
+    from taskscheduler.celeryconfig import QUEUES
+    from taskscheduler.supervisor import (Supervisor, BrokerProbe, run,
+                                          worker_cmd, beat_cmd)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+    app = symbol_by_name(args.app)
+    supervisors = []
+    for queue in args.queues:
+        options = QUEUES.get(queue, {})
+        supervisors.append(Supervisor(
+            BrokerProbe(app, [queue]), name=queue,
+            min_workers=args.min_workers, max_workers=args.max_workers,
+            concurrency=args.concurrency or options.get('concurrency', 5),
+            depth_per_worker=args.depth_per_worker,
+            target_latency=args.target_latency, interval=args.interval,
+            cooldown=args.cooldown, drain_timeout=args.drain_timeout,
+            beat=not (args.no_beat or supervisors),  # the only one
+            worker_cmd=worker_cmd(args.app, queue, options),
+            beat_cmd=beat_cmd(args.app)))
+    run(supervisors)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Start celery worker and beat')
+    parser.add_argument('--supervise', action='store_true',
+                        help='scale workers by queue depth/latency, restart crashed ones')
+    parser.add_argument('--app', default='taskscheduler.celery_app',
+                        help='celery app of supervised workers')
+    parser.add_argument('--min-workers', type=int, default=1)
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=0,
+                        help='concurrency (-c) of every worker process, '
+                             'defaults to the one of the queue (celeryconfig.py)')
+    parser.add_argument('--queues', nargs='+', default=None,
+                        help='queues to start workers for, all by default')
+    parser.add_argument('--depth-per-worker', type=int, default=100,
+                        help='add a worker if the queue is deeper')
+    parser.add_argument('--target-latency', type=float, default=5.0,
+                        help='add a worker if tasks wait longer (seconds)')
+    parser.add_argument('--interval', type=float, default=5.0)
+    parser.add_argument('--cooldown', type=float, default=30.0,
+                        help='min number of seconds between scaling')
+    parser.add_argument('--drain-timeout', type=float, default=60.0)
+    parser.add_argument('--no-beat', action='store_true')
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.queues is None:
+        from taskscheduler.celeryconfig import QUEUES
+        args.queues = list(QUEUES)
+    if args.supervise:
+        supervise(args)
+        sys.exit()
 
     try:
-        t_worker = Thread(target=start_worker,daemon=True)
-        t_worker.start()
+        for queue in args.queues:
+            t_worker = Thread(target=start_worker,args=(queue,),daemon=True)
+            t_worker.start()
         t_beat = Thread(target=start_beat,daemon=True)
         t_beat.start()
         event.wait()
@@ -0,0 +1,79 @@
+''' Dispatch benchmark: per-job apply_async loop vs chunked fan_out
+
+    python -m taskscheduler.bench --jobs 100000 --chunk-size 500
+
+    Uses in-memory broker, so only the client side (serialization,
+    publishing) is measured.
+'''
+import argparse
+import time
+
+from .tools import CeleryTask
+
+
+def make_app(broker_url='memory://'):
+    app = CeleryTask('Dispatch-Benchmark', broker=broker_url)
+
+    @app.create_beat(name='bench-beat')
+    def bench_beat(items, chunk_size):
+        return app.fan_out(app.get_plugged_tasklist(), items,
+                           chunk_size=chunk_size)
+
+    @app.add_task(plug_to='bench-beat')
+    def proxy_bench_job(item):
+        return item
+
+    return app, bench_beat, proxy_bench_job
+
+
+def queue_size(app, queue='celery'):
+    with app.connection_for_write() as conn:
+        return conn.default_channel.queue_declare(queue, passive=True).message_count
+
+
+def purge(app, *queues):
+    with app.connection_for_write() as conn:
+        for queue in queues or ['celery']:
+            conn.default_channel.queue_purge(queue)
+
+
+def bench_loop(app, task, items):
+    start = time.perf_counter()
+    for item in items:
+        task.apply_async(args=(item,))
+    return time.perf_counter() - start
+
+
+def bench_fan_out(beat, items, chunk_size):
+    start = time.perf_counter()
+    beat(items, chunk_size)
+    return time.perf_counter() - start
+
+
+def run(jobs=100000, chunk_size=500, broker_url='memory://'):
+    app, beat, task = make_app(broker_url)
+    items = [(n, f'+1555{n:07d}', 'UTC') for n in range(jobs)]
+    results = {}
+    for name, bench in (('apply_async loop', lambda: bench_loop(app, task, items)),
+                        ('fan_out', lambda: bench_fan_out(beat, items, chunk_size))):
+        purge(app)
+        elapsed = bench()
+        results[name] = (elapsed, queue_size(app))
+    purge(app)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--broker', default='memory://')
+    args = parser.parse_args(argv)
+    results = run(args.jobs, args.chunk_size, args.broker)
+    for name, (elapsed, messages) in results.items():
+        print(f'{name:18} {args.jobs} jobs  {messages:7} messages  '
+              f'{elapsed:8.2f}s  {args.jobs / elapsed:10.0f} jobs/s')
+
+
+if __name__ == '__main__':
+    main()
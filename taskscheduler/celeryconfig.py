@@ -1,18 +1,38 @@
 from datetime import timedelta
+import json
 import os
+from kombu import Queue
 # Default timezone is UTC for celery
 '''
 Don't forget define BROKER_URL as local variable:
  for local machine os.environ['BROKER_URL'] = pyamqp://guest@localhost//
  for HEROKU instance os.environ['BROKER_URL'] - get result of command line: heroku config | grep CLOUDAMQP_URL
 '''
+# Queues and settings of their dedicated workers (see start_scheduler.py);
+# route a beat/task by create_beat(queue=...)/add_task(queue=...)
+#   realtime - time-sensitive calls to users, short tasks
+#   io       - tasks waiting for external APIs (twilio, google)
+#   bulk     - long syncs and batch jobs (default queue)
+QUEUES = {
+    'realtime':{'concurrency':8, 'prefetch_multiplier':1, 'soft_time_limit':60, 'time_limit':90},
+    'io':{'concurrency':16, 'prefetch_multiplier':1, 'soft_time_limit':600, 'time_limit':660},
+    'bulk':{'concurrency':2, 'prefetch_multiplier':1, 'soft_time_limit':4 * 3600, 'time_limit':4 * 3600 + 300},
+}
+DEFAULT_QUEUE = 'bulk'
+
 config = {
     "broker_url":os.environ['BROKER_URL'],
+    # json, e.g. folders of filesystem:// broker (see loadtest/broker.py)
+    "broker_transport_options":json.loads(os.environ.get('BROKER_TRANSPORT_OPTIONS', '{}')),
     "task_serializer":"json",
     "result_serializer":'json',
     "accept_content":['json'],
     # "timezone":'',
     "enable_utc":True,
+    "task_queues":[Queue(name) for name in QUEUES],
+    "task_default_queue":DEFAULT_QUEUE,
+    # calls per message sent by celery_app.fan_out
+    "fan_out_chunk_size":int(os.environ.get('FAN_OUT_CHUNK_SIZE', 500)),
     "beat_schedule":{
     'weekly-profile-details':{
         'task':'get-profile-details-weekly',
@@ -22,8 +42,17 @@ config = {
         'task':'gspread_to_postgres',
         'schedule':timedelta(days=2)
     },
-    'daily-profile-details-daily':{
-        'task':'get-profile-details-daily',
+    'sheets-mirror':{
+        'task':'sheets-mirror',
+        'schedule':timedelta(minutes=int(os.environ.get('SHEETS_MIRROR_INTERVAL', 10)))
+    },
+    'users-reconcile':{
+        'task':'users-reconcile',
+        'schedule':timedelta(days=1)
+    },
+    # calls are planned once a day (see planner.py)
+    'daily-call-planning':{
+        'task':'schedule-tasks-from-DB',
         'schedule':timedelta(days=1)
                             }
 }
@@ -0,0 +1,165 @@
+''' Daily call planner
+
+    Every active user is called at the start of the next local call window
+    (`User.call_window_start`/`call_window_end` or CALL_WINDOW_* settings).
+    Calls are bucketed per UTC minute, at most CALLS_PER_MINUTE_MAX calls
+    per minute (the rest is moved to the next minutes), and every bucket
+    is sent as chunked jobs with eta (see CeleryTask.fan_out).
+'''
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+import pytz
+
+logger = logging.getLogger(__name__)
+
+USER_COLUMNS = ['id', 'phone', 'username', 'timezone',
+                'window_start', 'window_end']
+
+# Columns passed to plugged tasks (one tuple per user)
+ITEM_COLUMNS = ['phone', 'username', 'timezone']
+
+TIMEZONES = list(pytz.all_timezones)
+
+
+def load_users():
+    ''' Active users with phone number, time zone and call window
+        (read through the shared database pool); a user with several
+        phone numbers is called once, at the first added one '''
+    from flaskapp.models.bases import db_proxy
+    from flaskapp.models.ivr_models import User, PhoneNumber
+    query = (User
+             .select(User.id, PhoneNumber.number, User.username,
+                     User.timezone, User.call_window_start,
+                     User.call_window_end)
+             .join(PhoneNumber, on=(PhoneNumber.user == User.id))
+             .where(User.status == 'A')
+             .order_by(User.id, PhoneNumber.id)
+             .tuples())
+    with db_proxy.obj.connection_context():
+        rows = list(query)
+    users = pd.DataFrame(rows, columns=USER_COLUMNS)
+    return users.drop_duplicates('id', ignore_index=True)
+
+
+def to_offsets(times, default):
+    ''' Local times (datetime.time, 'HH:MM[:SS]' or None) as timedeltas '''
+    default = datetime.time.fromisoformat(default) \
+        if isinstance(default, str) else default
+    times = times.where(times.notna(), default).astype(str)
+    offsets = {value: pd.Timedelta(value) for value in times.unique()}
+    return times.map(offsets).astype('timedelta64[ns]')
+
+
+def localize(naive, zone):
+    ''' Local wall-clock datetimes to UTC (DST gaps are shifted forward,
+        ambiguous times are taken as DST ones) '''
+    return (naive.dt.tz_localize(zone,
+                                 ambiguous=np.ones(len(naive), dtype=bool),
+                                 nonexistent='shift_forward')
+            .dt.tz_convert('UTC'))
+
+
+def next_windows(users, now, window_start, window_end, default_timezone):
+    ''' UTC start and end of the current (if not over yet) or the next
+        call window of every user '''
+    start = to_offsets(users['window_start'], window_start)
+    end = to_offsets(users['window_end'], window_end)
+    end = end.where(end > start, end + pd.Timedelta(days=1))  # overnight
+    zones = users['timezone'].where(users['timezone'].isin(TIMEZONES),
+                                    default_timezone)
+    starts = pd.Series(pd.NaT, index=users.index, dtype='datetime64[ns, UTC]')
+    ends = starts.copy()
+    for zone, index in zones.groupby(zones).groups.items():
+        today = now.tz_convert(zone).tz_localize(None).normalize()
+        for days in (1, 0):  # today's window wins if it is not over yet
+            day = today + pd.Timedelta(days=days)
+            day_ends = localize(day + end[index], zone)
+            if days == 0:
+                day_ends = day_ends[day_ends > now]
+            keep = day_ends.index
+            starts.loc[keep] = localize(day + start[keep], zone)
+            ends.loc[keep] = day_ends
+    return starts.where(starts > now, now), ends
+
+
+def spread(minutes, max_per_minute):
+    ''' Assigns minutes no earlier than desired ones (first come,
+        first served), at most `max_per_minute` per minute
+
+        :param minutes: desired minutes (numpy int64 array)
+    '''
+    order = np.argsort(minutes, kind='stable')
+    desired, counts = np.unique(minutes[order], return_counts=True)
+    assigned = np.empty(len(minutes), dtype=np.int64)
+    free, used, pos = (desired[0] if len(desired) else 0), 0, 0
+    for minute, count in zip(desired, counts):
+        if minute > free:
+            free, used = minute, 0
+        places = used + np.arange(count)
+        assigned[order[pos:pos + count]] = free + places // max_per_minute
+        pos += count
+        free, used = (free + (used + count) // max_per_minute,
+                      (used + count) % max_per_minute)
+    return assigned
+
+
+def plan_calls(users, now=None, window_start=None, window_end=None,
+               default_timezone=None, max_per_minute=None):
+    ''' Returns users (DataFrame, see load_users) with 'slot' (UTC minute
+        of the call) and 'late' (slot is after the end of the window)
+        columns, ordered by slot '''
+    from flaskapp import settings
+    now = pd.Timestamp(now or datetime.datetime.utcnow())
+    now = now.tz_localize('UTC') if now.tzinfo is None else now.tz_convert('UTC')
+    window_start = window_start or settings.CALL_WINDOW_START
+    window_end = window_end or settings.CALL_WINDOW_END
+    default_timezone = default_timezone or settings.DEFAULT_TIMEZONE
+    max_per_minute = max_per_minute or settings.CALLS_PER_MINUTE_MAX
+
+    plan = users.copy()
+    if plan.empty:
+        return plan.assign(slot=pd.Series(dtype='datetime64[ns, UTC]'),
+                           late=pd.Series(dtype=bool))
+    starts, ends = next_windows(plan, now, window_start, window_end,
+                                default_timezone)
+    minutes = (starts.dt.ceil('min').values
+               .astype('datetime64[m]').astype(np.int64))
+    plan['slot'] = pd.to_datetime(spread(minutes, max_per_minute),
+                                  unit='m', utc=True)
+    plan['late'] = plan['slot'] >= ends
+    return plan.sort_values('slot', kind='stable')
+
+
+def summary(plan):
+    ''' Short description of the plan (for logs) '''
+    if plan.empty:
+        return {'users': 0, 'slots': 0}
+    per_slot = plan.groupby('slot').size()
+    return {'users': len(plan),
+            'slots': len(per_slot),
+            'max_per_slot': int(per_slot.max()),
+            'late': int(plan['late'].sum()),
+            'first': plan['slot'].iloc[0].isoformat(),
+            'last': plan['slot'].iloc[-1].isoformat()}
+
+
+def enqueue(app, tasks, plan, columns=ITEM_COLUMNS, **options):
+    ''' Sends every slot bucket of the plan to the tasks as chunked
+        jobs with eta; returns the number of sent messages '''
+    sent = 0
+    for slot, bucket in plan.groupby('slot', sort=True):
+        items = bucket[columns].itertuples(index=False, name=None)
+        sent += app.fan_out(tasks, items, eta=slot.to_pydatetime(),
+                            **options)
+    return sent
+
+
+def schedule_calls(app, tasks, now=None, **options):
+    ''' Plans calls of all active users and enqueues them to the tasks '''
+    plan = plan_calls(load_users(), now=now)
+    info = summary(plan)
+    info['messages'] = enqueue(app, tasks or {}, plan, **options)
+    logger.info('Calls planned: %s', info)
+    return info
@@ -1,7 +1,5 @@
-from datetime import timedelta,datetime
-from .tasks import celery_app
+from .tasks import celery_app, PROFILE_DETAILS_BEAT
 from .celeryconfig import config
-from peewee import *
 
 ### update config ###
 celery_app.conf.update(config)
@@ -10,42 +8,44 @@ celery_app.conf.update(config)
 
 ##### define heart beet tasks ########
 
-@celery_app.create_beat(name= 'schedule-tasks-from-DB')
+@celery_app.create_beat(name= 'schedule-tasks-from-DB', queue='realtime', lock='schedule-calls')
 def get_data_and_schedule_call():
-    db = PostgresqlDatabase('patient', user='postgres', password='test123',host='127.0.0.1',port=5432)
-    cur = db.execute_sql('select phone,username,timezone from patient')
-    val = cur.fetchall()
-    plugged_task_list =celery_app.get_plugged_tasklist()
+    ''' Schedules plugged tasks of every active user at the start
+        of the user's call window (see planner.py) '''
+    from .planner import schedule_calls
+    return schedule_calls(celery_app, celery_app.get_plugged_tasklist())
 
-    #####################
-    time = datetime.utcnow() + timedelta(seconds=7)
-    # THE above line should be replaced with the timezone eta column in DB for each user
 
-    for i in val:
-        for t_name ,task in plugged_task_list.items():
-            task.apply_async(args=(i,),eta=time)
 
-
-
-@celery_app.create_beat(name='get-profile-details-weekly')
+@celery_app.create_beat(name=PROFILE_DETAILS_BEAT, queue='bulk', lock=True)
 def get_profile_details():
     
     ''' Not using any task function because calling the function 
-        directly inside the beat which is scheduled weekly'''
+        directly inside the beat which is scheduled weekly;
+        a crashed run is resumed from the last processed row'''
     
     from flaskapp.core.ivr_core import profile_detail
-    profile_detail()
+    profile_detail(checkpoint=celery_app.get_checkpoint())
 
-@celery_app.create_beat(name='gspread_to_postgres')
+@celery_app.create_beat(name='gspread_to_postgres', queue='bulk', lock=True)
 def gspread_to_postgess():
     ''' Copies google_sheets to postgres every 2 days '''
 
     from gspread_to_postgres import execute
     execute()
-@celery_app.create_beat(name= 'get-profile-details-daily')
-def get_profile_details_daily():
-    plugged_task_list =celery_app.get_plugged_tasklist()
-    time_min = datetime.utcnow().replace(hour=19, minute=00, second=00, microsecond=00000)
 
-    for t_name ,task in plugged_task_list.items():
-        task.apply_async(args=(1,),eta=time_min)
\ No newline at end of file
+@celery_app.create_beat(name='sheets-mirror', queue='io', lock=True)
+def mirror_users_to_sheet():
+    ''' Writes users changed in postgres to the Users sheet
+        in batches (see flaskapp/core/sheets_mirror.py) '''
+
+    from flaskapp.core.sheets_mirror import mirror_users
+    return mirror_users()
+
+@celery_app.create_beat(name='users-reconcile', queue='io', lock=True)
+def reconcile_users():
+    ''' Compares the Users sheet with users in postgres, repairs
+        the side set by RECONCILE_REPAIR (see flaskapp/core/reconcile.py) '''
+
+    from flaskapp.core.reconcile import reconcile_users
+    return reconcile_users()
@@ -0,0 +1,292 @@
+''' Supervisor of celery worker/beat processes (start_scheduler.py --supervise)
+
+    * the number of worker processes follows the load: it grows while
+      the queue is deeper than `depth_per_worker` messages per worker or
+      tasks wait in the queue longer than `target_latency` seconds, and
+      shrinks after `idle_ticks` checks of empty queue and low latency;
+    * crashed children are restarted with exponential backoff;
+    * SIGTERM/SIGINT drains: beat is stopped, workers get SIGTERM
+      (celery warm shutdown: running tasks are finished) and are killed
+      only after `drain_timeout` seconds.
+
+    There is one supervisor per queue (see celeryconfig.QUEUES), each one
+    scales workers dedicated to its queue. Decisions are logged and
+    recorded as `buzznet_scheduler_workers` metric.
+'''
+import logging
+import signal
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+APP = 'taskscheduler.celery_app'
+
+
+def worker_cmd(app=APP, queue=None, options=None):
+    ''' Worker command (without concurrency and node name); `options`
+        are prefetch multiplier and time limits of the queue '''
+    cmd = ['celery', '-A', app, 'worker', '--loglevel=info']
+    if queue:
+        cmd += ['-Q', queue]
+    for name, value in (options or {}).items():
+        if name != 'concurrency':
+            cmd.append(f"--{name.replace('_', '-')}={value}")
+    return cmd
+
+
+def beat_cmd(app=APP):
+    return ['celery', '-A', app, 'beat', '--loglevel=info']
+
+
+class BrokerProbe:
+    ''' Reads depth of queues from the broker and mean time tasks spent
+        in the queue (reported by workers through the metrics directory)
+        since the previous read '''
+
+    def __init__(self, app, queues=('celery',), registry=None):
+        from flaskapp.tools.metrics import registry as default_registry
+        self.app = app
+        self.queues = list(queues)
+        self.registry = registry or default_registry
+        self._last = None
+
+    def depth(self):
+        total = 0
+        for queue in self.queues:
+            with self.app.connection_for_write() as conn:
+                try:
+                    total += conn.default_channel.queue_declare(
+                        queue, passive=True).message_count
+                except conn.channel_errors as e:  # not declared yet
+                    logger.debug(f'Depth of {queue} is unknown: {e}')
+        return total
+
+    def latency(self):
+        from flaskapp.tools.metrics import TASK_QUEUE_METRIC
+        totals = {}
+        for (metric, labels), (_, total, count) in \
+                self.registry.collect().items():
+            queue = dict(labels).get('queue')
+            if metric == TASK_QUEUE_METRIC and queue in self.queues:
+                totals[queue] = (total, count)
+        if self._last is None:  # older values aren't current latency
+            self._last = totals
+            return 0.0
+        total = count = 0
+        for queue, (queue_total, queue_count) in totals.items():
+            last_total, last_count = self._last.get(queue, (0.0, 0))
+            total += queue_total - last_total
+            count += queue_count - last_count
+        self._last = totals
+        return total / count if count > 0 else 0.0
+
+
+class Child:
+    ''' A supervised process '''
+
+    def __init__(self, name, cmd):
+        self.name = name
+        self.cmd = cmd
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.restart_at = 0.0
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+
+class Supervisor:
+    def __init__(self, probe, min_workers=1, max_workers=4, concurrency=5,
+                 depth_per_worker=100, target_latency=5.0, idle_ticks=6,
+                 interval=5.0, cooldown=30.0, backoff=1.0, max_backoff=60.0,
+                 stable_after=60.0, drain_timeout=60.0, beat=True,
+                 name='worker', worker_cmd=worker_cmd(), beat_cmd=beat_cmd(),
+                 popen=subprocess.Popen, clock=time.monotonic):
+        if not 0 < min_workers <= max_workers:
+            raise ValueError('0 < min_workers <= max_workers is required')
+        self.probe = probe
+        self.name = name
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self.depth_per_worker = depth_per_worker
+        self.target_latency = target_latency
+        self.idle_ticks = idle_ticks
+        self.interval = interval
+        self.cooldown = cooldown
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.drain_timeout = drain_timeout
+        self.worker_cmd = list(worker_cmd)
+        self.popen = popen
+        self.clock = clock
+        self.beat = Child('beat', list(beat_cmd)) if beat else None
+        self.workers = []
+        self.retiring = []  # scaled down workers finishing their tasks
+        self._draining = []
+        self.stopping = False
+        self._serial = 0
+        self._idle = 0
+        self._last_scale = None
+
+    # ---------- children ----------
+
+    def _start(self, child):
+        child.process = self.popen(child.cmd)
+        child.started_at = self.clock()
+        logger.info(f'Started {child.name} (pid {child.process.pid})')
+
+    def _new_worker(self):
+        self._serial += 1
+        name = f'{self.name}{self._serial}'
+        cmd = self.worker_cmd + ['-c', str(self.concurrency),
+                                 '-n', f'{name}@%h']
+        child = Child(name, cmd)
+        self._start(child)
+        self.workers.append(child)
+        return child
+
+    def _record(self, action, reason=''):
+        from flaskapp.tools.metrics import registry, WORKERS_METRIC
+        registry.observe(WORKERS_METRIC, len(self.workers), action=action,
+                         pool=self.name)
+        logger.info(f'[{action}] {self.name} workers: {len(self.workers)} '
+                    f'{reason}')
+
+    def _check(self, child):
+        ''' Restarts crashed child (with backoff) '''
+        if child.running:
+            if child.restarts and \
+                    self.clock() - child.started_at > self.stable_after:
+                child.restarts = 0
+            return
+        now = self.clock()
+        if not child.restart_at:
+            code = child.process.returncode if child.process else None
+            delay = min(self.backoff * 2 ** child.restarts, self.max_backoff)
+            child.restart_at = now + delay
+            logger.warning(f'{child.name} exited with {code}, '
+                           f'restarting in {delay:.1f}s')
+        elif now >= child.restart_at:
+            child.restarts += 1
+            child.restart_at = 0.0
+            self._start(child)
+            self._record('restart', child.name)
+
+    # ---------- scaling ----------
+
+    def decide(self, depth, latency):
+        ''' Returns +1, -1 or 0 (change of the number of workers) '''
+        workers = len(self.workers)
+        busy = depth > self.depth_per_worker * workers or \
+            latency > self.target_latency
+        idle = depth == 0 and latency <= self.target_latency / 2
+        self._idle = self._idle + 1 if idle else 0
+        if self._last_scale is not None and \
+                self.clock() - self._last_scale < self.cooldown:
+            return 0
+        if busy and workers < self.max_workers:
+            return 1
+        if self._idle >= self.idle_ticks and workers > self.min_workers:
+            return -1
+        return 0
+
+    def scale(self, change, reason=''):
+        if change > 0:
+            self._new_worker()
+            self._record('scale_up', reason)
+        elif change < 0:
+            child = self.workers.pop()  # the youngest one
+            if child.running:
+                child.process.terminate()  # warm shutdown
+                self.retiring.append(child)
+            self._record('scale_down', reason)
+            self._idle = 0
+        if change:
+            self._last_scale = self.clock()
+
+    def tick(self):
+        self.retiring = [child for child in self.retiring if child.running]
+        for child in self.workers + ([self.beat] if self.beat else []):
+            self._check(child)
+        try:
+            depth, latency = self.probe.depth(), self.probe.latency()
+        except Exception as e:
+            logger.error(f'Broker probe failed: {e}')
+            return
+        change = self.decide(depth, latency)
+        self.scale(change, f'(queue depth {depth}, latency {latency:.2f}s)')
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if self.beat:
+            self._start(self.beat)
+        for _ in range(self.min_workers):
+            self._new_worker()
+        self._record('start')
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def terminate(self):
+        ''' Stops beat and asks workers to finish running tasks '''
+        logger.info(f'Draining {self.name}')
+        self._draining = ([self.beat] if self.beat else []) + \
+            self.workers + self.retiring
+        for child in self._draining:
+            if child.running:
+                child.process.terminate()
+
+    def wait(self, deadline):
+        ''' Waits for terminated children, kills them after the deadline '''
+        for child in self._draining:
+            if child.process is None:
+                continue
+            try:
+                child.process.wait(timeout=max(deadline - self.clock(), 0))
+            except subprocess.TimeoutExpired:
+                logger.warning(f'{child.name} is killed after '
+                               f'{self.drain_timeout}s of draining')
+                child.process.kill()
+                child.process.wait()
+        self.workers, self.retiring, self._draining = [], [], []
+        self._record('drain')
+
+    def drain(self):
+        self.terminate()
+        self.wait(self.clock() + self.drain_timeout)
+
+    def run(self):
+        run([self])
+
+
+def run(supervisors):
+    ''' Runs supervisors (e.g. one per queue) until SIGTERM/SIGINT '''
+    def stop(*args):
+        for supervisor in supervisors:
+            supervisor.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    first = supervisors[0]
+    for supervisor in supervisors:
+        supervisor.start()
+    try:
+        while not first.stopping:
+            for supervisor in supervisors:
+                supervisor.tick()
+            deadline = first.clock() + first.interval
+            while not first.stopping and first.clock() < deadline:
+                time.sleep(min(0.5, first.interval))
+    finally:
+        for supervisor in supervisors:
+            supervisor.terminate()
+        deadline = first.clock() + max(supervisor.drain_timeout
+                                       for supervisor in supervisors)
+        for supervisor in supervisors:
+            supervisor.wait(deadline)
@@ -1,5 +1,8 @@
+import logging
 from .tools import CeleryTask
 
+logger = logging.getLogger(__name__)
+
 #########################################
 # celelry application : dont change or delete
 
@@ -7,12 +10,28 @@ celery_app = CeleryTask('Task-Scheduler')
 
 #########################################
 
+# weekly beat asking users for missing profile details; its name
+# is the lock and checkpoint shared with proxy_task1
+PROFILE_DETAILS_BEAT = 'get-profile-details-weekly'
+
 
 ##### define proxy tasks for you tasks below #######
 
 
-@celery_app.add_task(plug_to='schedule-tasks-from-DB')
+# a full pass over the Users sheet with a Twilio flow per missing field,
+# far longer than the time limits of realtime workers
+@celery_app.add_task(plug_to='schedule-tasks-from-DB', queue='bulk')
 # @celery_app.block_exc
 def proxy_task1(*arg, **kw):
+    ''' The same pass as get-profile-details-weekly beat: it shares its
+        lock (a user is never asked twice at the same time) and its
+        checkpoint '''
     from flaskapp.core.ivr_core import profile_detail
-    profile_detail()
\ No newline at end of file
+    from flaskapp.models.beats import AdvisoryLock
+    with AdvisoryLock(PROFILE_DETAILS_BEAT) as acquired:
+        if not acquired:
+            logger.warning(f'proxy_task1 is skipped: {PROFILE_DETAILS_BEAT} '
+                           'is locked by another run')
+            return
+        profile_detail(checkpoint=celery_app.get_checkpoint(
+            PROFILE_DETAILS_BEAT))
\ No newline at end of file
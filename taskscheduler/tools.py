@@ -1,17 +1,89 @@
-import inspect
-from celery import Celery
+import time
+import logging
+from contextvars import ContextVar
+from datetime import datetime
+from celery import Celery, current_task
+from celery.signals import before_task_publish, task_prerun
 from functools import wraps 
 from celery.local import PromiseProxy
 from celery.app.registry import TaskRegistry
 
+logger = logging.getLogger(__name__)
+
+
+###### trace context propagation ####################
+
+@before_task_publish.connect
+def propagate_trace_context(headers=None, **kw):
+    ''' Adds trace context of the publishing beat/task to the message headers '''
+    from flaskapp.tools.tracing import current_traceparent
+    traceparent = current_traceparent()
+    if traceparent and headers is not None:
+        headers.setdefault('traceparent', traceparent)
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **kw):
+    ''' Adds publishing time to the message headers (see observe_queue_time) '''
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def observe_queue_time(task=None, **kw):
+    ''' Records time the task spent in the queue (since publishing or eta);
+        the supervisor of workers scales them by it '''
+    from flaskapp.tools.metrics import registry, TASK_QUEUE_METRIC
+    request = task.request if task else None
+    published_at = request.get('published_at') if request else None
+    if not published_at:
+        return
+    ready_at = published_at
+    if request.eta:
+        eta = request.eta if isinstance(request.eta, datetime) \
+            else datetime.fromisoformat(request.eta)
+        ready_at = max(ready_at, eta.timestamp())
+    queue = (request.delivery_info or {}).get('routing_key') or ''
+    registry.observe(TASK_QUEUE_METRIC, max(time.time() - ready_at, 0.0),
+                     queue=queue)
+
+
+def traced_call(span_name, fun, *a, **kw):
+    ''' Calls the function inside a span continuing the trace of the publisher,
+        a sample of calls (PROFILER_TASK_SAMPLE_RATE) is profiled as well
+        and executed queries are checked against QUERY_TASK_BUDGET '''
+    from flaskapp.tools.tracing import tracer
+    from flaskapp.tools.querystats import track_queries
+    from flaskapp.tools.profiler import (SamplingProfiler, profile_store,
+                                         should_profile)
+    from flaskapp.settings import PROFILER_TASK_SAMPLE_RATE, QUERY_TASK_BUDGET
+    request = current_task.request if current_task else None
+    traceparent = request.get('traceparent') if request else None
+    profiler = None
+    if should_profile(sample_rate=PROFILER_TASK_SAMPLE_RATE):
+        profiler = SamplingProfiler().start()
+    try:
+        with tracer.span(span_name, traceparent=traceparent), \
+                track_queries(span_name, budget=QUERY_TASK_BUDGET):
+            return fun(*a, **kw)
+    finally:
+        if profiler is not None:
+            profile_store.save(profiler.stop(), span_name,
+                               request.id if request else None)
+
 
 ###### model class to customize celery ##############
 
 class CeleryTask(Celery):
+    # jobs per message sent by fan_out (overridden by 'fan_out_chunk_size' in config)
+    fan_out_chunk_size = 500
+
     def __init__(self,*args,**kw):
         self.blocked_registry = {}
         self.beat_registry =  {}
         self.translate_fun_to_name= {}
+        # name of the beat being executed (set by create_beat wrapper)
+        self.current_beat = ContextVar('current_beat', default=None)
         super().__init__(*args,**kw)
 
     def add_logs(self,fun)-> 'Decorator':
@@ -31,7 +103,7 @@ class CeleryTask(Celery):
             return None
         return fun
     
-    def add_task(self,plug_to=None)-> 'Decorator':
+    def add_task(self,plug_to=None,queue=None)-> 'Decorator':
         if not isinstance (plug_to,str) and not plug_to == None:
             msg = f"[X] {plug_to} should be string or arg plug_to is required\n[params]:@add_task(plug_to=None)or str value"
             raise  AttributeError(msg)
@@ -42,10 +114,10 @@ class CeleryTask(Celery):
             if not fun.__name__.startswith('proxy_'):
                 msg = '[X] use the prefix "proxy_" before the function definition ,or use the "@task" decorator'
                 raise RuntimeError(msg)
-            @self.task
+            @self.task(queue=queue)
             @wraps(fun)
             def task(*a,**kw):
-                fun(*a,**kw)
+                traced_call(f'task {fun.__name__}', fun, *a, **kw)
                 return
             if beat_name:
                 self.beat_registry.setdefault(beat_name,dict())[task.__name__] = task
@@ -53,7 +125,10 @@ class CeleryTask(Celery):
         return add_task_proxy
 
 
-    def create_beat(self,name=None)-> 'Decorator':
+    def create_beat(self,name=None,queue=None,lock=False)-> 'Decorator':
+        ''' lock: True (or lock name shared by several beats) - the beat is
+            skipped if its previous run (or a beat with the same lock) is
+            still running anywhere in the cluster '''
         if not isinstance (name,str):
             msg = f"[X] {name} should be string or arg name is required\n[params]:@create_beat(name='name-defined-in-config')"
             raise  AttributeError(msg)
@@ -62,23 +137,62 @@ class CeleryTask(Celery):
                 msg = f"function {fun.__name__} already mapped to {self.translate_fun_to_name[fun.__name__]} "
                 raise KeyError(msg)
             self.translate_fun_to_name[fun.__name__] = name
-            @self.task(name=name)
+            @self.task(name=name,queue=queue)
             @wraps(fun)
             def task(*a,**kw):
-                return fun(*a,**kw)
+                token = self.current_beat.set(name)
+                try:
+                    if not lock:
+                        return traced_call(f'beat {name}', fun, *a, **kw)
+                    from flaskapp.models.beats import AdvisoryLock
+                    lock_name = lock if isinstance(lock, str) else name
+                    with AdvisoryLock(lock_name) as acquired:
+                        if not acquired:
+                            logger.warning(f'{name} is skipped: {lock_name} '
+                                           'is locked by another run')
+                            return
+                        return traced_call(f'beat {name}', fun, *a, **kw)
+                finally:
+                    self.current_beat.reset(token)
             return task
         return decorator
 
-    def get_plugged_tasklist(self) -> dict:
-        curframe = inspect.currentframe()
-        calframe = inspect.getouterframes(curframe, 2)
-        calfun =  calframe[1][3]
-        mapped_name=self.translate_fun_to_name.get(calfun)
-        if mapped_name:
-            task_map = self.beat_registry.get(mapped_name)
-            return task_map
+    def get_plugged_tasklist(self, beat=None) -> dict:
+        ''' Returns tasks plugged to the beat (the running one by default) '''
+        beat_name = beat or self.current_beat.get()
+        if beat_name:
+            return self.beat_registry.get(beat_name, {})
         return
 
+    def get_checkpoint(self, beat=None):
+        ''' Checkpoint of the beat (the running one by default), see
+            flaskapp.models.beats.Checkpoint '''
+        from flaskapp.models.beats import Checkpoint
+        return Checkpoint(beat or self.current_beat.get())
+
+    def fan_out(self, tasks, items, chunk_size=None, **options) -> int:
+        ''' Calls every task once per item (passed as the only argument);
+            calls are packed into chunks of `chunk_size` items, each chunk
+            is a single message (celery.chunks) and all chunks of a task
+            are published as one group over one producer connection.
+            `options` are passed to apply_async (eta, countdown, queue...);
+            chunks go to the queue of the task unless `queue` is given.
+            Returns the number of sent messages '''
+        if isinstance(tasks, dict):
+            tasks = tasks.values()
+        chunk_size = chunk_size or self.conf.get('fan_out_chunk_size',
+                                                 self.fan_out_chunk_size)
+        calls = [(item,) for item in items]
+        sent = 0
+        if not calls:
+            return sent
+        for task in tasks:
+            job = task.chunks(calls, chunk_size).group()
+            queue = options.get('queue') or getattr(task, 'queue', None)
+            job.apply_async(**dict(options, queue=queue) if queue else options)
+            sent += len(job.tasks)
+        return sent
+
 
 
 